@@ -0,0 +1,228 @@
+"""
+Streaming aggregation for AMR-X Backend
+Runs many aggregators over a single pass of a collection stream, fetching
+only the fields the aggregators actually read. Plain counts, sums and
+averages go through server-side aggregation queries when available.
+"""
+
+import heapq
+import itertools
+import logging
+from collections import defaultdict
+from typing import Dict, Any, Callable, Iterable, Optional, Tuple
+
+from google.api_core import exceptions as google_exceptions
+
+logger = logging.getLogger(__name__)
+
+# Errors meaning the backend cannot run aggregation queries at all
+AGGREGATION_UNSUPPORTED = (AttributeError, NotImplementedError, google_exceptions.MethodNotImplemented)
+
+
+class Aggregator:
+    """Base class for single-pass aggregators."""
+
+    # Fields read from each record; None means the whole document is needed
+    fields: Optional[Tuple[str, ...]] = ()
+
+    def add(self, record: Dict[str, Any]):
+        raise NotImplementedError
+
+    def result(self) -> Any:
+        raise NotImplementedError
+
+
+class Count(Aggregator):
+    """Count records."""
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, record):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+
+class Sum(Aggregator):
+    """Sum a numeric field, ignoring missing or non-numeric values."""
+
+    def __init__(self, field: str):
+        self.field = field
+        self.fields = (field,)
+        self.total = 0
+
+    def add(self, record):
+        value = record.get(self.field)
+        if isinstance(value, (int, float)):
+            self.total += value
+
+    def result(self):
+        return self.total
+
+
+class GroupCount(Aggregator):
+    """Count records per value of a field, optionally mapped through a key function."""
+
+    def __init__(self, field: str, key: Optional[Callable[[Any], Any]] = None, default: Any = 'Unknown'):
+        self.field = field
+        self.fields = (field,)
+        self.key = key
+        self.default = default
+        self.counts = defaultdict(int)
+
+    def add(self, record):
+        value = record.get(self.field, self.default)
+        if self.key is not None:
+            value = self.key(value)
+            if value is None:
+                return
+        self.counts[value] += 1
+
+    def result(self):
+        return dict(self.counts)
+
+
+class Distinct(Aggregator):
+    """Collect the distinct values of a field."""
+
+    def __init__(self, field: str, default: Any = 'Unknown'):
+        self.field = field
+        self.fields = (field,)
+        self.default = default
+        self.values = set()
+
+    def add(self, record):
+        self.values.add(record.get(self.field, self.default))
+
+    def result(self):
+        return self.values
+
+
+class TopK(GroupCount):
+    """Return the k most frequent values of a field."""
+
+    def __init__(self, field: str, k: int = 3, default: Any = 'Unknown'):
+        super().__init__(field, default=default)
+        self.k = k
+
+    def result(self):
+        return [value for value, _ in heapq.nlargest(self.k, self.counts.items(), key=lambda x: x[1])]
+
+
+class RecentN(Aggregator):
+    """Keep the n records with the largest value of an ordering field.
+
+    Records without the field are kept too, ranked after every record that
+    has it, as a descending query would have returned them.
+    """
+
+    def __init__(self, n: int, order_field: str = 'timestamp', fields: Optional[Iterable[str]] = None):
+        self.n = n
+        self.order_field = order_field
+        self.fields = None if fields is None else tuple(set(fields) | {order_field})
+        self.heap = []
+        self.sequence = itertools.count()
+
+    def add(self, record):
+        order = record.get(self.order_field)
+        # Missing values rank below every present one and are never compared with them
+        rank = (False,) if order is None else (True, order)
+        # The sequence number breaks ties so records themselves are never compared
+        item = (rank, next(self.sequence), record)
+        if len(self.heap) < self.n:
+            heapq.heappush(self.heap, item)
+        elif rank > self.heap[0][0]:
+            heapq.heapreplace(self.heap, item)
+
+    def result(self):
+        return [record for _, _, record in sorted(self.heap, key=lambda x: (x[0], x[1]), reverse=True)]
+
+
+def projection(aggregators: Iterable[Aggregator]) -> Optional[list]:
+    """Return the union of fields the aggregators read, or None for whole documents."""
+    fields = set()
+    for aggregator in aggregators:
+        if aggregator.fields is None:
+            return None
+        fields.update(aggregator.fields)
+    return sorted(fields)
+
+
+def aggregate(source, aggregators: Dict[str, Aggregator]) -> Dict[str, Any]:
+    """Feed one pass over a query or iterable of records to every aggregator.
+
+    Firestore queries are projected down to the fields the aggregators need
+    before streaming, and each document is deserialized exactly once.
+    """
+    if hasattr(source, 'stream'):
+        fields = projection(aggregators.values())
+        if fields is not None:
+            # An empty projection would return whole documents; ask for names only
+            source = source.select(fields or ['__name__'])
+        source = source.stream()
+
+    active = list(aggregators.values())
+    for item in source:
+        if hasattr(item, 'to_dict'):
+            record = item.to_dict() or {}
+            record['id'] = item.id
+        else:
+            record = item
+        for aggregator in active:
+            aggregator.add(record)
+
+    return {name: aggregator.result() for name, aggregator in aggregators.items()}
+
+
+class Average(Aggregator):
+    """Average a numeric field, ignoring missing or non-numeric values."""
+
+    def __init__(self, field: str):
+        self.field = field
+        self.fields = (field,)
+        self.total = 0
+        self.count = 0
+
+    def add(self, record):
+        value = record.get(self.field)
+        if isinstance(value, (int, float)):
+            self.total += value
+            self.count += 1
+
+    def result(self):
+        return self.total / self.count if self.count else None
+
+
+def _server_aggregate(query, method: str, *args):
+    """Run a single server-side aggregation and return its value."""
+    results = getattr(query, method)(*args, alias='value').get()
+    for result in results:
+        for aggregation in result:
+            return aggregation.value
+    return None
+
+
+def _aggregate_one(query, method: str, fallback: Aggregator, *args):
+    """Prefer a server-side aggregation, streaming a projected scan if it is unsupported."""
+    try:
+        return _server_aggregate(query, method, *args)
+    except AGGREGATION_UNSUPPORTED as e:
+        logger.warning(f"Aggregation query '{method}' unsupported, scanning instead: {e}")
+        return aggregate(query, {'value': fallback})['value']
+
+
+def count(query) -> int:
+    """Count the documents matching a query without downloading them."""
+    return int(_aggregate_one(query, 'count', Count()) or 0)
+
+
+def sum_field(query, field: str):
+    """Sum a numeric field over the documents matching a query."""
+    return _aggregate_one(query, 'sum', Sum(field), field) or 0
+
+
+def average(query, field: str) -> Optional[float]:
+    """Average a numeric field over the documents matching a query."""
+    return _aggregate_one(query, 'avg', Average(field), field)
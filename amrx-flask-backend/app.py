@@ -1,37 +1,63 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, Request, request, jsonify
 from flask_cors import CORS
+import click
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+import rate_limit_storage  # registers the amrx-shm:// storage scheme
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core.exceptions import Conflict
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import re
 from typing import Dict, Any, Optional
-import json
 import jwt
-import hashlib
 import secrets
-from collections import defaultdict
-from functools import wraps, lru_cache
+from functools import wraps
 import time
-import traceback
+import threading
+from log_pipeline import configure_logging
+from audit_store import configure_audit_logging
+import rollups
+import bulk
+import schemas
+from schemas import EMAIL_PATTERN, PHARMACIST_SUBMISSION, PUBLIC_SUBMISSION
+from uploads import UploadJob, UploadManager, UploadQueueFull, UploadTooLarge, spool_to_disk
+from ingest import IngestLog
+from cache import ResponseCache
+from token_cache import TokenCache, token_digest
+from passwords import HasherBusy, create_hasher
+from repository import FirestoreRepository
+from cache_backends import create_backend
+from events import create_broadcaster
+import aggregation
+from aggregation import aggregate, GroupCount, RecentN
+import cursors
+from cursors import InvalidCursor, decode_cursor, encode_cursor, decode_page_token, encode_page_token
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging with better formatting
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
+# Configure logging: request threads only enqueue, a listener thread writes JSON lines
+log_pipeline = configure_logging(
+    path=os.getenv('LOG_FILE', 'app.log'),
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    max_bytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+    backup_count=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+    rotate_interval=float(os.getenv('LOG_ROTATE_INTERVAL', 24 * 60 * 60)) or None,
+    queue_size=int(os.getenv('LOG_QUEUE_SIZE', 10000))
 )
 logger = logging.getLogger(__name__)
+audit_logger = logging.getLogger('amrx.audit')
+# Audit records go only to hourly indexed segments, not app.log; query them with audit_store.py
+audit_pipeline = configure_audit_logging(
+    os.getenv('AUDIT_DIR', 'audit'),
+    retention_days=float(os.getenv('AUDIT_RETENTION_DAYS', 90)),
+    queue_size=int(os.getenv('LOG_QUEUE_SIZE', 10000))
+)
 
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
@@ -43,45 +69,128 @@ JWT_EXPIRATION = 24 * 60 * 60  # 24 hours
 # Use Flask app config for secret key if available
 JWT_SECRET = os.getenv('JWT_SECRET_KEY', secrets.token_hex(32))
 
+# Verified tokens are cached until they expire; revocations from other workers are picked up every sync interval
+token_cache = TokenCache(max_entries=int(os.getenv('TOKEN_CACHE_SIZE', 4096)), max_token_age=JWT_EXPIRATION)
+TOKEN_REVOCATION_SYNC = float(os.getenv('TOKEN_REVOCATION_SYNC', 30))
+# Incremental syncs re-read this much history, to cover clock skew between workers
+TOKEN_REVOCATION_OVERLAP = 60
+
 # Simple CORS configuration
 CORS(app, origins=['http://localhost:5173', 'http://127.0.0.1:5173'], supports_credentials=True)
 
-# Simple rate limiting
+# Rate limits are counted in storage shared by every worker on the box (or Redis, via redis://)
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
-    default_limits=["1000 per day", "100 per hour"]
+    default_limits=["1000 per day", "100 per hour"],
+    storage_uri=rate_limit_storage.storage_uri(os.getenv('RATELIMIT_STORAGE_URI', 'amrx-shm://')),
+    strategy=os.getenv('RATELIMIT_STRATEGY', 'sliding-window-counter')
 )
 
-# Security: Input validation patterns
-VALID_LOCATION_PATTERN = re.compile(r'^[a-zA-Z\s\-\.]+$', re.IGNORECASE)
-VALID_MEDICATION_PATTERN = re.compile(r'^[a-zA-Z\s\-\.]+$', re.IGNORECASE)
-VALID_SYMPTOMS_PATTERN = re.compile(r'^[a-zA-Z0-9\s\-\.\,\!\?]+$', re.IGNORECASE)
-VALID_REGION_PATTERN = re.compile(r'^[a-zA-Z\s\-\.]+$', re.IGNORECASE)
-VALID_EMAIL_PATTERN = re.compile(r'^[^\s@]+@[^\s@]+\.[^\s@]+$')
+# Bulk ingestion limits
+PHARMACIST_BATCH_MAX_ROWS = int(os.getenv('PHARMACIST_BATCH_MAX_ROWS', 1000))
+BATCH_ROW_MAX_BYTES = 2048  # Generous for one JSON record with every field filled
+# Request bodies are read whole, so a batch request is refused with 413 before it is buffered
+app.config['MAX_CONTENT_LENGTH'] = PHARMACIST_BATCH_MAX_ROWS * BATCH_ROW_MAX_BYTES
+FIRESTORE_BATCH_LIMIT = 500  # Writes per Firestore batched commit
+# Submissions a pharmacist dashboard delta may carry; more and the client reloads in full
+PHARMACIST_DELTA_LIMIT = 100
+
+# Background CSV/NDJSON uploads; one write per batch goes to the rollup shard
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', 200 * 1024 * 1024))
+
+class UploadAwareRequest(Request):
+    """Request that lets the upload endpoint, which spools to disk, take bodies up to UPLOAD_MAX_BYTES."""
+
+    @property
+    def max_content_length(self) -> Optional[int]:
+        if self.endpoint == 'create_pharmacist_upload':
+            return UPLOAD_MAX_BYTES
+        return super().max_content_length
+
+app.request_class = UploadAwareRequest
+
+upload_manager = UploadManager(
+    max_jobs=int(os.getenv('UPLOAD_MAX_JOBS', 2)),
+    max_queued=int(os.getenv('UPLOAD_MAX_QUEUED', 4)),
+    writers=int(os.getenv('UPLOAD_WRITERS', 4)),
+    batch_size=FIRESTORE_BATCH_LIMIT - 1
+)
+# Normalized CSV header -> submission field
+UPLOAD_COLUMNS = {
+    'medicinename': 'medicineName',
+    'medicine': 'medicineName',
+    'category': 'category',
+    'quantity': 'quantity',
+    'region': 'region'
+}
+CSV_MIMETYPES = ('text/csv', 'application/csv', 'application/vnd.ms-excel')
 
-# Allowed medication categories
-ALLOWED_CATEGORIES = [
-    'penicillins', 'cephalosporins', 'macrolides', 
-    'tetracyclines', 'aminoglycosides', 'fluoroquinolones'
-]
+# Public submission ingestion: 'sync' writes during the request, 'log' acknowledges
+# once the submission is fsynced to a local log and writes it in the background
+INGEST_MODE = os.getenv('INGEST_MODE', 'sync')
+INGEST_LOG_DIR = os.getenv('INGEST_LOG_DIR', 'ingest_log')
 
 # Cache configuration
 CACHE_DURATION = 300  # 5 minutes
-dashboard_cache = {}
-cache_timestamps = {}
+DASHBOARD_SCAN_LIMIT = 1000  # Documents read per collection when rollups are missing
+RECENT_SUBMISSIONS_LIMIT = 10  # Recent submissions shown on the public dashboard
+SUBMISSIONS_PAGE_SIZE = 25  # Default page size of /api/pharmacist/submissions
+SUBMISSIONS_MAX_PAGE_SIZE = 100
+SUBMISSION_LIST_FIELDS = ('medicineName', 'category', 'quantity', 'region', 'timestamp')
+response_cache = ResponseCache(
+    backend=create_backend(
+        os.getenv('CACHE_BACKEND', 'memory'),
+        path=os.getenv('CACHE_SQLITE_PATH'),
+        max_entries=int(os.getenv('CACHE_MAX_ENTRIES', 256)),
+        max_bytes=int(os.getenv('CACHE_MAX_BYTES', 8 * 1024 * 1024))
+    ),
+    default_ttl=CACHE_DURATION,
+    stale_ttl=int(os.getenv('CACHE_STALE_TTL', CACHE_DURATION)),
+    negative_ttl=int(os.getenv('CACHE_NEGATIVE_TTL', 30)),
+    invalidation_debounce=float(os.getenv('CACHE_INVALIDATION_DEBOUNCE', 10))
+)
+
+# Cache tags: what each cached view depends on, and what each write invalidates
+PUBLIC_TAG = 'public'
+ANTIBIOTICS_TAG = 'antibiotics'
+
+def pharmacist_tag(pharmacist_id: str) -> str:
+    return f"pharmacist:{pharmacist_id}"
+
+# Live dashboard events: 'memory' fans out per worker, 'sqlite' across all workers on the host
+event_broadcaster = create_broadcaster(
+    os.getenv('EVENTS_BACKEND', 'memory'),
+    path=os.getenv('EVENTS_SQLITE_PATH'),
+    heartbeat=float(os.getenv('EVENTS_HEARTBEAT', 15)),
+    max_age=float(os.getenv('EVENTS_STREAM_MAX_AGE', 600)),
+    max_subscribers=int(os.getenv('EVENTS_MAX_STREAMS', 64))
+)
+RECENT_EVENT_FIELDS = {
+    'public': ('symptoms', 'medication', 'duration', 'location'),
+    'pharmacist': ('medicineName', 'category', 'quantity', 'region')
+}
+
+# scrypt on a bounded per-worker pool; PASSWORD_SALT only checks legacy SHA-256 hashes
+password_hasher = create_hasher()
 
 def hash_password(password: str) -> str:
-    """Hash password using SHA-256 with salt."""
-    salt = os.getenv('PASSWORD_SALT', 'amr_salt_2024')
-    return hashlib.sha256((password + salt).encode()).hexdigest()
+    """Hash password with scrypt. Raises HasherBusy when the hashing pool is full."""
+    return password_hasher.hash(password)
+
+def hasher_busy_response():
+    """503 for a request refused because password hashing is saturated."""
+    response = jsonify({'error': 'Too many sign-in attempts in progress, try again shortly', 'code': 'AUTH_BUSY'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 def generate_token(pharmacist_id: str) -> str:
     """Generate JWT token for pharmacist with enhanced security."""
     payload = {
         'pharmacist_id': pharmacist_id,
         'exp': datetime.utcnow() + timedelta(seconds=JWT_EXPIRATION),
-        'iat': datetime.utcnow(),
+        # Sub-second iat, so a token issued just after a revocation in the same second is not caught by it
+        'iat': time.time(),
         'iss': 'amr-x-api',
         'aud': 'amr-x-frontend'
     }
@@ -89,6 +198,12 @@ def generate_token(pharmacist_id: str) -> str:
 
 def verify_token(token: str) -> Optional[Dict[str, Any]]:
     """Verify JWT token and return payload with enhanced validation."""
+    ensure_revocation_sync()
+    payload, revoked = token_cache.get(token)
+    if revoked:
+        return None
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(
             token, 
@@ -97,6 +212,9 @@ def verify_token(token: str) -> Optional[Dict[str, Any]]:
             issuer='amr-x-api',
             audience='amr-x-frontend'
         )
+        if not token_cache.put(token, payload):
+            logger.warning(f"Revoked token presented for pharmacist {payload.get('pharmacist_id')}")
+            return None
         return payload
     except jwt.ExpiredSignatureError:
         logger.warning("Token expired")
@@ -108,6 +226,80 @@ def verify_token(token: str) -> Optional[Dict[str, Any]]:
         logger.error(f"Token verification error: {e}")
         return None
 
+_revocations_synced_at = None
+
+def sync_token_revocations():
+    """Merge revocations from Firestore into this worker's token cache.
+
+    The first sync loads every unexpired revocation; later ones only fetch
+    those revoked since the previous sync. Re-applying a revocation is
+    harmless, and the token cache drops expired ones itself.
+    """
+    global _revocations_synced_at
+    now = time.time()
+    revocations = db.collection('token_revocations')
+    if _revocations_synced_at is None:
+        query = revocations.where('expires_at', '>', now)
+    else:
+        query = revocations.where('revoked_at', '>', _revocations_synced_at - TOKEN_REVOCATION_OVERLAP)
+    tokens = []
+    subjects = []
+    for doc in query.stream():
+        data = doc.to_dict()
+        if data.get('kind') == 'subject':
+            subjects.append((data['pharmacist_id'], data['revoked_at']))
+        else:
+            tokens.append((doc.id, data['expires_at']))
+    token_cache.apply_revocations(tokens, subjects)
+    _revocations_synced_at = now
+
+_revocation_sync_lock = threading.Lock()
+_revocation_sync_pid = None
+
+def ensure_revocation_sync():
+    """Start this worker's revocation sync thread, once per process."""
+    global _revocation_sync_pid
+    if not db or _revocation_sync_pid == os.getpid():
+        return
+    with _revocation_sync_lock:
+        if _revocation_sync_pid == os.getpid():
+            return
+        _revocation_sync_pid = os.getpid()
+    
+    def run():
+        while True:
+            try:
+                sync_token_revocations()
+            except Exception as e:
+                logger.warning(f"Token revocation sync failed: {e}")
+            time.sleep(TOKEN_REVOCATION_SYNC)
+    
+    threading.Thread(target=run, name='revocation-sync', daemon=True).start()
+
+def revoke_token(token: str, payload: Dict[str, Any]):
+    """Refuse one token from now on, in every worker."""
+    token_cache.revoke_token(token, payload['exp'])
+    if db:
+        db.collection('token_revocations').document(token_digest(token)).set({
+            'kind': 'token',
+            'pharmacist_id': payload.get('pharmacist_id'),
+            'revoked_at': time.time(),
+            'expires_at': payload['exp']
+        })
+
+def revoke_pharmacist_tokens(pharmacist_id: str):
+    """Refuse every token issued to a pharmacist so far, in every worker."""
+    revoked_at = time.time()
+    token_cache.revoke_subject(pharmacist_id, revoked_at)
+    if db:
+        db.collection('token_revocations').document(f"pharmacist-{pharmacist_id}").set({
+            'kind': 'subject',
+            'pharmacist_id': pharmacist_id,
+            'revoked_at': revoked_at,
+            # Tokens issued before revoked_at are all expired by then
+            'expires_at': revoked_at + JWT_EXPIRATION
+        })
+
 def require_auth(f):
     """Enhanced authentication decorator with better error handling."""
     @wraps(f)
@@ -125,34 +317,21 @@ def require_auth(f):
         return f(*args, **kwargs)
     return decorated
 
-def cache_result(duration: int = CACHE_DURATION):
-    """Decorator for caching function results."""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            cache_key = f"{func.__name__}:{hash(str(args) + str(kwargs))}"
-            current_time = time.time()
-            
-            # Check if cache is valid
-            if (cache_key in cache_timestamps and 
-                current_time - cache_timestamps[cache_key] < duration and
-                cache_key in dashboard_cache):
-                return dashboard_cache[cache_key]
-            
-            # Execute function and cache result
-            result = func(*args, **kwargs)
-            dashboard_cache[cache_key] = result
-            cache_timestamps[cache_key] = current_time
-            
-            return result
-        return wrapper
-    return decorator
+def cache_result(duration: int = CACHE_DURATION, key_func=None, tags=()):
+    """Decorator for caching view responses (see cache.ResponseCache)."""
+    return response_cache.cached(ttl=duration, key_func=key_func, tags=tags)
+
+def data_last_updated(*tags: str) -> str:
+    """lastUpdated for a cached body: when its tagged data last changed, so unchanged data keeps its ETag."""
+    return datetime.fromtimestamp(response_cache.changed_at(tags)).isoformat()
+
+def invalidate_cache(*tags: str):
+    """Mark cached views depending on the given tags as stale."""
+    response_cache.invalidate(tags)
 
 def clear_cache():
     """Clear all cached data."""
-    global dashboard_cache, cache_timestamps
-    dashboard_cache.clear()
-    cache_timestamps.clear()
+    response_cache.clear()
 
 # Initialize Firebase with better error handling
 def initialize_firebase():
@@ -200,31 +379,95 @@ def sanitize_input(text: str) -> str:
     """Enhanced input sanitization with better security."""
     if not text:
         return text
-    # Remove potentially dangerous characters and normalize
-    text = re.sub(r'[<>"\']', '', str(text))
-    text = re.sub(r'\s+', ' ', text)  # Normalize whitespace
-    return text.strip()
-
-def validate_input_pattern(text: str, pattern: re.Pattern, field_name: str) -> tuple[bool, str]:
-    """Validate input against regex pattern."""
-    if not text or not pattern.match(text):
-        return False, f"Invalid {field_name} format"
-    return True, ""
+    return schemas.sanitize(str(text))
 
 def log_submission(data: Dict[str, Any], submission_type: str, ip_address: str):
     """Enhanced logging for audit trail."""
-    log_entry = {
-        'timestamp': datetime.now().isoformat(),
-        'type': submission_type,
+    # Written to the audit store by its listener thread, off the request thread
+    audit_logger.info("Submission logged", extra={
+        'submission_type': submission_type,
         'ip_address': ip_address,
         'user_agent': request.headers.get('User-Agent', 'Unknown'),
         'data': {k: v for k, v in data.items() if k != 'timestamp'}
+    })
+
+def serialize_timestamp(ts: Any) -> str:
+    """Convert a stored timestamp into a JSON-friendly string."""
+    if ts is not None and hasattr(ts, 'isoformat'):
+        return ts.isoformat()
+    return str(ts) if ts is not None else ''
+
+def timestamp_month(ts: Any) -> Optional[str]:
+    """Return the YYYY-MM bucket of a timestamp, or None if it has no date."""
+    if not hasattr(ts, 'month'):
+        return None
+    return f"{ts.year}-{ts.month:02d}"
+
+def publish_submissions(records: list, submission_type: str, count: Optional[int] = None):
+    """Push new submissions and their counter increments to live dashboards in one event.
+
+    count is the number of submissions saved when records only holds some of them.
+    """
+    # Dashboards only show the newest few, so large batches are trimmed
+    newest = sorted(records, key=lambda data: data['timestamp'], reverse=True)[:RECENT_SUBMISSIONS_LIMIT]
+    submissions = []
+    for data in newest:
+        submission = {field: data.get(field) for field in RECENT_EVENT_FIELDS[submission_type]}
+        submission.update({
+            'id': data.get('id'),
+            'type': submission_type,
+            'timestamp': serialize_timestamp(data.get('timestamp'))
+        })
+        submissions.append(submission)
+    total = len(records) if count is None else count
+    increments = {'totalEntries': total}
+    if submission_type == 'public':
+        increments['total_submissions'] = total
+    event_broadcaster.publish('submission', {'submissions': submissions, 'increments': increments})
+    schedule_dashboard_summary()
+
+def dashboard_summary(rollup: Dict[str, Any]) -> Dict[str, Any]:
+    """Derive the dashboard counters and top-K lists from rollup-shaped counts."""
+    total_submissions = rollup['public_total']
+    return {
+        'totalEntries': rollup['public_total'] + rollup['pharmacist_total'],
+        'total_submissions': total_submissions,
+        'resistance_cases': int(total_submissions * 0.15),  # Estimate 15% resistance cases
+        'countries_affected': len(rollup['locations']),
+        # High-risk zones and common antibiotics come straight from the rollup maps
+        'highRiskZones': rollups.top_keys(rollup['locations']) or ['No data available'],
+        'commonAntibiotics': rollups.top_keys(rollup['medicines']) or ['No data available']
     }
-    logger.info(f"Submission logged: {json.dumps(log_entry)}")
+
+_summary_lock = threading.Lock()
+_summary_scheduled = False
+
+def publish_dashboard_summary():
+    """Publish the dashboard summary if its counters or top-K lists changed."""
+    global _summary_scheduled
+    with _summary_lock:
+        _summary_scheduled = False
+    try:
+        rollup = rollups.read_dashboard_rollup(db) if db else None
+        if rollup is not None:
+            event_broadcaster.publish_if_changed('stats', dashboard_summary(rollup))
+    except Exception as e:
+        logger.error(f"Failed to publish dashboard summary: {e}")
+
+def schedule_dashboard_summary():
+    """Recompute the summary once per debounce window however many writes arrive."""
+    global _summary_scheduled
+    with _summary_lock:
+        if _summary_scheduled:
+            return
+        _summary_scheduled = True
+    timer = threading.Timer(response_cache.invalidation_debounce, publish_dashboard_summary)
+    timer.daemon = True
+    timer.start()
 
 def validate_email(email: str) -> bool:
     """Validate email format."""
-    return bool(VALID_EMAIL_PATTERN.match(email))
+    return bool(EMAIL_PATTERN.match(email))
 
 def validate_password_strength(password: str) -> tuple[bool, str]:
     """Validate password strength."""
@@ -247,11 +490,25 @@ def ratelimit_handler(e):
         'code': 'RATE_LIMIT_EXCEEDED'
     }), 429
 
+@app.errorhandler(413)
+def payload_too_large(e):
+    """Handle request bodies over MAX_CONTENT_LENGTH."""
+    return jsonify({
+        'error': f'Request body too large (max {request.max_content_length} bytes)',
+        'code': 'PAYLOAD_TOO_LARGE'
+    }), 413
+
+@app.before_request
+def refuse_large_bodies():
+    """Refuse a declared oversized body before a view's own error handling turns the 413 into a 500."""
+    limit = request.max_content_length
+    if limit is not None and request.content_length is not None and request.content_length > limit:
+        return payload_too_large(None)
+
 @app.errorhandler(500)
 def internal_error(e):
     """Handle internal server errors with better logging."""
-    logger.error(f"Internal server error: {e}")
-    logger.error(f"Traceback: {traceback.format_exc()}")
+    logger.error(f"Internal server error: {e}", exc_info=True)
     return jsonify({
         'error': 'Internal server error',
         'code': 'INTERNAL_ERROR',
@@ -279,66 +536,41 @@ def method_not_allowed(e):
 def submit_public_data():
     """Submit public symptom data with enhanced validation and security."""
     try:
-        data = request.json or {}
-        required_fields = ['symptoms', 'medication', 'duration', 'location']
-        
-        # Validate required fields
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required', 'code': 'MISSING_FIELD'}), 400
-        
-        # Enhanced length validation
-        field_limits = {
-            'symptoms': 1000,
-            'medication': 100,
-            'location': 100
-        }
-        
-        for field, limit in field_limits.items():
-            if len(str(data.get(field, ''))) > limit:
-                return jsonify({'error': f'{field} is too long (max {limit} characters)', 'code': 'FIELD_TOO_LONG'}), 400
-        
-        # Validate patterns
-        validations = [
-            (data.get('symptoms'), VALID_SYMPTOMS_PATTERN, 'symptoms'),
-            (data.get('medication'), VALID_MEDICATION_PATTERN, 'medication'),
-            (data.get('location'), VALID_LOCATION_PATTERN, 'location')
-        ]
-        
-        for value, pattern, field_name in validations:
-            is_valid, error_msg = validate_input_pattern(str(value) or '', pattern, field_name)
-            if not is_valid:
-                return jsonify({'error': error_msg, 'code': 'INVALID_FORMAT'}), 400
-        
-        # Validate duration
-        try:
-            duration = int(data.get('duration', 0))
-            if duration < 1 or duration > 365:
-                return jsonify({'error': 'Duration must be between 1 and 365 days', 'code': 'INVALID_DURATION'}), 400
-        except (ValueError, TypeError):
-            return jsonify({'error': 'Invalid duration value', 'code': 'INVALID_DURATION'}), 400
+        fields, error = PUBLIC_SUBMISSION(request.json or {})
+        if error:
+            return jsonify(error), 400
         
-        # Sanitize inputs
+        # Sanitized inputs plus server-side metadata
         sanitized_data = {
-            'symptoms': sanitize_input(str(data.get('symptoms') or '')),
-            'medication': sanitize_input(str(data.get('medication') or '')),
-            'duration': duration,
-            'location': sanitize_input(str(data.get('location') or '')),
+            **fields,
             'timestamp': datetime.now(),
             'type': 'public',
             'ip_address': get_remote_address(),
             'user_agent': request.headers.get('User-Agent', 'Unknown')
         }
         
-        if db:
+        if ingest_log is not None:
+            # Acknowledge once durable locally; the drain thread writes it to Firestore
+            try:
+                sanitized_data['id'] = db.collection('public_submissions').document().id
+                ingest_log.append(sanitized_data)
+            except OSError as e:
+                logger.error(f"Failed to append to ingest log: {e}")
+                return jsonify({'error': 'Failed to save data', 'code': 'DATABASE_ERROR'}), 500
+        elif db:
             # Save to Firebase with error handling
             try:
-                doc_ref = db.collection('public_submissions').add(sanitized_data)
-                if doc_ref and len(doc_ref) > 1 and doc_ref[1] is not None and hasattr(doc_ref[1], 'id'):
-                    sanitized_data['id'] = doc_ref[1].id
-                    logger.info(f"Public submission saved with ID: {doc_ref[1].id}")
-                    # Clear cache to ensure fresh data
-                    clear_cache()
+                # Write the submission and its rollup increments atomically
+                doc_ref = db.collection('public_submissions').document()
+                batch = db.batch()
+                batch.set(doc_ref, sanitized_data)
+                rollups.add_public_submissions(batch, db, [sanitized_data])
+                batch.commit()
+                sanitized_data['id'] = doc_ref.id
+                logger.info(f"Public submission saved with ID: {doc_ref.id}")
+                # Refresh only the views built from public submissions
+                invalidate_cache(PUBLIC_TAG)
+                publish_submissions([sanitized_data], 'public')
             except Exception as e:
                 logger.error(f"Failed to save to Firebase: {e}")
                 return jsonify({'error': 'Failed to save data', 'code': 'DATABASE_ERROR'}), 500
@@ -351,11 +583,10 @@ def submit_public_data():
             'message': 'Data submitted successfully',
             'id': sanitized_data.get('id'),
             'timestamp': sanitized_data['timestamp'].isoformat()
-        })
+        }), 202 if ingest_log is not None else 200
     
     except Exception as e:
-        logger.error(f"Error in public submission: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error(f"Error in public submission: {e}", exc_info=True)
         return jsonify({'error': 'Internal server error', 'code': 'INTERNAL_ERROR'}), 500
 
 @app.route('/api/pharmacist', methods=['POST'])
@@ -368,39 +599,13 @@ def submit_pharmacist_data():
         if not pharmacist_id:
             return jsonify({'error': 'Authentication required (no pharmacist_id)', 'code': 'AUTH_REQUIRED'}), 401
         
-        data = request.json or {}
-        required_fields = ['medicineName', 'category', 'quantity', 'region']
+        fields, error = PHARMACIST_SUBMISSION(request.json or {})
+        if error:
+            return jsonify(error), 400
         
-        # Validate required fields
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required', 'code': 'MISSING_FIELD'}), 400
-        
-        # Validate category
-        if data.get('category') not in ALLOWED_CATEGORIES:
-            return jsonify({'error': f'Invalid medication category. Must be one of: {", ".join(ALLOWED_CATEGORIES)}', 'code': 'INVALID_CATEGORY'}), 400
-        
-        # Validate quantity
-        try:
-            quantity = int(data.get('quantity', 0))
-            if quantity < 1 or quantity > 10000:
-                return jsonify({'error': 'Quantity must be between 1 and 10,000', 'code': 'INVALID_QUANTITY'}), 400
-        except (ValueError, TypeError):
-            return jsonify({'error': 'Invalid quantity value', 'code': 'INVALID_QUANTITY'}), 400
-        
-        # Validate region pattern
-        is_valid, error_msg = validate_input_pattern(
-            str(data.get('region') or '') or '', VALID_REGION_PATTERN, 'region'
-        )
-        if not is_valid:
-            return jsonify({'error': error_msg, 'code': 'INVALID_FORMAT'}), 400
-        
-        # Sanitize inputs
+        # Sanitized inputs plus server-side metadata
         sanitized_data = {
-            'medicineName': sanitize_input(str(data.get('medicineName') or '')),
-            'category': data.get('category'),
-            'quantity': quantity,
-            'region': sanitize_input(str(data.get('region') or '')),
+            **fields,
             'timestamp': datetime.now(),
             'type': 'pharmacist',
             'ip_address': get_remote_address(),
@@ -411,12 +616,17 @@ def submit_pharmacist_data():
         if db:
             # Save to Firebase with error handling
             try:
-                doc_ref = db.collection('pharmacist_submissions').add(sanitized_data)
-                if doc_ref and len(doc_ref) > 1 and doc_ref[1] is not None and hasattr(doc_ref[1], 'id'):
-                    sanitized_data['id'] = doc_ref[1].id
-                    logger.info(f"Pharmacist submission saved with ID: {doc_ref[1].id}")
-                    # Clear cache to ensure fresh data
-                    clear_cache()
+                # Write the submission and its rollup increments atomically
+                doc_ref = db.collection('pharmacist_submissions').document()
+                batch = db.batch()
+                batch.set(doc_ref, sanitized_data)
+                rollups.add_pharmacist_submissions(batch, db, [sanitized_data])
+                batch.commit()
+                sanitized_data['id'] = doc_ref.id
+                logger.info(f"Pharmacist submission saved with ID: {doc_ref.id}")
+                # Refresh this pharmacist's views and the antibiotic aggregates
+                invalidate_cache(pharmacist_tag(pharmacist_id), ANTIBIOTICS_TAG)
+                publish_submissions([sanitized_data], 'pharmacist')
             except Exception as e:
                 logger.error(f"Failed to save to Firebase: {e}")
                 return jsonify({'error': 'Failed to save data', 'code': 'DATABASE_ERROR'}), 500
@@ -432,16 +642,315 @@ def submit_pharmacist_data():
         })
     
     except Exception as e:
-        logger.error(f"Error in pharmacist submission: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error(f"Error in pharmacist submission: {e}", exc_info=True)
+        return jsonify({'error': 'Internal server error', 'code': 'INTERNAL_ERROR'}), 500
+
+@app.route('/api/pharmacist/batch', methods=['POST'])
+@require_auth
+@limiter.limit("10 per minute")
+def submit_pharmacist_batch():
+    """Submit many prescriptions as a JSON array or NDJSON (one record per line).
+
+    Every row is validated in one pass and invalid rows are reported by
+    index without blocking the rest. Valid rows are written with batched
+    commits that each carry a single rollup increment, and caches are
+    invalidated once for the whole request.
+    """
+    try:
+        pharmacist_id = getattr(request, 'pharmacist_id', None)
+        if not pharmacist_id:
+            return jsonify({'error': 'Authentication required (no pharmacist_id)', 'code': 'AUTH_REQUIRED'}), 401
+        
+        try:
+            rows, errors = bulk.parse_rows(request.get_data(), request.mimetype, PHARMACIST_BATCH_MAX_ROWS)
+        except bulk.BulkBodyError as e:
+            return jsonify({'error': str(e), 'code': e.code}), 400
+        except RequestEntityTooLarge as e:
+            return payload_too_large(e)
+        received = len(rows) + len(errors)
+        
+        received_at = datetime.now()
+        ip_address = get_remote_address()
+        user_agent = request.headers.get('User-Agent', 'Unknown')
+        checked, row_errors = PHARMACIST_SUBMISSION.validate_many(rows)
+        errors.extend(row_errors)
+        valid = [(index, {
+            **fields,
+            'received_at': received_at,
+            'type': 'pharmacist',
+            'ip_address': ip_address,
+            'pharmacist_id': pharmacist_id,
+            'user_agent': user_agent
+        }) for index, fields in checked]
+        
+        written = len(valid)
+        if db and valid:
+            written = 0
+            try:
+                # One write per chunk goes to the rollup shard
+                for chunk in bulk.chunked(valid, FIRESTORE_BATCH_LIMIT - 1):
+                    write_pharmacist_records([record for _, record in chunk])
+                    written += len(chunk)
+            except Exception as e:
+                logger.error(f"Failed to save pharmacist batch to Firebase after {written} rows: {e}")
+                for index, record in valid[written:]:
+                    record.pop('id', None)
+                    errors.append({'row': index, 'error': 'Failed to save data', 'code': 'DATABASE_ERROR'})
+        
+        saved = [record for _, record in valid[:written]]
+        if db and saved:
+            # Refresh this pharmacist's views and the antibiotic aggregates once per batch
+            invalidate_cache(pharmacist_tag(pharmacist_id), ANTIBIOTICS_TAG)
+            publish_submissions(saved, 'pharmacist')
+        
+        logger.info(f"Pharmacist batch from {pharmacist_id}: {len(saved)} saved, {len(errors)} rejected")
+        
+        errors.sort(key=lambda error: error['row'])
+        if not saved and errors:
+            status = 500 if any(error['code'] == 'DATABASE_ERROR' for error in errors) else 400
+        else:
+            status = 200
+        return jsonify({
+            'success': not errors,
+            'received': received,
+            'inserted': len(saved),
+            'ids': [record.get('id') for record in saved],
+            'errors': errors
+        }), status
+    
+    except Exception as e:
+        logger.error(f"Error in pharmacist batch submission: {e}", exc_info=True)
         return jsonify({'error': 'Internal server error', 'code': 'INTERNAL_ERROR'}), 500
 
+def stamp_write_time(records: list):
+    """Move records' timestamps to now, just before they are committed.
+
+    since= cursors advance along timestamps, so a record written long after
+    it was received (from the ingest log or an upload) would otherwise land
+    behind a cursor handed out in between and never reach that client.
+    The receipt time is kept as received_at; microsecond offsets keep the
+    records in order.
+    """
+    written_at = datetime.now()
+    for position, record in enumerate(records):
+        if 'received_at' not in record:
+            record['received_at'] = record['timestamp']
+        record['timestamp'] = written_at + timedelta(microseconds=position)
+
+def write_pharmacist_records(records: list):
+    """Commit pharmacist records and their rollup increments as one batched write."""
+    collection = db.collection('pharmacist_submissions')
+    stamp_write_time(records)
+    batch = db.batch()
+    for record in records:
+        doc_ref = collection.document()
+        batch.set(doc_ref, record)
+        record['id'] = doc_ref.id
+    rollups.add_pharmacist_submissions(batch, db, records)
+    batch.commit()
+
+def write_public_records(records: list):
+    """Create logged public submissions and their rollup increments, once each.
+
+    Records carry their document id, and create() refuses existing
+    documents, so a batch replayed after a crash cannot double count.
+    """
+    collection = db.collection('public_submissions')
+    
+    def commit(chunk: list):
+        stamp_write_time(chunk)
+        batch = db.batch()
+        for record in chunk:
+            batch.create(collection.document(record['id']), {k: v for k, v in record.items() if k != 'id'})
+        rollups.add_public_submissions(batch, db, chunk)
+        batch.commit()
+    
+    try:
+        commit(records)
+        written = records
+    except Conflict:
+        # Some of these were written before a crash: fall back to one commit each
+        written = []
+        for record in records:
+            try:
+                commit([record])
+                written.append(record)
+            except Conflict:
+                pass
+    
+    if written:
+        invalidate_cache(PUBLIC_TAG)
+        publish_submissions(written, 'public')
+        logger.info(f"Drained {len(written)} public submissions from the ingest log")
+
+def upload_format(filename: str, mimetype: str) -> Optional[str]:
+    """Return 'csv' or 'ndjson' for an uploaded file, or None if unsupported."""
+    filename = (filename or '').lower()
+    if mimetype in bulk.NDJSON_MIMETYPES or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if mimetype in CSV_MIMETYPES or filename.endswith('.csv'):
+        return 'csv'
+    return None
+
+@app.route('/api/pharmacist/uploads', methods=['POST'])
+@require_auth
+@limiter.limit("5 per minute")
+def create_pharmacist_upload():
+    """Start a background import of a CSV or NDJSON prescription file.
+
+    Send the file as the multipart field 'file', or as the raw body with a
+    text/csv or application/x-ndjson content type. The file is spooled to
+    disk and imported by a background job; poll the returned status URL.
+    """
+    try:
+        pharmacist_id = getattr(request, 'pharmacist_id', None)
+        if not pharmacist_id:
+            return jsonify({'error': 'Authentication required (no pharmacist_id)', 'code': 'AUTH_REQUIRED'}), 401
+        
+        if request.content_length and request.content_length > UPLOAD_MAX_BYTES:
+            return jsonify({'error': f'Upload too large (max {UPLOAD_MAX_BYTES} bytes)', 'code': 'UPLOAD_TOO_LARGE'}), 413
+        
+        upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+        if upload is not None:
+            file_format = upload_format(upload.filename, upload.mimetype)
+            stream = upload.stream
+        else:
+            file_format = upload_format('', request.mimetype)
+            stream = request.stream
+        if file_format is None:
+            return jsonify({'error': 'Upload a .csv or .ndjson file', 'code': 'UNSUPPORTED_FORMAT'}), 400
+        
+        try:
+            path = spool_to_disk(stream, UPLOAD_MAX_BYTES)
+        except UploadTooLarge:
+            return jsonify({'error': f'Upload too large (max {UPLOAD_MAX_BYTES} bytes)', 'code': 'UPLOAD_TOO_LARGE'}), 413
+        
+        received_at = datetime.now()
+        ip_address = get_remote_address()
+        user_agent = request.headers.get('User-Agent', 'Unknown')
+        
+        def prepare(index: int, data: Dict[str, Any]):
+            fields, error = PHARMACIST_SUBMISSION(data)
+            if error:
+                return None, error
+            return {
+                **fields,
+                'received_at': received_at,
+                'type': 'pharmacist',
+                'ip_address': ip_address,
+                'pharmacist_id': pharmacist_id,
+                'user_agent': user_agent
+            }, None
+        
+        def write(records: list):
+            if db:
+                write_pharmacist_records(records)
+        
+        def report(progress: Dict[str, Any]):
+            # Mirrored so any worker can answer status requests
+            if db:
+                db.collection('upload_jobs').document(progress['job_id']).set(progress)
+        
+        def finish(job: UploadJob, newest: list):
+            if db:
+                invalidate_cache(pharmacist_tag(pharmacist_id), ANTIBIOTICS_TAG)
+                publish_submissions(newest, 'pharmacist', count=job.inserted)
+        
+        try:
+            job = upload_manager.submit(path, UploadJob(pharmacist_id, file_format), UPLOAD_COLUMNS,
+                                        prepare, write, report, finish)
+        except UploadQueueFull:
+            return jsonify({
+                'error': 'Too many uploads in progress, try again shortly',
+                'code': 'UPLOADS_BUSY'
+            }), 503, {'Retry-After': '30'}
+        logger.info(f"Upload {job.id} ({file_format}) queued for pharmacist {pharmacist_id}")
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f"/api/pharmacist/uploads/{job.id}"
+        }), 202
+    
+    except Exception as e:
+        logger.error(f"Error starting upload: {e}", exc_info=True)
+        return jsonify({'error': 'Internal server error', 'code': 'INTERNAL_ERROR'}), 500
+
+@app.route('/api/pharmacist/uploads/<job_id>', methods=['GET'])
+@require_auth
+@limiter.limit("120 per minute")
+def get_pharmacist_upload(job_id):
+    """Report the progress of one of the pharmacist's upload jobs."""
+    try:
+        job = upload_manager.get(job_id)
+        progress = job.to_dict() if job else None
+        # Jobs started by another worker are known through their Firestore mirror
+        if progress is None and db and re.fullmatch(r'[0-9a-f]{24}', job_id):
+            snapshot = db.collection('upload_jobs').document(job_id).get()
+            progress = snapshot.to_dict() if snapshot.exists else None
+        
+        if not progress or progress.get('pharmacist_id') != request.pharmacist_id:
+            return jsonify({'error': 'Upload job not found', 'code': 'JOB_NOT_FOUND'}), 404
+        return jsonify(progress)
+    
+    except Exception as e:
+        logger.error(f"Error reading upload job {job_id}: {e}")
+        return jsonify({'error': 'Failed to fetch upload status', 'code': 'INTERNAL_ERROR'}), 500
+
+def scan_dashboard_counts() -> Dict[str, Any]:
+    """Build rollup-shaped counters from aggregation queries and one projected pass per collection."""
+    public_query = db.collection('public_submissions')
+    pharmacist_query = db.collection('pharmacist_submissions')
+    
+    # Totals are counted server-side; only the group-bys need documents
+    public = aggregate(public_query.limit(DASHBOARD_SCAN_LIMIT), {
+        'locations': GroupCount('location')
+    })
+    pharmacist = aggregate(pharmacist_query.limit(DASHBOARD_SCAN_LIMIT), {
+        'medicines': GroupCount('medicineName'),
+        'categories': GroupCount('category')
+    })
+    
+    return {
+        'public_total': aggregation.count(public_query),
+        'pharmacist_total': aggregation.count(pharmacist_query),
+        'locations': public['locations'],
+        'medicines': pharmacist['medicines'],
+        'categories': pharmacist['categories']
+    }
+
+def fetch_recent_submissions(collection: str, submission_type: str, limit: int,
+                             after: Optional[datetime] = None) -> list:
+    """Return the newest submissions of a collection, optionally only those after a timestamp."""
+    query = db.collection(collection)
+    if after is not None:
+        query = query.where('timestamp', '>', after)
+    submissions = []
+    for doc in query.order_by('timestamp', direction='DESCENDING').limit(limit).stream():
+        data = doc.to_dict()
+        if data is not None:
+            data['id'] = doc.id
+            data['type'] = submission_type
+            submissions.append(data)
+    return submissions
+
 @app.route('/api/dashboard', methods=['GET'])
 @limiter.limit("100 per hour")
-@cache_result(duration=300)  # Cache for 5 minutes
+@cache_result(duration=300, tags=(PUBLIC_TAG, ANTIBIOTICS_TAG))  # Cache for 5 minutes
 def get_dashboard_stats():
-    """Get dashboard statistics with optimized queries and caching."""
+    """Get dashboard statistics with optimized queries and caching.
+
+    With since=<cursor> (the cursor of a previous response) only counter
+    changes and submissions newer than the cursor are returned.
+    """
     try:
+        since = request.args.get('since')
+        try:
+            cursor_time, seen = decode_cursor(since) if since else (None, {})
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor', 'code': 'INVALID_CURSOR'}), 400
+        
         if not db:
             # Fallback data if Firebase is not available
             return jsonify({
@@ -453,92 +962,57 @@ def get_dashboard_stats():
                 'highRiskZones': ['No data available'],
                 'commonAntibiotics': ['No data available'],
                 'recentSubmissions': [],
-                'lastUpdated': datetime.now().isoformat(),
+                'lastUpdated': data_last_updated(PUBLIC_TAG, ANTIBIOTICS_TAG),
                 'cache_status': 'fallback'
             })
         
         # Optimized queries with limits and error handling
         try:
-            # Get counts efficiently
-            public_count = len(list(db.collection('public_submissions').limit(1000).stream()))
-            pharmacist_count = len(list(db.collection('pharmacist_submissions').limit(1000).stream()))
-            total_entries = public_count + pharmacist_count
-            
-            # Get recent submissions with proper ordering
-            recent_public = list(db.collection('public_submissions')
-                               .order_by('timestamp', direction='DESCENDING')
-                               .limit(5).stream())
-            
-            recent_pharmacist = list(db.collection('pharmacist_submissions')
-                                   .order_by('timestamp', direction='DESCENDING')
-                                   .limit(5).stream())
-            
-            # Process recent submissions
-            recent_submissions = []
-            for doc in recent_public:
-                data = doc.to_dict() if doc else None
-                if data is not None:
-                    data['id'] = doc.id
-                    data['type'] = 'public'
-                    # Convert timestamp for JSON serialization
-                    ts = data.get('timestamp')
-                    if ts is not None and hasattr(ts, 'isoformat'):
-                        data['timestamp'] = ts.isoformat()
-                    else:
-                        data['timestamp'] = str(ts) if ts is not None else ''
-                    recent_submissions.append(data)
-            
-            for doc in recent_pharmacist:
-                data = doc.to_dict() if doc else None
-                if data is not None:
-                    data['id'] = doc.id
-                    data['type'] = 'pharmacist'
-                    ts = data.get('timestamp')
-                    if ts is not None and hasattr(ts, 'isoformat'):
-                        data['timestamp'] = ts.isoformat()
-                    else:
-                        data['timestamp'] = str(ts) if ts is not None else ''
-                    recent_submissions.append(data)
-            
-            # Sort by timestamp (already sorted from query, but ensure consistency)
-            recent_submissions.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+            # Read the sharded rollup counters; scan only if they were never built
+            rollup = rollups.read_dashboard_rollup(db)
+            if rollup is None:
+                logger.warning("Dashboard rollups missing, falling back to collection scan (run `flask rebuild-rollups`)")
+                rollup = scan_dashboard_counts()
             
-            # Get high-risk zones with optimized query
-            location_counts = {}
-            public_docs = db.collection('public_submissions').limit(1000).stream()
-            for doc in public_docs:
-                location = doc.to_dict().get('location', 'Unknown')
-                location_counts[location] = location_counts.get(location, 0) + 1
+            # Counters and top-K lists; live subscribers hear about any change
+            summary = dashboard_summary(rollup)
+            event_broadcaster.publish_if_changed('stats', summary)
             
-            high_risk_zones = sorted(location_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-            high_risk_zones = [zone[0] for zone in high_risk_zones] if high_risk_zones else ['No data available']
+            # Get recent submissions with proper ordering (only newer ones in delta mode)
+            recent_limit = RECENT_SUBMISSIONS_LIMIT if since else 5
+            recent_submissions = (
+                fetch_recent_submissions('public_submissions', 'public', recent_limit, after=cursor_time) +
+                fetch_recent_submissions('pharmacist_submissions', 'pharmacist', recent_limit, after=cursor_time)
+            )
+            recent_submissions.sort(key=lambda x: x['timestamp'], reverse=True)
+            recent_submissions = recent_submissions[:RECENT_SUBMISSIONS_LIMIT]
             
-            # Get common antibiotics with optimized query
-            antibiotic_counts = {}
-            pharmacist_docs = db.collection('pharmacist_submissions').limit(1000).stream()
-            for doc in pharmacist_docs:
-                medicine = doc.to_dict().get('medicineName', 'Unknown')
-                antibiotic_counts[medicine] = antibiotic_counts.get(medicine, 0) + 1
+            # The cursor captures exactly what this response contains
+            cursor = encode_cursor(
+                cursors.advance(cursor_time, (data['timestamp'] for data in recent_submissions)),
+                summary
+            )
+            for data in recent_submissions:
+                # Convert timestamp for JSON serialization
+                data['timestamp'] = serialize_timestamp(data['timestamp'])
             
-            common_antibiotics = sorted(antibiotic_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-            common_antibiotics = [med[0] for med in common_antibiotics] if common_antibiotics else ['No data available']
+            if since:
+                return jsonify({
+                    'delta': True,
+                    'cursor': cursor,
+                    'changes': cursors.changes(seen, summary),
+                    'newSubmissions': recent_submissions,
+                    'lastUpdated': data_last_updated(PUBLIC_TAG, ANTIBIOTICS_TAG)
+                })
             
-            # Calculate additional stats for enhanced dashboard
-            total_submissions = public_count
-            resistance_cases = int(total_submissions * 0.15)  # Estimate 15% resistance cases
             misuse_percentage = 35  # Estimated misuse rate
-            countries_affected = len(set([doc.to_dict().get('location', 'Unknown') for doc in db.collection('public_submissions').limit(1000).stream()]))
             
             return jsonify({
-                'totalEntries': total_entries,
-                'total_submissions': total_submissions,
-                'resistance_cases': resistance_cases,
+                **summary,
                 'misuse_percentage': misuse_percentage,
-                'countries_affected': countries_affected,
-                'highRiskZones': high_risk_zones,
-                'commonAntibiotics': common_antibiotics,
-                'recentSubmissions': recent_submissions[:10],
-                'lastUpdated': datetime.now().isoformat(),
+                'recentSubmissions': recent_submissions,
+                'cursor': cursor,
+                'lastUpdated': data_last_updated(PUBLIC_TAG, ANTIBIOTICS_TAG),
                 'cache_status': 'fresh'
             })
             
@@ -547,10 +1021,32 @@ def get_dashboard_stats():
             return jsonify({'error': 'Failed to fetch dashboard data', 'code': 'DATABASE_ERROR'}), 500
     
     except Exception as e:
-        logger.error(f"Error in dashboard stats: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error(f"Error in dashboard stats: {e}", exc_info=True)
         return jsonify({'error': 'Failed to fetch dashboard data', 'code': 'INTERNAL_ERROR'}), 500
 
+@app.route('/api/dashboard/stream', methods=['GET'])
+@limiter.limit("30 per minute")
+def stream_dashboard_events():
+    """Stream live dashboard deltas as Server-Sent Events.
+
+    Clients load /api/dashboard once, then apply 'submission' and 'stats'
+    events; a 'reset' event means events were missed and the snapshot
+    must be reloaded. Reconnects resume from the Last-Event-ID header.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    subscription = event_broadcaster.subscribe(last_event_id)
+    if subscription is None:
+        # Leave this worker's remaining threads to ordinary requests; clients fall back to polling
+        return jsonify({
+            'error': 'Too many live dashboard streams, poll /api/dashboard instead',
+            'code': 'STREAMS_FULL'
+        }), 503, {'Retry-After': '30'}
+    return Response(
+        subscription,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/health', methods=['GET'])
 @limiter.limit("200 per hour")  # More lenient rate limit for health checks
 def health_check():
@@ -559,16 +1055,23 @@ def health_check():
         # Test Firebase connection if available
         firebase_status = "connected" if db else "disconnected"
         
-        # Check cache status
-        cache_size = len(dashboard_cache)
-        cache_status = "healthy" if cache_size < 100 else "warning"
+        # Report cache effectiveness
+        cache_stats = response_cache.stats()
         
         return jsonify({
             'status': 'healthy',
             'firebase_connected': db is not None,
             'firebase_status': firebase_status,
-            'cache_status': cache_status,
-            'cache_size': cache_size,
+            'cache_size': cache_stats['entries'],
+            'cache': cache_stats,
+            'events': event_broadcaster.stats(),
+            'logging': log_pipeline.stats(),
+            'audit_logging': audit_pipeline.stats(),
+            'token_cache': token_cache.stats(),
+            'password_hasher': password_hasher.stats(),
+            'storage': repository.stats() if repository is not None else None,
+            'rate_limits': limiter.storage.stats() if hasattr(limiter.storage, 'stats') else {},
+            'ingest': ingest_log.stats() if ingest_log is not None else {'mode': INGEST_MODE},
             'timestamp': datetime.now().isoformat(),
             'version': '2.0.0',
             'environment': os.getenv('FLASK_ENV', 'development'),
@@ -603,6 +1106,7 @@ def after_request_func(response):
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
     response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
     response.headers['Access-Control-Allow-Credentials'] = 'true'
+    response.headers['Access-Control-Expose-Headers'] = 'ETag, Last-Modified'
     return response
 
 # Authentication endpoints
@@ -642,29 +1146,32 @@ def pharmacist_login():
         if not db:
             return jsonify({'error': 'Invalid credentials', 'code': 'INVALID_CREDENTIALS'}), 401
         
-        # Check if pharmacist exists in Firebase
-        pharmacists_ref = db.collection('pharmacists')
-        query = pharmacists_ref.where('email', '==', email).limit(1).stream()
-        pharmacist_doc = next(query, None)
-        
-        pharmacist_data = pharmacist_doc.to_dict() if pharmacist_doc else None
-        if not pharmacist_data or pharmacist_data.get('password_hash') != hash_password(password):
+        # Check if pharmacist exists (in this worker's directory, or Firebase on a miss)
+        pharmacist = repository.find_pharmacist(email)
+        valid, needs_rehash = password_hasher.verify(password, pharmacist.password_hash if pharmacist else None)
+        if not valid:
             return jsonify({'error': 'Invalid credentials', 'code': 'INVALID_CREDENTIALS'}), 401
         
         # Check if account is active
-        if not pharmacist_data.get('active', True):
+        if not pharmacist.active:
             return jsonify({'error': 'Account is deactivated', 'code': 'ACCOUNT_DEACTIVATED'}), 401
         
+        # Upgrade legacy or outdated hashes while the plain password is at hand
+        if needs_rehash:
+            try:
+                repository.update_pharmacist(email, {'password_hash': hash_password(password)})
+            except HasherBusy:
+                logger.info(f"Deferred password rehash for {email}: hashing pool busy")
+        
         # Generate token
-        pharmacist_id = pharmacist_doc.id if pharmacist_doc else ''
-        token = generate_token(pharmacist_id)
+        token = generate_token(pharmacist.id)
         
         # Return pharmacist data (without password)
         pharmacist_info = {
-            'id': pharmacist_id,
-            'name': pharmacist_data.get('name') if pharmacist_data else '',
-            'email': pharmacist_data.get('email') if pharmacist_data else '',
-            'institution': pharmacist_data.get('institution') if pharmacist_data else ''
+            'id': pharmacist.id,
+            'name': pharmacist.name,
+            'email': pharmacist.email,
+            'institution': pharmacist.institution
         }
         
         logger.info(f"Successful login for pharmacist: {email}")
@@ -676,11 +1183,29 @@ def pharmacist_login():
             'expires_in': JWT_EXPIRATION
         })
         
+    except HasherBusy:
+        return hasher_busy_response()
     except Exception as e:
-        logger.error(f"Login error: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error(f"Login error: {e}", exc_info=True)
         return jsonify({'error': 'Authentication failed', 'code': 'AUTH_FAILED'}), 500
 
+@app.route('/api/auth/pharmacist/logout', methods=['POST'])
+@require_auth
+@limiter.limit("20 per minute")
+def pharmacist_logout():
+    """Revoke the bearer token used for this request."""
+    try:
+        token = request.headers['Authorization'].split(' ')[1]
+        payload = verify_token(token)
+        if payload:
+            revoke_token(token, payload)
+        logger.info(f"Pharmacist {request.pharmacist_id} logged out")
+        return jsonify({'success': True, 'message': 'Logged out'})
+    
+    except Exception as e:
+        logger.error(f"Logout error: {e}", exc_info=True)
+        return jsonify({'error': 'Logout failed', 'code': 'INTERNAL_ERROR'}), 500
+
 @app.route('/api/auth/pharmacist/register', methods=['POST'])
 @limiter.limit("3 per hour")
 def pharmacist_register():
@@ -708,12 +1233,6 @@ def pharmacist_register():
         if not db:
             return jsonify({'error': 'Registration not available in demo mode', 'code': 'REGISTRATION_DISABLED'}), 503
         
-        # Check if pharmacist already exists
-        pharmacists_ref = db.collection('pharmacists')
-        existing = pharmacists_ref.where('email', '==', email).limit(1).stream()
-        if next(existing, None):
-            return jsonify({'error': 'Pharmacist with this email already exists', 'code': 'EMAIL_EXISTS'}), 409
-        
         # Create new pharmacist
         pharmacist_data = {
             'name': sanitize_input(str(data.get('name') or '')),
@@ -725,8 +1244,10 @@ def pharmacist_register():
             'last_login': None
         }
         
-        doc_ref = pharmacists_ref.add(pharmacist_data)
-        pharmacist_id = doc_ref[1].id if doc_ref and len(doc_ref) > 1 and doc_ref[1] is not None else ''
+        # None when the email is already registered
+        pharmacist_id = repository.create_pharmacist(pharmacist_data)
+        if pharmacist_id is None:
+            return jsonify({'error': 'Pharmacist with this email already exists', 'code': 'EMAIL_EXISTS'}), 409
         token = generate_token(pharmacist_id)
         pharmacist_info = {
             'id': pharmacist_id,
@@ -744,17 +1265,35 @@ def pharmacist_register():
             'expires_in': JWT_EXPIRATION
         }), 201
         
+    except HasherBusy:
+        return hasher_busy_response()
     except Exception as e:
-        logger.error(f"Registration error: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error(f"Registration error: {e}", exc_info=True)
         return jsonify({'error': 'Registration failed', 'code': 'REGISTRATION_FAILED'}), 500
 
 @app.route('/api/pharmacist/dashboard', methods=['GET'])
 @require_auth
+@cache_result(
+    duration=300,
+    # The month is part of the key because monthly trends roll over without any write
+    key_func=lambda: f"pharmacist_dashboard:{request.pharmacist_id}:{datetime.now():%Y-%m}:{request.full_path}",
+    tags=lambda: [pharmacist_tag(request.pharmacist_id)]
+)
 def get_pharmacist_dashboard():
-    """Get pharmacist-specific dashboard data with analytics."""
+    """Get pharmacist-specific dashboard data with analytics.
+
+    With since=<cursor> only counter changes, the pharmacist's submissions
+    newer than the cursor and the region/month counts they add are returned.
+    When more than PHARMACIST_DELTA_LIMIT submissions are newer, the delta
+    is only {'resync': true} and the client must reload without since.
+    """
     try:
         pharmacist_id = getattr(request, 'pharmacist_id', None)
+        since = request.args.get('since')
+        try:
+            cursor_time, seen = decode_cursor(since) if since else (None, {})
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor', 'code': 'INVALID_CURSOR'}), 400
         
         if not db:
             # Fallback data for demo mode
@@ -763,48 +1302,77 @@ def get_pharmacist_dashboard():
                 'monthly_submissions': 0,
                 'resistance_cases': 0,
                 'success_rate': 85,
-                'recent_submissions': [],
                 'monthly_trends': [],
                 'region_counts': {},
-                'submissions': [],
-                'lastUpdated': datetime.now().isoformat()
+                'lastUpdated': data_last_updated(pharmacist_tag(pharmacist_id))
             })
         
         # Get pharmacist's submissions
-        pharmacist_submissions = list(db.collection('pharmacist_submissions')
-                                    .where('pharmacist_id', '==', pharmacist_id)
-                                    .order_by('timestamp', direction='DESCENDING')
-                                    .limit(100).stream())
+        own_submissions = db.collection('pharmacist_submissions').where('pharmacist_id', '==', pharmacist_id)
+        
+        # Calculate statistics (exact server-side counts, not limited to the page below)
+        current_date = datetime.now()
+        total_submissions = aggregation.count(own_submissions)
+        month_start = current_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        monthly_submissions = aggregation.count(own_submissions.where('timestamp', '>=', month_start))
+        counters = {
+            'total_submissions': total_submissions,
+            'monthly_submissions': monthly_submissions,
+            'resistance_cases': int(total_submissions * 0.15),  # Estimate 15% resistance cases
+            'success_rate': 85 if total_submissions > 0 else 0,  # Base success rate
+            'total_quantity': aggregation.sum_field(own_submissions, 'quantity')
+        }
+        
+        # In delta mode only submissions newer than the cursor are read
+        if since and cursor_time is not None:
+            own_submissions = own_submissions.where('timestamp', '>', cursor_time)
+        # One row past the delta limit tells a complete delta from a truncated one
+        page_size = PHARMACIST_DELTA_LIMIT + 1 if since else 100
+        pharmacist_submissions = (own_submissions
+                                  .order_by('timestamp', direction='DESCENDING')
+                                  .limit(page_size))
         
         # Process submissions
-        submissions = []
-        total_quantity = 0
-        categories = defaultdict(int)
-        regions = defaultdict(int)
-        monthly_data = defaultdict(int)
-        
-        for doc in pharmacist_submissions:
-            data = doc.to_dict()
-            if data:
-                data['id'] = doc.id
-                ts = data.get('timestamp')
-                if ts is not None and hasattr(ts, 'isoformat'):
-                    data['timestamp'] = ts.isoformat()
-                    # Extract month for trends
-                    if hasattr(ts, 'month'):
-                        month_key = f"{ts.year}-{ts.month:02d}"
-                        monthly_data[month_key] += 1
-                else:
-                    data['timestamp'] = str(ts) if ts is not None else ''
-                
-                submissions.append(data)
-                total_quantity += data.get('quantity', 0)
-                categories[data.get('category', 'Unknown')] += 1
-                regions[data.get('region', 'Unknown')] += 1
+        # One pass over the query feeds every statistic; full loads only need the
+        # newest timestamp (for the cursor), the list itself is served by
+        # /api/pharmacist/submissions
+        stats = aggregate(pharmacist_submissions, {
+            'submissions': RecentN(page_size) if since else RecentN(1, fields=()),
+            'regions': GroupCount('region'),
+            'monthly': GroupCount('timestamp', key=timestamp_month)
+        })
+        
+        submissions = stats['submissions']
+        if since and len(submissions) > PHARMACIST_DELTA_LIMIT:
+            # The region and month counts would miss the rows past the limit
+            return jsonify({
+                'delta': True,
+                'resync': True,
+                'lastUpdated': data_last_updated(pharmacist_tag(pharmacist_id))
+            })
+        cursor = encode_cursor(
+            cursors.advance(cursor_time, (data.get('timestamp') for data in submissions)),
+            counters
+        )
+        for data in submissions:
+            data['timestamp'] = serialize_timestamp(data.get('timestamp'))
+        regions = stats['regions']
+        monthly_data = stats['monthly']
+        
+        if since:
+            # Region and month counts of the new submissions, to add to the client's totals
+            return jsonify({
+                'delta': True,
+                'cursor': cursor,
+                'changes': cursors.changes(seen, counters),
+                'newSubmissions': submissions,
+                'region_counts': regions,
+                'monthly_counts': monthly_data,
+                'lastUpdated': data_last_updated(pharmacist_tag(pharmacist_id))
+            })
         
         # Calculate monthly trends (last 6 months)
         monthly_trends = []
-        current_date = datetime.now()
         for i in range(6):
             month_date = current_date.replace(day=1) - timedelta(days=i*30)
             month_key = f"{month_date.year}-{month_date.month:02d}"
@@ -814,29 +1382,93 @@ def get_pharmacist_dashboard():
             })
         monthly_trends.reverse()
         
-        # Calculate statistics
-        total_submissions = len(submissions)
-        monthly_submissions = monthly_data.get(f"{current_date.year}-{current_date.month:02d}", 0)
-        resistance_cases = int(total_submissions * 0.15)  # Estimate 15% resistance cases
-        success_rate = 85 if total_submissions > 0 else 0  # Base success rate
-        
         return jsonify({
-            'total_submissions': total_submissions,
-            'monthly_submissions': monthly_submissions,
-            'resistance_cases': resistance_cases,
-            'success_rate': success_rate,
-            'recent_submissions': submissions[:10],
+            **counters,
             'monthly_trends': monthly_trends,
-            'region_counts': dict(regions),
-            'submissions': submissions,
-            'lastUpdated': datetime.now().isoformat()
+            'region_counts': regions,
+            'cursor': cursor,
+            'lastUpdated': data_last_updated(pharmacist_tag(pharmacist_id))
         })
         
     except Exception as e:
-        logger.error(f"Pharmacist dashboard error: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.error(f"Pharmacist dashboard error: {e}", exc_info=True)
         return jsonify({'error': 'Failed to fetch dashboard data', 'code': 'DASHBOARD_ERROR'}), 500
 
+@app.route('/api/pharmacist/submissions', methods=['GET'])
+@require_auth
+@limiter.limit("60 per minute")
+@cache_result(
+    duration=300,
+    key_func=lambda: f"pharmacist_submissions:{request.pharmacist_id}:{request.full_path}",
+    tags=lambda: [pharmacist_tag(request.pharmacist_id)]
+)
+def list_pharmacist_submissions():
+    """List the pharmacist's submissions, newest first, one keyset page at a time.
+
+    Query parameters: page_size (1-100), fields (comma-separated subset of
+    the submission fields) and cursor (next_cursor of the previous page).
+    Each page costs page_size + 1 document reads however deep it is.
+    """
+    try:
+        pharmacist_id = getattr(request, 'pharmacist_id', None)
+        
+        try:
+            page_size = int(request.args.get('page_size', SUBMISSIONS_PAGE_SIZE))
+        except ValueError:
+            page_size = 0
+        if not 1 <= page_size <= SUBMISSIONS_MAX_PAGE_SIZE:
+            return jsonify({'error': f'page_size must be between 1 and {SUBMISSIONS_MAX_PAGE_SIZE}', 'code': 'INVALID_PAGE_SIZE'}), 400
+        
+        requested_fields = request.args.get('fields')
+        fields = ([field.strip() for field in requested_fields.split(',') if field.strip()]
+                  if requested_fields else list(SUBMISSION_LIST_FIELDS))
+        unknown_fields = sorted(set(fields) - set(SUBMISSION_LIST_FIELDS))
+        if unknown_fields:
+            return jsonify({'error': f'Unknown fields: {", ".join(unknown_fields)}', 'code': 'INVALID_FIELD'}), 400
+        
+        page_token = request.args.get('cursor')
+        try:
+            position = decode_page_token(page_token) if page_token else None
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor', 'code': 'INVALID_CURSOR'}), 400
+        
+        if not db:
+            return jsonify({'submissions': [], 'next_cursor': None, 'page_size': page_size})
+        
+        # Document id breaks timestamp ties so every page boundary is exact
+        query = (db.collection('pharmacist_submissions')
+                 .where('pharmacist_id', '==', pharmacist_id)
+                 .order_by('timestamp', direction='DESCENDING')
+                 .order_by('__name__', direction='DESCENDING')
+                 .select(sorted(set(fields) | {'timestamp'})))
+        if position is not None:
+            query = query.start_after({'timestamp': position[0], '__name__': position[1]})
+        
+        # One extra document tells whether another page exists
+        docs = list(query.limit(page_size + 1).stream())
+        has_more = len(docs) > page_size
+        
+        submissions = []
+        last_timestamp = None
+        for doc in docs[:page_size]:
+            data = doc.to_dict() or {}
+            last_timestamp = data.get('timestamp')
+            submission = {'id': doc.id}
+            submission.update({field: data.get(field) for field in fields})
+            if 'timestamp' in submission:
+                submission['timestamp'] = serialize_timestamp(submission['timestamp'])
+            submissions.append(submission)
+        
+        return jsonify({
+            'submissions': submissions,
+            'next_cursor': encode_page_token(last_timestamp, submissions[-1]['id']) if has_more else None,
+            'page_size': page_size
+        })
+    
+    except Exception as e:
+        logger.error(f"Submissions listing error: {e}", exc_info=True)
+        return jsonify({'error': 'Failed to fetch submissions', 'code': 'SUBMISSIONS_ERROR'}), 500
+
 @app.route('/api/cache/clear', methods=['POST'])
 @require_auth
 def clear_cache_endpoint():
@@ -851,5 +1483,36 @@ def clear_cache_endpoint():
         logger.error(f"Cache clear error: {e}")
         return jsonify({'error': 'Failed to clear cache', 'code': 'CACHE_ERROR'}), 500
 
+@app.cli.command('deactivate-pharmacist')
+@click.argument('pharmacist_id')
+def deactivate_pharmacist_command(pharmacist_id):
+    """Deactivate a pharmacist account and revoke all of its tokens."""
+    if not db:
+        logger.error("Cannot deactivate pharmacists without a database connection")
+        return
+    db.collection('pharmacists').document(pharmacist_id).update({'active': False})
+    revoke_pharmacist_tokens(pharmacist_id)
+    logger.info(f"Pharmacist {pharmacist_id} deactivated; tokens revoked within {TOKEN_REVOCATION_SYNC:.0f}s on every worker")
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute dashboard rollup counters from the submission collections."""
+    if not db:
+        logger.error("Cannot rebuild rollups without a database connection")
+        return
+    rollup = rollups.rebuild_rollups(db)
+    logger.info(f"Rollups rebuilt: {rollup['public_total']} public, {rollup['pharmacist_total']} pharmacist submissions")
+
+# Pharmacist accounts; its directory loads at import so the first logins in each worker find it warm
+repository = None
+if db:
+    repository = FirestoreRepository(db, refresh_interval=float(os.getenv('PHARMACIST_DIRECTORY_REFRESH', 60)))
+
+# Started at import so each worker replays logs left by dead workers without waiting for traffic
+ingest_log = None
+if INGEST_MODE == 'log' and db:
+    ingest_log = IngestLog(INGEST_LOG_DIR, write_public_records, batch_size=FIRESTORE_BATCH_LIMIT - 1)
+    ingest_log.start()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -5,8 +5,11 @@ import logging
 from datetime import datetime
 from dotenv import load_dotenv
 import jwt
-import hashlib
 import secrets
+from schemas import PHARMACIST_SUBMISSION, PUBLIC_SUBMISSION
+from repository import create_repository
+from passwords import HasherBusy, create_hasher
+from db_pool import PoolTimeout
 
 # Load environment variables
 load_dotenv()
@@ -22,10 +25,14 @@ CORS(app, origins=['http://localhost:5173', 'https://your-domain.com'])
 JWT_SECRET = os.getenv('JWT_SECRET_KEY', secrets.token_hex(32))
 JWT_EXPIRATION = 24 * 60 * 60  # 24 hours
 
+# A local SQLite file by default; STORAGE_BACKEND=supabase or firestore for the real databases
+repository = create_repository(os.getenv('STORAGE_BACKEND', 'sqlite'), path=os.getenv('SQLITE_PATH'))
+
+password_hasher = create_hasher()
+
 def hash_password(password: str) -> str:
-    """Simple password hashing"""
-    salt = os.getenv('PASSWORD_SALT', 'amr_salt_2024')
-    return hashlib.sha256((password + salt).encode()).hexdigest()
+    """Hash password with scrypt on the bounded hashing pool"""
+    return password_hasher.hash(password)
 
 def generate_token(user_id: str) -> str:
     """Generate JWT token"""
@@ -77,19 +84,24 @@ def submit_public_data():
     try:
         data = request.json or {}
         
-        # Simple validation
-        required_fields = ['symptoms', 'medication', 'duration', 'location']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
+        # Same validation as the production apps
+        fields, error = PUBLIC_SUBMISSION(data)
+        if error:
+            return jsonify(error), 400
         
-        # Log the submission (in production, save to Supabase)
-        logger.info(f"Public submission: {data}")
+        saved = repository.save_public_submissions([{
+            **fields,
+            'created_at': datetime.now().isoformat(),
+            'ip_address': request.remote_addr,
+            'user_agent': request.headers.get('User-Agent', 'Unknown')
+        }])[0]
+        logger.info(f"Public submission: {fields}")
         
         return jsonify({
             'success': True,
             'message': 'Data submitted successfully',
-            'timestamp': datetime.now().isoformat()
+            'id': saved['id'],
+            'timestamp': saved['created_at']
         })
     
     except Exception as e:
@@ -103,19 +115,30 @@ def submit_pharmacist_data():
     try:
         data = request.json or {}
         
-        # Simple validation
-        required_fields = ['medicineName', 'category', 'quantity', 'region']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
+        # Same validation as the production apps
+        fields, error = PHARMACIST_SUBMISSION(data)
+        if error:
+            return jsonify(error), 400
         
-        # Log the submission (in production, save to Supabase)
-        logger.info(f"Pharmacist submission from {request.user_id}: {data}")
+        saved = repository.save_pharmacist_submissions([{
+            'medicine_name': fields['medicineName'],
+            'category': fields['category'],
+            'quantity': fields['quantity'],
+            'region': fields['region'],
+            'pharmacist_id': request.user_id,
+            'created_at': datetime.now().isoformat(),
+            'ip_address': request.remote_addr,
+            'user_agent': request.headers.get('User-Agent', 'Unknown')
+        }])
+        if not saved:
+            return jsonify({'error': 'Failed to save data'}), 500
+        logger.info(f"Pharmacist submission from {request.user_id}: {fields}")
         
         return jsonify({
             'success': True,
             'message': 'Prescription logged successfully',
-            'timestamp': datetime.now().isoformat()
+            'id': saved[0]['id'],
+            'timestamp': saved[0]['created_at']
         })
     
     except Exception as e:
@@ -125,18 +148,13 @@ def submit_pharmacist_data():
 # Dashboard data
 @app.route('/api/dashboard', methods=['GET'])
 def get_dashboard_stats():
-    # Simple mock data (in production, fetch from Supabase)
-    return jsonify({
-        'totalEntries': 150,
-        'total_submissions': 120,
-        'resistance_cases': 18,
-        'misuse_percentage': 25,
-        'countries_affected': 8,
-        'highRiskZones': ['North America', 'Europe', 'Asia'],
-        'commonAntibiotics': ['Amoxicillin', 'Azithromycin', 'Ciprofloxacin'],
-        'recentSubmissions': [],
-        'lastUpdated': datetime.now().isoformat()
-    })
+    try:
+        stats = repository.dashboard_stats()
+        stats['lastUpdated'] = datetime.now().isoformat()
+        return jsonify(stats)
+    except Exception as e:
+        logger.error(f"Error getting dashboard stats: {e}")
+        return jsonify({'error': 'Failed to fetch dashboard data'}), 500
 
 # Authentication
 @app.route('/api/auth/pharmacist/login', methods=['POST'])
@@ -149,7 +167,7 @@ def pharmacist_login():
         if not email or not password:
             return jsonify({'error': 'Email and password are required'}), 400
         
-        # Demo credentials (in production, check Supabase)
+        # Demo credentials work without an account
         if email == 'demo@amrx.com' and password == 'demo123':
             demo_pharmacist = {
                 'id': 'demo_pharmacist',
@@ -164,8 +182,31 @@ def pharmacist_login():
                 'pharmacist': demo_pharmacist
             })
         
-        return jsonify({'error': 'Invalid credentials'}), 401
+        # A missing pharmacist costs the same hash as a wrong password
+        pharmacist = repository.find_pharmacist(email)
+        valid, needs_rehash = password_hasher.verify(password, pharmacist.password_hash if pharmacist else None)
+        if not valid or not pharmacist.active:
+            return jsonify({'error': 'Invalid credentials'}), 401
+        
+        if needs_rehash:
+            try:
+                repository.update_pharmacist(email, {'password_hash': hash_password(password)})
+            except (HasherBusy, PoolTimeout):
+                pass  # Upgraded on a later login
+        
+        return jsonify({
+            'success': True,
+            'token': generate_token(pharmacist.id),
+            'pharmacist': {
+                'id': pharmacist.id,
+                'name': pharmacist.name,
+                'email': pharmacist.email,
+                'institution': pharmacist.institution
+            }
+        })
         
+    except (HasherBusy, PoolTimeout):
+        return jsonify({'error': 'Too many sign-in attempts in progress, try again shortly'}), 503, {'Retry-After': '1'}
     except Exception as e:
         logger.error(f"Login error: {e}")
         return jsonify({'error': 'Authentication failed'}), 500
@@ -187,15 +228,26 @@ def pharmacist_register():
         if len(password) < 6:
             return jsonify({'error': 'Password must be at least 6 characters'}), 400
         
-        # In production, save to Supabase
+        pharmacist_data = {
+            'name': data.get('name'),
+            'email': email,
+            'password_hash': hash_password(password),
+            'institution': data.get('institution'),
+            'created_at': datetime.now().isoformat(),
+            'active': True
+        }
+        
+        if repository.create_pharmacist(pharmacist_data) is None:
+            return jsonify({'error': 'Pharmacist with this email already exists'}), 409
         logger.info(f"New pharmacist registration: {email}")
         
-        # For demo, just return success
         return jsonify({
             'success': True,
             'message': 'Registration successful. Please login.'
         }), 201
         
+    except (HasherBusy, PoolTimeout):
+        return jsonify({'error': 'Too many registrations in progress, try again shortly'}), 503, {'Retry-After': '1'}
     except Exception as e:
         logger.error(f"Registration error: {e}")
         return jsonify({'error': 'Registration failed'}), 500
@@ -204,18 +256,13 @@ def pharmacist_register():
 @app.route('/api/pharmacist/dashboard', methods=['GET'])
 @require_auth
 def get_pharmacist_dashboard():
-    # Simple mock data (in production, fetch from Supabase)
-    return jsonify({
-        'total_submissions': 25,
-        'monthly_submissions': 8,
-        'resistance_cases': 4,
-        'success_rate': 85,
-        'recent_submissions': [],
-        'monthly_trends': [],
-        'region_counts': {},
-        'submissions': [],
-        'lastUpdated': datetime.now().isoformat()
-    })
+    try:
+        stats = repository.pharmacist_dashboard(request.user_id)
+        stats['lastUpdated'] = datetime.now().isoformat()
+        return jsonify(stats)
+    except Exception as e:
+        logger.error(f"Error getting pharmacist dashboard: {e}")
+        return jsonify({'error': 'Failed to fetch dashboard data'}), 500
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -5,17 +5,26 @@ import logging
 from datetime import datetime
 from dotenv import load_dotenv
 import jwt
-import hashlib
 import secrets
-from supabase_config import SupabaseService
+from functools import wraps
+import uuid
+from repository import create_repository
+from passwords import HasherBusy, create_hasher
+from log_pipeline import configure_logging
+from ingest import IngestLog
+import bulk
+from schemas import PHARMACIST_SUBMISSION, PUBLIC_SUBMISSION
+from cursors import InvalidCursor, decode_page_token, encode_page_token
+from db_pool import PoolTimeout
 
 # Load environment variables
 load_dotenv()
 
-# Production logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Production logging: console by default, plus JSON lines when LOG_FILE is set; written off the request thread
+log_pipeline = configure_logging(
+    path=os.getenv('LOG_FILE'),
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    queue_size=int(os.getenv('LOG_QUEUE_SIZE', 10000))
 )
 logger = logging.getLogger(__name__)
 
@@ -32,13 +41,27 @@ CORS(app, origins=[
 JWT_SECRET = os.getenv('JWT_SECRET_KEY', secrets.token_hex(32))
 JWT_EXPIRATION = 24 * 60 * 60  # 24 hours
 
-# Initialize Supabase service
-supabase_service = SupabaseService()
+# Maximum records per bulk upload
+PHARMACIST_BATCH_MAX_ROWS = int(os.getenv('PHARMACIST_BATCH_MAX_ROWS', 1000))
+
+# Page sizes of /api/pharmacist/submissions
+SUBMISSIONS_PAGE_SIZE = 25
+SUBMISSIONS_MAX_PAGE_SIZE = 100
+
+# Storage: 'supabase' (default), 'sqlite' for a single node or load tests, or 'firestore'
+repository = create_repository(os.getenv('STORAGE_BACKEND', 'supabase'), path=os.getenv('SQLITE_PATH'))
+
+# 'log' acknowledges public submissions once fsynced locally and inserts them in the background
+ingest_log = None
+if os.getenv('INGEST_MODE', 'sync') == 'log':
+    ingest_log = IngestLog(os.getenv('INGEST_LOG_DIR', 'ingest_log'), repository.save_public_submissions, batch_size=500)
+    ingest_log.start()
+
+password_hasher = create_hasher()
 
 def hash_password(password: str) -> str:
-    """Hash password with salt"""
-    salt = os.getenv('PASSWORD_SALT', 'amr_salt_2024')
-    return hashlib.sha256((password + salt).encode()).hexdigest()
+    """Hash password with scrypt on the bounded hashing pool"""
+    return password_hasher.hash(password)
 
 def generate_token(user_id: str) -> str:
     """Generate JWT token"""
@@ -57,8 +80,13 @@ def verify_token(token: str) -> dict:
     except:
         return None
 
+def database_busy():
+    """503 for requests that found every pooled database client in use"""
+    return jsonify({'error': 'Database busy, try again shortly'}), 503, {'Retry-After': '1'}
+
 def require_auth(f):
     """Authentication decorator"""
+    @wraps(f)
     def decorated(*args, **kwargs):
         auth_header = request.headers.get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
@@ -80,42 +108,43 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'version': '1.0.0',
-        'environment': os.getenv('FLASK_ENV', 'production')
+        'environment': os.getenv('FLASK_ENV', 'production'),
+        'storage': repository.stats()
     })
 
 # Public data submission
 @app.route('/api/public', methods=['POST'])
 def submit_public_data():
     try:
-        data = request.json or {}
-        
         # Validation
-        required_fields = ['symptoms', 'medication', 'duration', 'location']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
+        fields, error = PUBLIC_SUBMISSION(request.json or {})
+        if error:
+            return jsonify(error), 400
         
-        # Prepare data for Supabase
         submission_data = {
-            'symptoms': data.get('symptoms'),
-            'medication': data.get('medication'),
-            'duration': int(data.get('duration', 0)),
-            'location': data.get('location'),
+            **fields,
             'created_at': datetime.now().isoformat(),
             'ip_address': request.remote_addr,
             'user_agent': request.headers.get('User-Agent', 'Unknown')
         }
         
-        # Save to Supabase
-        result = supabase_service.save_public_submission(submission_data)
+        if ingest_log is not None:
+            # Ids are assigned here so a replayed insert is recognized and skipped
+            submission_data['id'] = str(uuid.uuid4())
+            ingest_log.append(submission_data)
+            result = {'id': submission_data['id']}
+        else:
+            result = repository.save_public_submissions([submission_data])[0]
         
         return jsonify({
             'success': True,
             'message': 'Data submitted successfully',
             'id': result.get('id'),
             'timestamp': submission_data['created_at']
-        })
+        }), 202 if ingest_log is not None else 200
     
+    except PoolTimeout:
+        return database_busy()
     except Exception as e:
         logger.error(f"Error in public submission: {e}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -125,28 +154,26 @@ def submit_public_data():
 @require_auth
 def submit_pharmacist_data():
     try:
-        data = request.json or {}
-        
         # Validation
-        required_fields = ['medicineName', 'category', 'quantity', 'region']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
+        fields, error = PHARMACIST_SUBMISSION(request.json or {})
+        if error:
+            return jsonify(error), 400
         
-        # Prepare data for Supabase
         submission_data = {
-            'medicine_name': data.get('medicineName'),
-            'category': data.get('category'),
-            'quantity': int(data.get('quantity', 0)),
-            'region': data.get('region'),
+            'medicine_name': fields['medicineName'],
+            'category': fields['category'],
+            'quantity': fields['quantity'],
+            'region': fields['region'],
             'pharmacist_id': request.user_id,
             'created_at': datetime.now().isoformat(),
             'ip_address': request.remote_addr,
             'user_agent': request.headers.get('User-Agent', 'Unknown')
         }
         
-        # Save to Supabase
-        result = supabase_service.save_pharmacist_submission(submission_data)
+        saved = repository.save_pharmacist_submissions([submission_data])
+        if not saved:
+            return jsonify({'error': 'Failed to save data'}), 500
+        result = saved[0]
         
         return jsonify({
             'success': True,
@@ -155,17 +182,70 @@ def submit_pharmacist_data():
             'timestamp': submission_data['created_at']
         })
     
+    except PoolTimeout:
+        return database_busy()
     except Exception as e:
         logger.error(f"Error in pharmacist submission: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# Bulk pharmacist data submission (JSON array or NDJSON)
+@app.route('/api/pharmacist/batch', methods=['POST'])
+@require_auth
+def submit_pharmacist_batch():
+    try:
+        try:
+            rows, errors = bulk.parse_rows(request.get_data(), request.mimetype, PHARMACIST_BATCH_MAX_ROWS)
+        except bulk.BulkBodyError as e:
+            return jsonify({'error': str(e), 'code': e.code}), 400
+        received = len(rows) + len(errors)
+        
+        # Validate every row and prepare the valid ones for one multi-row insert
+        created_at = datetime.now().isoformat()
+        checked, row_errors = PHARMACIST_SUBMISSION.validate_many(rows)
+        errors.extend(row_errors)
+        valid = [(index, {
+            'medicine_name': fields['medicineName'],
+            'category': fields['category'],
+            'quantity': fields['quantity'],
+            'region': fields['region'],
+            'pharmacist_id': request.user_id,
+            'created_at': created_at,
+            'ip_address': request.remote_addr,
+            'user_agent': request.headers.get('User-Agent', 'Unknown')
+        }) for index, fields in checked]
+        
+        saved = repository.save_pharmacist_submissions([record for _, record in valid]) if valid else []
+        for index, _ in valid[len(saved):]:
+            errors.append({'row': index, 'error': 'Failed to save data', 'code': 'DATABASE_ERROR'})
+        errors.sort(key=lambda error: error['row'])
+        
+        if not saved and errors:
+            status = 500 if any(error['code'] == 'DATABASE_ERROR' for error in errors) else 400
+        else:
+            status = 200
+        return jsonify({
+            'success': not errors,
+            'received': received,
+            'inserted': len(saved),
+            'ids': [record.get('id') for record in saved],
+            'errors': errors
+        }), status
+    
+    except PoolTimeout:
+        return database_busy()
+    except Exception as e:
+        logger.error(f"Error in pharmacist batch submission: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 # Dashboard data
 @app.route('/api/dashboard', methods=['GET'])
 def get_dashboard_stats():
     try:
-        stats = supabase_service.get_dashboard_stats()
+        stats = repository.dashboard_stats()
         stats['lastUpdated'] = datetime.now().isoformat()
         return jsonify(stats)
+    except PoolTimeout:
+        return database_busy()
     except Exception as e:
         logger.error(f"Error getting dashboard stats: {e}")
         return jsonify({'error': 'Failed to fetch dashboard data'}), 500
@@ -181,19 +261,48 @@ def pharmacist_login():
         if not email or not password:
             return jsonify({'error': 'Email and password are required'}), 400
         
-        # Authenticate with Supabase
-        pharmacist = supabase_service.authenticate_pharmacist(email, password)
+        # Without a database only the demo pharmacist exists
+        if repository.demo:
+            if email == 'demo@amrx.com' and password == 'demo123':
+                return jsonify({
+                    'success': True,
+                    'token': generate_token('demo_pharmacist'),
+                    'pharmacist': {
+                        'id': 'demo_pharmacist',
+                        'name': 'Demo Pharmacist',
+                        'email': email,
+                        'institution': 'Demo Hospital'
+                    }
+                })
+            return jsonify({'error': 'Invalid credentials'}), 401
         
-        if pharmacist:
-            token = generate_token(pharmacist['id'])
-            return jsonify({
-                'success': True,
-                'token': token,
-                'pharmacist': pharmacist
-            })
+        # A missing pharmacist costs the same hash as a wrong password
+        pharmacist = repository.find_pharmacist(email)
+        valid, needs_rehash = password_hasher.verify(password, pharmacist.password_hash if pharmacist else None)
+        if not valid or not pharmacist.active:
+            return jsonify({'error': 'Invalid credentials'}), 401
         
-        return jsonify({'error': 'Invalid credentials'}), 401
+        if needs_rehash:
+            try:
+                repository.update_pharmacist(email, {'password_hash': hash_password(password)})
+            except (HasherBusy, PoolTimeout):
+                pass  # Upgraded on a later login
         
+        return jsonify({
+            'success': True,
+            'token': generate_token(pharmacist.id),
+            'pharmacist': {
+                'id': pharmacist.id,
+                'name': pharmacist.name,
+                'email': pharmacist.email,
+                'institution': pharmacist.institution
+            }
+        })
+        
+    except HasherBusy:
+        return jsonify({'error': 'Too many sign-in attempts in progress, try again shortly'}), 503, {'Retry-After': '1'}
+    except PoolTimeout:
+        return database_busy()
     except Exception as e:
         logger.error(f"Login error: {e}")
         return jsonify({'error': 'Authentication failed'}), 500
@@ -215,7 +324,6 @@ def pharmacist_register():
         if len(password) < 6:
             return jsonify({'error': 'Password must be at least 6 characters'}), 400
         
-        # Prepare data for Supabase
         pharmacist_data = {
             'name': data.get('name'),
             'email': email,
@@ -225,17 +333,18 @@ def pharmacist_register():
             'active': True
         }
         
-        # Register in Supabase
-        success = supabase_service.register_pharmacist(pharmacist_data)
+        if repository.create_pharmacist(pharmacist_data) is None:
+            return jsonify({'error': 'Pharmacist with this email already exists'}), 409
         
-        if success:
-            return jsonify({
-                'success': True,
-                'message': 'Registration successful. Please login.'
-            }), 201
-        else:
-            return jsonify({'error': 'Registration failed'}), 500
+        return jsonify({
+            'success': True,
+            'message': 'Registration successful. Please login.'
+        }), 201
         
+    except HasherBusy:
+        return jsonify({'error': 'Too many sign-in attempts in progress, try again shortly'}), 503, {'Retry-After': '1'}
+    except PoolTimeout:
+        return database_busy()
     except Exception as e:
         logger.error(f"Registration error: {e}")
         return jsonify({'error': 'Registration failed'}), 500
@@ -245,22 +354,58 @@ def pharmacist_register():
 @require_auth
 def get_pharmacist_dashboard():
     try:
-        # In production, fetch pharmacist-specific data from Supabase
-        return jsonify({
-            'total_submissions': 25,
-            'monthly_submissions': 8,
-            'resistance_cases': 4,
-            'success_rate': 85,
-            'recent_submissions': [],
-            'monthly_trends': [],
-            'region_counts': {},
-            'submissions': [],
-            'lastUpdated': datetime.now().isoformat()
-        })
+        stats = repository.pharmacist_dashboard(request.user_id)
+        stats['lastUpdated'] = datetime.now().isoformat()
+        return jsonify(stats)
+    except PoolTimeout:
+        return database_busy()
     except Exception as e:
         logger.error(f"Error getting pharmacist dashboard: {e}")
         return jsonify({'error': 'Failed to fetch dashboard data'}), 500
 
+# Pharmacist submissions, newest first, one keyset page at a time
+@app.route('/api/pharmacist/submissions', methods=['GET'])
+@require_auth
+def list_pharmacist_submissions():
+    try:
+        try:
+            page_size = int(request.args.get('page_size', SUBMISSIONS_PAGE_SIZE))
+        except ValueError:
+            page_size = 0
+        if not 1 <= page_size <= SUBMISSIONS_MAX_PAGE_SIZE:
+            return jsonify({'error': f'page_size must be between 1 and {SUBMISSIONS_MAX_PAGE_SIZE}'}), 400
+        
+        page_token = request.args.get('cursor')
+        try:
+            position = decode_page_token(page_token) if page_token else None
+            submissions, has_more = repository.list_pharmacist_submissions(request.user_id, page_size, position)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        next_cursor = None
+        if has_more:
+            last = submissions[-1]
+            next_cursor = encode_page_token(datetime.fromisoformat(last['created_at']), str(last['id']))
+        
+        return jsonify({
+            'submissions': submissions,
+            'next_cursor': next_cursor,
+            'page_size': page_size
+        })
+    except PoolTimeout:
+        return database_busy()
+    except Exception as e:
+        logger.error(f"Error listing pharmacist submissions: {e}")
+        return jsonify({'error': 'Failed to fetch submissions'}), 500
+
+@app.cli.command('refresh-dashboard-views')
+def refresh_dashboard_views_command():
+    """Run the Supabase dashboard upkeep (views or partitions), for databases without pg_cron"""
+    if repository.name != 'supabase':
+        logger.error(f"Dashboard views only exist on Supabase, not {repository.name}")
+        return
+    repository.service.refresh_dashboard_views()
+    logger.info("Dashboard views refreshed")
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV') == 'development'
@@ -0,0 +1,375 @@
+"""
+Audit store for AMR-X Backend
+Keeps the submission audit trail out of app.log in hourly NDJSON segment
+files, one per worker per hour. Every segment has a sparse timestamp index
+(one fixed-size entry every few records), and a sealed segment also has a
+key index that maps each IP address and pharmacist id to its records'
+offsets. The reader memory-maps segments, jumps to a time range through
+the sparse index and to an IP or pharmacist through the key index, so
+queries read only the records they return. configure_audit_logging()
+routes the amrx.audit logger to the store through its own listener thread,
+and stops its records from reaching the root logger and app.log.
+
+Query from the command line:
+
+    python audit_store.py query --since 2026-10-16 --until 2026-10-17 --ip 203.0.113.7
+"""
+
+import argparse
+import bisect
+import glob
+import heapq
+import json
+import logging
+import mmap
+import os
+import secrets
+import struct
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from log_pipeline import AsyncLogPipeline
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = 'audit-*.ndjson'
+INDEX_ENTRY = struct.Struct('<dQ')  # (timestamp, byte offset)
+HOUR_FORMAT = '%Y%m%d%H'
+
+
+def _hour(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(HOUR_FORMAT)
+
+
+def _segment_hour(path: str) -> datetime:
+    return datetime.strptime(os.path.basename(path).split('-')[1], HOUR_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def _keys(entry: Dict[str, Any]) -> List[str]:
+    keys = []
+    if entry.get('ip'):
+        keys.append(f"ip:{entry['ip']}")
+    if entry.get('pharmacist_id'):
+        keys.append(f"pharmacist:{entry['pharmacist_id']}")
+    return keys
+
+
+class AuditWriter:
+    """Appends audit entries to this worker's segment for the current hour.
+
+    Entries are buffered in memory until flush(). Not thread-safe: it is
+    meant to be driven by one thread, such as the log listener.
+    """
+
+    def __init__(self, directory: str, index_interval: int = 64, retention_days: Optional[float] = 90):
+        self.directory = directory
+        self.index_interval = index_interval
+        self.retention_days = retention_days
+        self._pid = None
+        self._segment = None
+
+    def _open(self, hour: str):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"audit-{hour}-{os.getpid()}-{secrets.token_hex(3)}")
+        self._segment = base
+        self._hour = hour
+        # Unbuffered files: the pending bytes live in this object, so a forked
+        # child can drop the parent's without writing them a second time
+        self._data = open(f"{base}.ndjson", 'ab', buffering=0)
+        self._index = open(f"{base}.idx", 'ab', buffering=0)
+        self._pending_data = bytearray()
+        self._pending_index = bytearray()
+        self._offset = 0
+        self._count = 0
+        self._last_ts = 0.0
+        self._postings: Dict[str, List[int]] = {}
+        self._pid = os.getpid()
+
+    def append(self, entry: Dict[str, Any]):
+        """Write one entry; entry['ts'] is a Unix timestamp."""
+        if self._pid != os.getpid():
+            self._forked()
+        hour = _hour(entry['ts'])
+        if self._segment is None or hour != self._hour:
+            self.seal()
+            self._open(hour)
+        # Timestamps never go backwards within a segment, so the sparse index stays sorted
+        entry['ts'] = self._last_ts = max(entry['ts'], self._last_ts)
+        line = (json.dumps(entry, separators=(',', ':'), default=str) + '\n').encode()
+        if self._count % self.index_interval == 0:
+            self._pending_index += INDEX_ENTRY.pack(entry['ts'], self._offset)
+        for key in _keys(entry):
+            self._postings.setdefault(key, []).append(self._offset)
+        self._pending_data += line
+        self._offset += len(line)
+        self._count += 1
+
+    def _forked(self):
+        """The parent keeps its segment and pending entries; this process starts its own."""
+        if self._segment is not None:
+            self._data.close()
+            self._index.close()
+        self._segment = None
+
+    def flush(self):
+        if self._pid != os.getpid():
+            self._forked()
+        if self._segment is None:
+            return
+        # Data before index, so an index entry never points past the data
+        if self._pending_data:
+            self._data.write(self._pending_data)
+            self._pending_data.clear()
+        if self._pending_index:
+            self._index.write(self._pending_index)
+            self._pending_index.clear()
+
+    def seal(self):
+        """Close the current segment and write its key index."""
+        self.flush()
+        if self._segment is None:
+            return
+        self._data.close()
+        self._index.close()
+        tmp_path = f"{self._segment}.keys.tmp"
+        with open(tmp_path, 'w') as handle:
+            json.dump(self._postings, handle, separators=(',', ':'))
+        os.replace(tmp_path, f"{self._segment}.keys")
+        self._segment = None
+        self.prune()
+
+    def prune(self):
+        """Delete segments older than the retention period."""
+        if not self.retention_days:
+            return
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        for path in glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)):
+            if _segment_hour(path) + timedelta(hours=1) < cutoff:
+                base = path[:-len('.ndjson')]
+                for suffix in ('.ndjson', '.idx', '.keys'):
+                    try:
+                        os.remove(base + suffix)
+                    except FileNotFoundError:
+                        pass
+
+    close = seal
+
+
+class AuditLogHandler(logging.Handler):
+    """Logging handler that stores audit records (see app.log_submission) in an AuditWriter."""
+
+    def __init__(self, writer: AuditWriter, logger_name: str = 'amrx.audit'):
+        super().__init__()
+        self.writer = writer
+        self.addFilter(logging.Filter(logger_name))
+
+    def emit(self, record: logging.LogRecord):
+        data = getattr(record, 'data', None) or {}
+        try:
+            self.writer.append({
+                'ts': record.created,
+                'type': getattr(record, 'submission_type', None),
+                'ip': getattr(record, 'ip_address', None),
+                'pharmacist_id': data.get('pharmacist_id'),
+                'user_agent': getattr(record, 'user_agent', None),
+                'data': data
+            })
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+        super().close()
+
+
+def configure_audit_logging(directory: str, retention_days: Optional[float] = 90,
+                            queue_size: int = 10000, logger_name: str = 'amrx.audit') -> AsyncLogPipeline:
+    """Send logger_name's records to an audit store in directory, and nowhere else.
+
+    The records are written by a listener thread of their own, so request
+    threads only enqueue them, as with the main log.
+    """
+    pipeline = AsyncLogPipeline(handlers=[AuditLogHandler(AuditWriter(directory, retention_days=retention_days),
+                                                          logger_name)],
+                                queue_size=queue_size)
+    audit_logger = logging.getLogger(logger_name)
+    audit_logger.addHandler(pipeline)
+    audit_logger.propagate = False
+    return pipeline
+
+
+class _SegmentReader:
+    """Memory-mapped view of one segment and its indexes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        base = path[:-len('.ndjson')]
+        with open(path, 'rb') as handle:
+            self.map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with open(f"{base}.idx", 'rb') as handle:
+                raw = handle.read()
+            raw = raw[:len(raw) - len(raw) % INDEX_ENTRY.size]
+            entries = list(INDEX_ENTRY.iter_unpack(raw))
+        except FileNotFoundError:
+            entries = []
+        self.index_times = [ts for ts, _ in entries]
+        self.index_offsets = [offset for _, offset in entries]
+        try:
+            with open(f"{base}.keys") as handle:
+                self.postings: Optional[Dict[str, List[int]]] = json.load(handle)
+        except (FileNotFoundError, ValueError):
+            self.postings = None  # Still being written, or its writer died: scanned instead
+
+    def close(self):
+        self.map.close()
+
+    def _line_at(self, offset: int) -> Tuple[Optional[bytes], int]:
+        end = self.map.find(b'\n', offset)
+        if end < 0:
+            return None, len(self.map)  # Partial last line
+        return self.map[offset:end], end + 1
+
+    def _start_offset(self, since: Optional[float]) -> int:
+        if since is None or not self.index_times:
+            return 0
+        position = bisect.bisect_left(self.index_times, since) - 1
+        return self.index_offsets[position] if position >= 0 else 0
+
+    def records(self, since: Optional[float], until: Optional[float], keys: List[str],
+                needles: List[bytes], match: Dict[str, str]) -> Iterator[Dict[str, Any]]:
+        """Yield matching records in timestamp order."""
+        if keys and self.postings is not None:
+            offsets = None
+            for key in keys:
+                matches = set(self.postings.get(key, ()))
+                offsets = matches if offsets is None else offsets & matches
+            candidates = ((offset, None) for offset in sorted(offsets))
+        else:
+            candidates = self._scan(self._start_offset(since))
+        for offset, line in candidates:
+            if line is None:
+                line, _ = self._line_at(offset)
+                if line is None:
+                    continue
+            # Cheap byte test before parsing lines of an unindexed segment
+            if not all(needle in line for needle in needles):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if since is not None and record['ts'] < since:
+                continue
+            if until is not None and record['ts'] >= until:
+                return
+            if all(record.get(field) == value for field, value in match.items()):
+                yield record
+
+    def _scan(self, offset: int) -> Iterator[Tuple[int, bytes]]:
+        while offset < len(self.map):
+            line, next_offset = self._line_at(offset)
+            if line is None:
+                return
+            yield offset, line
+            offset = next_offset
+
+
+class AuditReader:
+    """Time-range and key queries over an audit directory."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def segments(self, since: Optional[float] = None, until: Optional[float] = None) -> List[str]:
+        """Segment files whose hour overlaps [since, until)."""
+        paths = []
+        for path in sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN))):
+            start = _segment_hour(path).timestamp()
+            if since is not None and start + 3600 <= since:
+                continue
+            if until is not None and start >= until:
+                continue
+            if os.path.getsize(path):
+                paths.append(path)
+        return paths
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              ip: Optional[str] = None, pharmacist_id: Optional[str] = None,
+              submission_type: Optional[str] = None, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield records in [since, until) matching every given filter, oldest first."""
+        match = {field: value for field, value in
+                 (('ip', ip), ('pharmacist_id', pharmacist_id), ('type', submission_type)) if value}
+        keys = []
+        needles = []
+        if ip:
+            keys.append(f"ip:{ip}")
+            needles.append(f'"ip":{json.dumps(ip)}'.encode())
+        if pharmacist_id:
+            keys.append(f"pharmacist:{pharmacist_id}")
+            needles.append(f'"pharmacist_id":{json.dumps(pharmacist_id)}'.encode())
+        if submission_type:
+            needles.append(f'"type":{json.dumps(submission_type)}'.encode())
+
+        readers = [_SegmentReader(path) for path in self.segments(since, until)]
+        try:
+            merged = heapq.merge(*(reader.records(since, until, keys, needles, match) for reader in readers),
+                                 key=lambda record: record['ts'])
+            for count, record in enumerate(merged):
+                if limit is not None and count >= limit:
+                    return
+                yield record
+        finally:
+            for reader in readers:
+                reader.close()
+
+
+def _parse_time(value: str) -> float:
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Query the AMR-X submission audit store.')
+    parser.add_argument('--dir', default=os.getenv('AUDIT_DIR', 'audit'), help='audit directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    query = commands.add_parser('query', help='print matching records as NDJSON, oldest first')
+    query.add_argument('--since', type=_parse_time, help='ISO time, UTC unless it has an offset')
+    query.add_argument('--until', type=_parse_time, help='ISO time (exclusive)')
+    query.add_argument('--ip')
+    query.add_argument('--pharmacist', dest='pharmacist_id')
+    query.add_argument('--type', dest='submission_type', choices=('public', 'pharmacist'))
+    query.add_argument('--limit', type=int)
+
+    segments = commands.add_parser('segments', help='list segments with their size and index state')
+    segments.add_argument('--since', type=_parse_time)
+    segments.add_argument('--until', type=_parse_time)
+
+    args = parser.parse_args(argv)
+    reader = AuditReader(args.dir)
+    if args.command == 'query':
+        started = time.perf_counter()
+        count = 0
+        for record in reader.query(args.since, args.until, args.ip, args.pharmacist_id,
+                                   args.submission_type, args.limit):
+            record['time'] = datetime.fromtimestamp(record['ts'], timezone.utc).isoformat()
+            sys.stdout.write(json.dumps(record, separators=(',', ':')) + '\n')
+            count += 1
+        print(f"{count} records in {time.perf_counter() - started:.3f}s", file=sys.stderr)
+    else:
+        for path in reader.segments(args.since, args.until):
+            sealed = os.path.exists(path[:-len('.ndjson')] + '.keys')
+            print(f"{os.path.basename(path)}\t{os.path.getsize(path)}\t{'sealed' if sealed else 'open'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Dashboard query benchmark for AMR-X Backend
+Loads supabase_schema.sql, and with --migrate the files in migrations/, into
+a throwaway schema of a local Postgres, fills it with synthetic
+submissions, and times each way of building the dashboards: the old REST
+path (two counts and two recent-row fetches, one round trip each), the
+same aggregates computed from the submission tables in one query, and the
+get_dashboard_stats() / get_pharmacist_dashboard() functions. It then
+adds six years of older history at the same daily rate, quadrupling the
+rows, and times them again, and times a burst of
+inserts and the periodic upkeep after it. Needs psycopg
+(pip install "psycopg[binary]") and a database without pg_cron; the schema
+is dropped afterwards. Run from amrx-flask-backend/:
+
+    python benchmarks/dashboard_bench.py postgresql://postgres@localhost/postgres [rows] [--migrate]
+"""
+
+import os
+import re
+import statistics
+import sys
+import time
+
+import psycopg
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_FILE = os.path.join(BACKEND_DIR, 'supabase_schema.sql')
+MIGRATIONS_DIR = os.path.join(BACKEND_DIR, 'migrations')
+REPEAT = 50
+PHARMACISTS = 200
+
+REST_DASHBOARD = (
+    'SELECT COUNT(*) FROM public_submissions',
+    'SELECT COUNT(*) FROM pharmacist_submissions',
+    'SELECT * FROM public_submissions ORDER BY created_at DESC LIMIT 5',
+    'SELECT * FROM pharmacist_submissions ORDER BY created_at DESC LIMIT 5',
+)
+
+# What get_dashboard_stats() computed before the views: every aggregate scans a table
+LIVE_DASHBOARD = """
+    SELECT (SELECT COUNT(*) FROM public_submissions),
+           (SELECT COUNT(*) FROM pharmacist_submissions),
+           (SELECT COUNT(DISTINCT location) FROM public_submissions),
+           (SELECT array_agg(location) FROM (SELECT location FROM public_submissions
+                GROUP BY location ORDER BY COUNT(*) DESC LIMIT 3) t),
+           (SELECT array_agg(medicine_name) FROM (SELECT medicine_name FROM pharmacist_submissions
+                GROUP BY medicine_name ORDER BY COUNT(*) DESC LIMIT 3) t),
+           (SELECT array_agg(id) FROM (SELECT id FROM public_submissions ORDER BY created_at DESC LIMIT 5) t)
+"""
+
+LIVE_PHARMACIST_DASHBOARD = """
+    SELECT (SELECT COUNT(*) FROM pharmacist_submissions WHERE pharmacist_id = %(p)s),
+           (SELECT COUNT(*) FROM pharmacist_submissions WHERE pharmacist_id = %(p)s
+                AND created_at >= date_trunc('month', CURRENT_DATE)),
+           (SELECT array_agg(id) FROM (SELECT id FROM pharmacist_submissions WHERE pharmacist_id = %(p)s
+                ORDER BY created_at DESC LIMIT 10) t),
+           (SELECT json_object_agg(month, count) FROM (SELECT to_char(created_at, 'YYYY-MM') AS month,
+                COUNT(*) AS count FROM pharmacist_submissions WHERE pharmacist_id = %(p)s
+                AND created_at >= CURRENT_DATE - INTERVAL '6 months' GROUP BY 1) t),
+           (SELECT json_object_agg(region, count) FROM (SELECT region, COUNT(*) AS count
+                FROM pharmacist_submissions WHERE pharmacist_id = %(p)s GROUP BY region) t)
+"""
+
+
+def seed(conn, rows: int, partitioned: bool, analyze: bool = True, newest: int = 0, oldest: int = 730):
+    """rows public and rows pharmacist submissions spread from oldest to newest days ago."""
+    if partitioned:
+        conn.execute("SELECT create_submission_partitions((NOW() - %s * INTERVAL '1 day')::date, CURRENT_DATE)",
+                     (oldest + 31,))
+    conn.execute("""
+        INSERT INTO public_submissions (symptoms, medication, duration, location, created_at)
+        SELECT 'fever', 'Medicine ' || mod(i, 40), 1 + mod(i, 14), 'Location ' || mod(i, 60),
+               NOW() - (%s + random() * %s) * INTERVAL '1 day'
+        FROM generate_series(1, %s) i
+    """, (newest, oldest - newest, rows))
+    conn.execute("""
+        INSERT INTO pharmacist_submissions (medicine_name, category, quantity, region, pharmacist_id, created_at)
+        SELECT 'Medicine ' || mod(i, 40), 'penicillins', 1 + mod(i, 100), 'Region ' || mod(i, 20),
+               'pharmacist_' || mod(i, %s), NOW() - (%s + random() * %s) * INTERVAL '1 day'
+        FROM generate_series(1, %s) i
+    """, (PHARMACISTS, newest, oldest - newest, rows))
+    if analyze:
+        conn.execute('ANALYZE')
+
+
+def median_ms(run) -> float:
+    run()
+    times = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def measure(conn):
+    def rest():
+        for query in REST_DASHBOARD:
+            conn.execute(query).fetchall()
+
+    pharmacist = {'p': 'pharmacist_7'}
+    results = (
+        ('public, REST path (4 round trips)', rest),
+        ('public, one query over the tables', lambda: conn.execute(LIVE_DASHBOARD).fetchall()),
+        ('public, get_dashboard_stats()', lambda: conn.execute('SELECT get_dashboard_stats()').fetchall()),
+        ('pharmacist, one query over the table',
+         lambda: conn.execute(LIVE_PHARMACIST_DASHBOARD, pharmacist).fetchall()),
+        ('pharmacist, get_pharmacist_dashboard()',
+         lambda: conn.execute('SELECT get_pharmacist_dashboard(%(p)s)', pharmacist).fetchall()),
+    )
+    print(f"{'dashboard':<42}{'median ms':>10}")
+    for name, run in results:
+        print(f"{name:<42}{median_ms(run):>10.2f}")
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != '--migrate']
+    if not args:
+        sys.exit(__doc__)
+    partitioned = '--migrate' in sys.argv
+    rows = int(args[1]) if len(args) > 1 else 200000
+    schema = f"amrx_bench_{os.getpid()}"
+    with open(SCHEMA_FILE) as f:
+        # Database-wide settings are not the benchmark's to change
+        scripts = [re.sub(r'^ALTER DATABASE .*?;$', '', f.read(), flags=re.MULTILINE)]
+    if partitioned:
+        for name in sorted(os.listdir(MIGRATIONS_DIR)):
+            with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+                scripts.append(f.read())
+
+    with psycopg.connect(args[0], autocommit=True) as conn:
+        conn.execute(f'CREATE SCHEMA {schema}')
+        try:
+            conn.execute(f'SET search_path TO {schema}, public')
+            for script in scripts:
+                conn.execute(script)
+            print(f"Layout: {'partitioned with daily rollups' if partitioned else 'plain tables with dashboard views'}")
+
+            # Two years, then six more years of older history at the same rate
+            for total, years, newest, oldest in ((rows, 2, 0, 730), (rows * 4, 8, 730, 2920)):
+                seed(conn, total - rows if newest else rows, partitioned, newest=newest, oldest=oldest)
+                conn.execute('SELECT refresh_dashboard_views()')
+                print(f"\n{total} rows of each kind over {years} years:")
+                measure(conn)
+            print("Over PostgREST every round trip also pays the network latency to Supabase.")
+
+            started = time.perf_counter()
+            seed(conn, 1000, partitioned, analyze=False)
+            inserted = time.perf_counter()
+            conn.execute('SELECT refresh_dashboard_views()')
+            print(f"\nInserting 1000 rows of each kind: {(inserted - started) * 1000:.0f} ms, "
+                  f"then upkeep: {(time.perf_counter() - inserted) * 1000:.0f} ms")
+        finally:
+            conn.execute(f'DROP SCHEMA {schema} CASCADE')
+
+
+if __name__ == '__main__':
+    main()
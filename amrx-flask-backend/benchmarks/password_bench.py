@@ -0,0 +1,77 @@
+"""
+Password hashing benchmark for AMR-X Backend
+Measures logins per second per core for the legacy SHA-256 hash and for
+scrypt at a few cost settings, then fires a burst of concurrent logins at
+one PasswordHasher to show how many are served and how many are refused.
+Run from amrx-flask-backend/:
+
+    python benchmarks/password_bench.py [burst size]
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import HasherBusy, PasswordHasher  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+
+
+def logins_per_second(hasher: PasswordHasher, stored: str, seconds: float = 2.0) -> float:
+    """Sequential verifications per second: one core's worth of logins."""
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        hasher.verify(PASSWORD, stored)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def burst(hasher: PasswordHasher, stored: str, size: int):
+    """size simultaneous logins; returns (served, refused, slowest served seconds)."""
+    results = []
+    gate = threading.Barrier(size)
+
+    def login():
+        gate.wait()
+        started = time.perf_counter()
+        try:
+            hasher.verify(PASSWORD, stored)
+            results.append(('served', time.perf_counter() - started))
+        except HasherBusy:
+            results.append(('refused', time.perf_counter() - started))
+
+    threads = [threading.Thread(target=login) for _ in range(size)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    served = [elapsed for outcome, elapsed in results if outcome == 'served']
+    return len(served), len(results) - len(served), max(served, default=0.0)
+
+
+def main():
+    burst_size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    legacy = PasswordHasher(legacy_salt='amr_salt_2024')
+    legacy_hash = hashlib.sha256((PASSWORD + 'amr_salt_2024').encode()).hexdigest()
+    print(f"{'hash':<28}{'logins/s/core':>15}{'ms/login':>10}")
+    rate = logins_per_second(legacy, legacy_hash)
+    print(f"{'sha256 (legacy)':<28}{rate:>15.0f}{1000 / rate:>10.3f}")
+    for n in (2 ** 13, 2 ** 14, 2 ** 15):
+        hasher = PasswordHasher(n=n, workers=1, max_pending=0)
+        rate = logins_per_second(hasher, hasher.hash(PASSWORD))
+        print(f"{f'scrypt n=2^{n.bit_length() - 1} r=8 p=1':<28}{rate:>15.1f}{1000 / rate:>10.1f}")
+
+    hasher = PasswordHasher()
+    stored = hasher.hash(PASSWORD)
+    served, refused, slowest = burst(hasher, stored, burst_size)
+    print(f"\nburst of {burst_size} logins, {hasher.workers} workers + {hasher.max_pending} queued: "
+          f"{served} served (slowest {slowest * 1000:.0f} ms), {refused} refused immediately")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Rate limit storage benchmark for AMR-X Backend
+Measures what the shared-memory rate limit storage costs per check, next
+to Flask-Limiter's per-worker in-memory storage, both for a single limit
+check and for a whole request through Flask. It also forks a few workers
+that all hit one limit, to confirm the limit is enforced across them.
+Run from amrx-flask-backend/:
+
+    python benchmarks/ratelimit_bench.py [keys]
+"""
+
+import os
+import sys
+import tempfile
+import timeit
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask_limiter import Limiter  # noqa: E402
+from limits import parse  # noqa: E402
+from limits.storage import storage_from_string  # noqa: E402
+from limits.strategies import STRATEGIES  # noqa: E402
+
+import rate_limit_storage  # noqa: E402,F401
+
+STRATEGY = 'sliding-window-counter'
+WORKERS = 4
+
+
+def per_check_us(storage, keys: int) -> float:
+    limiter = STRATEGIES[STRATEGY](storage)
+    item = parse('1000000 per hour')
+    names = [f"203.0.113.{index}" for index in range(keys)]
+    rounds = max(1, 50000 // keys)
+    best = min(timeit.repeat(lambda: [limiter.hit(item, name) for name in names], number=rounds, repeat=5))
+    return best / (rounds * keys) * 1e6
+
+
+def per_request_us(storage_uri, requests: int = 5000) -> float:
+    app = Flask(__name__)
+
+    @app.route('/ping')
+    def ping():
+        return 'ok'
+
+    if storage_uri:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            Limiter(app=app, key_func=lambda: '203.0.113.7', storage_uri=storage_uri, strategy=STRATEGY,
+                    default_limits=['100000000 per day', '10000000 per hour'])
+    client = app.test_client()
+    client.get('/ping')
+    best = min(timeit.repeat(lambda: client.get('/ping'), number=requests, repeat=3))
+    return best / requests * 1e6
+
+
+def shared_enforcement(storage_uri: str, limit: int = 200) -> int:
+    """Total hits allowed when WORKERS processes each try limit times."""
+    storage = storage_from_string(storage_uri)
+    storage.reset()
+    item = parse(f'{limit} per minute')
+    children = []
+    read_end, write_end = os.pipe()
+    for _ in range(WORKERS):
+        pid = os.fork()
+        if pid == 0:
+            limiter = STRATEGIES[STRATEGY](storage)
+            allowed = sum(limiter.hit(item, 'shared') for _ in range(limit))
+            os.write(write_end, f"{allowed}\n".encode())
+            os._exit(0)
+        children.append(pid)
+    for pid in children:
+        os.waitpid(pid, 0)
+    os.close(write_end)
+    with os.fdopen(read_end) as results:
+        return sum(int(line) for line in results)
+
+
+def main():
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    shm_uri = f"amrx-shm://{os.path.join(tempfile.gettempdir(), f'amrx-ratelimit-bench-{os.getpid()}')}"
+    try:
+        print(f"{'storage':<22}{'us/check':>10}{'us/request':>12}")
+        baseline = per_request_us(None)
+        print(f"{'(no limiter)':<22}{'':>10}{baseline:>12.1f}")
+        for name, uri in (('memory (per worker)', 'memory://'), ('amrx-shm (shared)', shm_uri)):
+            check = per_check_us(storage_from_string(uri), keys)
+            request = per_request_us(uri)
+            print(f"{name:<22}{check:>10.1f}{request:>12.1f}   +{request - baseline:.1f} us per request, 2 limits")
+
+        allowed = shared_enforcement(shm_uri)
+        print(f"\n{WORKERS} workers x 200 hits on a 200/minute limit: {allowed} allowed (shared store)")
+        print(f"{WORKERS} workers with per-worker memory storage would allow {WORKERS * 200}")
+    finally:
+        os.remove(shm_uri[len('amrx-shm://'):])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Validation microbenchmark for AMR-X Backend
+Measures the per-record cost of the compiled schemas against the
+hand-written validation they replaced, for valid and invalid records,
+single and batched. Run from amrx-flask-backend/:
+
+    python benchmarks/validation_bench.py [records]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemas import (  # noqa: E402
+    ALLOWED_CATEGORIES, LOCATION_PATTERN, MEDICATION_PATTERN, PHARMACIST_SUBMISSION,
+    PUBLIC_SUBMISSION, REGION_PATTERN, SYMPTOMS_PATTERN
+)
+
+
+def legacy_sanitize(text):
+    if not text:
+        return text
+    text = re.sub(r'[<>"\']', '', str(text))
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def legacy_public(data):
+    """The per-request validation previously inlined in app.submit_public_data."""
+    for field in ('symptoms', 'medication', 'duration', 'location'):
+        if not data.get(field):
+            return None, {'error': f'{field} is required', 'code': 'MISSING_FIELD'}
+    for field, limit in {'symptoms': 1000, 'medication': 100, 'location': 100}.items():
+        if len(str(data.get(field, ''))) > limit:
+            return None, {'error': f'{field} is too long (max {limit} characters)', 'code': 'FIELD_TOO_LONG'}
+    for value, pattern, field in ((data.get('symptoms'), SYMPTOMS_PATTERN, 'symptoms'),
+                                  (data.get('medication'), MEDICATION_PATTERN, 'medication'),
+                                  (data.get('location'), LOCATION_PATTERN, 'location')):
+        text = str(value) or ''
+        if not text or not pattern.match(text):
+            return None, {'error': f'Invalid {field} format', 'code': 'INVALID_FORMAT'}
+    try:
+        duration = int(data.get('duration', 0))
+        if duration < 1 or duration > 365:
+            return None, {'error': 'Duration must be between 1 and 365 days', 'code': 'INVALID_DURATION'}
+    except (ValueError, TypeError):
+        return None, {'error': 'Invalid duration value', 'code': 'INVALID_DURATION'}
+    return {
+        'symptoms': legacy_sanitize(str(data.get('symptoms') or '')),
+        'medication': legacy_sanitize(str(data.get('medication') or '')),
+        'duration': duration,
+        'location': legacy_sanitize(str(data.get('location') or ''))
+    }, None
+
+
+def legacy_pharmacist(data):
+    """The former app.validate_pharmacist_record."""
+    for field in ('medicineName', 'category', 'quantity', 'region'):
+        if not data.get(field):
+            return None, {'error': f'{field} is required', 'code': 'MISSING_FIELD'}
+    if data.get('category') not in ALLOWED_CATEGORIES:
+        return None, {'error': f'Invalid medication category. Must be one of: {", ".join(ALLOWED_CATEGORIES)}', 'code': 'INVALID_CATEGORY'}
+    try:
+        quantity = int(data.get('quantity', 0))
+        if quantity < 1 or quantity > 10000:
+            return None, {'error': 'Quantity must be between 1 and 10,000', 'code': 'INVALID_QUANTITY'}
+    except (ValueError, TypeError):
+        return None, {'error': 'Invalid quantity value', 'code': 'INVALID_QUANTITY'}
+    region = str(data.get('region') or '')
+    if not region or not REGION_PATTERN.match(region):
+        return None, {'error': 'Invalid region format', 'code': 'INVALID_FORMAT'}
+    return {
+        'medicineName': legacy_sanitize(str(data.get('medicineName') or '')),
+        'category': data.get('category'),
+        'quantity': quantity,
+        'region': legacy_sanitize(str(data.get('region') or ''))
+    }, None
+
+
+PUBLIC_RECORDS = [
+    {'symptoms': 'Fever,  cough and sore throat for three days', 'medication': 'Amoxicillin',
+     'duration': '7', 'location': 'New  Delhi'},
+    {'symptoms': 'Headache', 'medication': 'Azithromycin', 'duration': 3, 'location': 'Lagos'},
+    {'symptoms': 'Rash <script>', 'medication': 'Cipro', 'duration': 2, 'location': 'Lima'},
+    {'symptoms': 'Fever', 'medication': 'Doxycycline', 'duration': 400, 'location': 'Paris'},
+    {'symptoms': 'Fever', 'medication': '', 'duration': 1, 'location': 'Oslo'},
+]
+
+PHARMACIST_RECORDS = [
+    {'medicineName': 'Amoxicillin  500mg', 'category': 'penicillins', 'quantity': '20', 'region': 'South Asia'},
+    {'medicineName': 'Azithromycin', 'category': 'macrolides', 'quantity': 6, 'region': 'West Africa'},
+    {'medicineName': 'Ciprofloxacin', 'category': 'quinolones', 'quantity': 10, 'region': 'Europe'},
+    {'medicineName': 'Doxycycline', 'category': 'tetracyclines', 'quantity': 'ten', 'region': 'Asia'},
+    {'medicineName': 'Gentamicin', 'category': 'aminoglycosides', 'quantity': 4, 'region': 'Asia 1'},
+]
+
+
+def check_equivalence():
+    """The compiled schemas must give exactly the legacy results."""
+    for legacy, schema, records in ((legacy_public, PUBLIC_SUBMISSION, PUBLIC_RECORDS),
+                                    (legacy_pharmacist, PHARMACIST_SUBMISSION, PHARMACIST_RECORDS)):
+        for record in records:
+            assert legacy(record) == schema(record), record
+
+
+def per_record_ns(function, records, repeat=5) -> float:
+    rounds = max(1, 20000 // len(records))
+    best = min(timeit.repeat(lambda: [function(record) for record in records], number=rounds, repeat=repeat))
+    return best / (rounds * len(records)) * 1e9
+
+
+def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    check_equivalence()
+
+    print(f"{'case':<34}{'legacy ns/rec':>15}{'schema ns/rec':>15}{'speedup':>10}")
+    for name, legacy, schema, records in (
+        ('public, mixed', legacy_public, PUBLIC_SUBMISSION, PUBLIC_RECORDS),
+        ('public, valid', legacy_public, PUBLIC_SUBMISSION, PUBLIC_RECORDS[:2]),
+        ('pharmacist, mixed', legacy_pharmacist, PHARMACIST_SUBMISSION, PHARMACIST_RECORDS),
+        ('pharmacist, valid', legacy_pharmacist, PHARMACIST_SUBMISSION, PHARMACIST_RECORDS[:2]),
+    ):
+        before = per_record_ns(legacy, records)
+        after = per_record_ns(schema, records)
+        print(f"{name:<34}{before:>15.0f}{after:>15.0f}{before / after:>9.1f}x")
+
+    rows = list(enumerate(PHARMACIST_RECORDS * (batch_size // len(PHARMACIST_RECORDS))))
+    legacy_batch = min(timeit.repeat(lambda: [legacy_pharmacist(data) for _, data in rows], number=20, repeat=5))
+    schema_batch = min(timeit.repeat(lambda: PHARMACIST_SUBMISSION.validate_many(rows), number=20, repeat=5))
+    before = legacy_batch / (20 * len(rows)) * 1e9
+    after = schema_batch / (20 * len(rows)) * 1e9
+    print(f"{f'pharmacist batch of {len(rows)}':<34}{before:>15.0f}{after:>15.0f}{before / after:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
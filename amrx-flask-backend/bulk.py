@@ -0,0 +1,72 @@
+"""
+Bulk ingestion helpers for AMR-X Backend
+Parses JSON-array and NDJSON request bodies into indexed rows, reporting
+unreadable rows individually, and splits rows into backend-sized chunks.
+"""
+
+import json
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+
+
+class BulkBodyError(ValueError):
+    """Raised when a bulk request body cannot be used at all."""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _row_error(index: int, message: str, code: str) -> Dict[str, Any]:
+    return {'row': index, 'error': message, 'code': code}
+
+
+def parse_rows(body: bytes, mimetype: Optional[str], max_rows: int) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Return ([(row index, record)], [row errors]) for a JSON array or NDJSON body.
+
+    Row indexes are zero-based positions in the array, or non-blank line
+    numbers (zero-based) for NDJSON.
+    """
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise BulkBodyError('Request body must be UTF-8', 'INVALID_ENCODING')
+
+    items = []
+    errors = []
+    if mimetype in NDJSON_MIMETYPES:
+        lines = [line for line in text.splitlines() if line.strip()]
+        for index, line in enumerate(lines):
+            try:
+                items.append((index, json.loads(line)))
+            except ValueError:
+                errors.append(_row_error(index, 'Invalid JSON', 'INVALID_JSON'))
+    else:
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            raise BulkBodyError('Request body must be a JSON array or NDJSON', 'INVALID_JSON')
+        if not isinstance(payload, list):
+            raise BulkBodyError('Request body must be a JSON array of records', 'INVALID_FORMAT')
+        items = list(enumerate(payload))
+
+    total = len(items) + len(errors)
+    if total == 0:
+        raise BulkBodyError('No records provided', 'EMPTY_BATCH')
+    if total > max_rows:
+        raise BulkBodyError(f'Too many records (max {max_rows} per request)', 'TOO_MANY_RECORDS')
+
+    rows = []
+    for index, item in items:
+        if isinstance(item, dict):
+            rows.append((index, item))
+        else:
+            errors.append(_row_error(index, 'Record must be a JSON object', 'INVALID_FORMAT'))
+    return rows, errors
+
+
+def chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    """Yield consecutive slices of at most size items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
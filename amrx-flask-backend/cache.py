@@ -0,0 +1,332 @@
+"""
+Response cache for AMR-X Backend
+Cache of serialized Flask responses with per-key TTLs, negative-result
+rules, stale-while-revalidate refreshes, single-flight coalescing of
+concurrent misses and tag-based, debounced invalidation. Responses carry
+content-hash ETags, and tagged ones a Last-Modified time from their tags'
+data generations; a poll matching a live entry, or a recomputed body
+identical to the client's copy, is answered with 304 Not Modified. Views
+should stamp bodies with changed_at() rather than the current time, so
+unchanged data recomputes to the same ETag. Entries live in a pluggable backend (see cache_backends).
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from functools import wraps
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, Iterable, Optional, Tuple, Union
+
+from flask import request, make_response, current_app, copy_current_request_context
+
+from cache_backends import CacheBackend, CacheEntry, MemoryBackend
+
+logger = logging.getLogger(__name__)
+
+
+def _build_response(entry: CacheEntry):
+    """Rebuild a Flask response from a stored entry, with its validators."""
+    response = current_app.response_class(entry.body, status=entry.status, mimetype=entry.mimetype)
+    _add_validators(response, entry)
+    return response
+
+
+def _add_validators(response, entry: CacheEntry):
+    if entry.status != 200:
+        return
+    response.set_etag(entry.etag)
+    response.last_modified = datetime.fromtimestamp(entry.last_modified, tz=timezone.utc)
+    # Browsers must revalidate, which is cheap: a matching ETag costs a 304
+    response.headers['Cache-Control'] = 'no-cache'
+
+
+def _not_modified(entry_etag: str, last_modified: Optional[float]) -> bool:
+    """Evaluate the request's conditional headers against a representation."""
+    if request.if_none_match:
+        return request.if_none_match.contains(entry_etag)
+    if request.if_modified_since and last_modified is not None:
+        return int(last_modified) <= request.if_modified_since.timestamp()
+    return False
+
+
+class _Computation:
+    """Everything needed to (re)compute and store one cached view response."""
+
+    __slots__ = ('key', 'func', 'args', 'kwargs', 'ttl', 'tags')
+
+    def __init__(self, key: str, func: Callable, args, kwargs, ttl: Optional[float], tags: Tuple[str, ...]):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.ttl = ttl
+        self.tags = tags
+
+
+class _InFlight:
+    """A computation other requests for the same key can wait on."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[CacheEntry] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """Thread-safe response cache on top of a storage backend."""
+
+    def __init__(self, backend: Optional[CacheBackend] = None, default_ttl: float = 300,
+                 stale_ttl: float = 300, negative_ttl: float = 30, coalesce_timeout: float = 30,
+                 invalidation_debounce: float = 0):
+        self.backend = backend or MemoryBackend()
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.coalesce_timeout = coalesce_timeout
+        self.invalidation_debounce = invalidation_debounce
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._inflight: Dict[str, _InFlight] = {}
+        self._stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'refreshes': 0,
+            'refresh_errors': 0,
+            'uncacheable': 0,
+            'not_modified': 0
+        }
+
+    def _count(self, stat: str, amount: int = 1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def lookup(self, key: str) -> Tuple[Optional[CacheEntry], Optional[str]]:
+        """Return (entry, 'fresh' | 'stale') for a key, or (None, None) on a miss."""
+        now = time.time()
+        entry = self.backend.get(key)
+        if entry is None:
+            self._count('misses')
+            return None, None
+        if now >= entry.stale_until:
+            self.backend.delete(key)
+            self._count('expirations')
+            self._count('misses')
+            return None, None
+        if now < entry.expires_at:
+            self._count('hits')
+            return entry, 'fresh'
+        self._count('stale_hits')
+        return entry, 'stale'
+
+    def _peek(self, key: str) -> Optional[CacheEntry]:
+        """Return a fresh entry without touching stats."""
+        entry = self.backend.get(key)
+        if entry is not None and time.time() < entry.expires_at:
+            return entry
+        return None
+
+    def ttl_for(self, status: int, ttl: Optional[float]) -> Optional[float]:
+        """Apply negative-result rules: never cache server errors, briefly cache client errors."""
+        if status >= 500:
+            return None
+        if status >= 400:
+            return min(self.negative_ttl, ttl if ttl is not None else self.default_ttl)
+        return ttl if ttl is not None else self.default_ttl
+
+    def last_modified(self, tags: Tuple[str, ...]) -> Optional[float]:
+        """When the data behind the tags last changed, from their generations."""
+        if not tags:
+            return None
+        changed = [changed_at for _, changed_at in self.backend.generations(tags).values() if changed_at]
+        return max(changed) if changed else None
+
+    def changed_at(self, tags: Iterable[str]) -> float:
+        """When the data behind the tags last changed, as a stable value to put in a body.
+
+        Tags that have never been invalidated get their clock started now, so
+        recomputing unchanged data yields the same body, and the same ETag.
+        """
+        tags = tuple(tags)
+        changed_at = self.last_modified(tags)
+        if changed_at is None:
+            self.backend.bump_generations(tags)
+            changed_at = self.last_modified(tags)
+        return changed_at
+
+    def make_entry(self, response, ttl: Optional[float], tags: Tuple[str, ...],
+                   last_modified: Optional[float]) -> Tuple[CacheEntry, bool]:
+        """Serialize a response into an entry and decide whether it may be stored."""
+        body = response.get_data()
+        # The ETag names the body itself, so a 304 never vouches for data it has not seen
+        etag = hashlib.sha1(body).hexdigest()[:20]
+        last_modified = last_modified or time.time()
+        ttl = self.ttl_for(response.status_code, ttl)
+        entry = CacheEntry.create(body, response.status_code, response.mimetype, ttl or 0,
+                                  self.stale_ttl if response.status_code < 400 else 0, tags,
+                                  etag, last_modified)
+        cacheable = (ttl is not None and not response.direct_passthrough
+                     and 'Set-Cookie' not in response.headers
+                     and entry.size <= getattr(self.backend, 'max_bytes', entry.size))
+        return entry, cacheable
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Advance the data generation of the tags and mark their entries stale.
+
+        An entry younger than the debounce window stays fresh until the
+        window closes, so a burst of writes triggers at most one refresh
+        per window. Stale entries keep being served while they refresh.
+        """
+        tags = tuple(tags)
+        self.backend.bump_generations(tags)
+        count = self.backend.invalidate(tags, self.invalidation_debounce)
+        self._count('invalidations', count)
+        return count
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else 0.0
+        stats.update(self.backend.stats())
+        return stats
+
+    def _compute(self, job: _Computation) -> Tuple[Any, CacheEntry]:
+        """Run the view and store its serialized response when the rules allow it."""
+        # Read generations first so a write racing the computation bumps them past us
+        last_modified = self.last_modified(job.tags)
+        response = make_response(job.func(*job.args, **job.kwargs))
+        entry, cacheable = self.make_entry(response, job.ttl, job.tags, last_modified)
+        if cacheable:
+            self.backend.set(job.key, entry)
+            _add_validators(response, entry)
+        else:
+            self._count('uncacheable')
+        return response, entry
+
+    def _compute_once(self, job: _Computation):
+        """Compute a missing key, letting concurrent misses wait on a single leader."""
+        with self._lock:
+            call = self._inflight.get(job.key)
+            leader = call is None
+            if leader:
+                call = self._inflight[job.key] = _InFlight()
+            else:
+                self._stats['coalesced'] += 1
+
+        if leader:
+            try:
+                # Shared backends also elect one leader across worker processes
+                with self.backend.lock(job.key, self.coalesce_timeout):
+                    # A previous leader may have finished between our lookup and now
+                    call.result = self._peek(job.key)
+                    if call.result is not None:
+                        return _build_response(call.result)
+                    response, call.result = self._compute(job)
+                return response
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(job.key, None)
+                call.done.set()
+
+        if not call.done.wait(self.coalesce_timeout):
+            logger.warning(f"Timed out waiting for in-flight computation of {job.key}, computing directly")
+            return self._compute(job)[0]
+        if call.error is not None:
+            raise call.error
+        return _build_response(call.result)
+
+    def _refresh(self, job: _Computation):
+        """Recompute a stale entry in the background; only one refresh runs per key."""
+        try:
+            # With a shared backend only one worker refreshes; the rest keep serving stale
+            with self.backend.lock(job.key, 0) as acquired:
+                if not acquired or self._peek(job.key) is not None:
+                    return
+                self._compute(job)
+            self._count('refreshes')
+        except Exception as e:
+            logger.error(f"Background cache refresh failed for {job.key}: {e}")
+            self._count('refresh_errors')
+        finally:
+            with self._lock:
+                self._refreshing.discard(job.key)
+
+    def _schedule_refresh(self, job: _Computation):
+        with self._lock:
+            if job.key in self._refreshing:
+                return
+            self._refreshing.add(job.key)
+        refresh = copy_current_request_context(self._refresh)
+        threading.Thread(target=refresh, args=(job,), daemon=True).start()
+
+    def _not_modified_response(self, etag: str, last_modified: Optional[float]):
+        self._count('not_modified')
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = datetime.fromtimestamp(last_modified, tz=timezone.utc)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def cached(self, ttl: Optional[float] = None, key_func: Optional[Callable[[], str]] = None,
+               tags: Union[Iterable[str], Callable[[], Iterable[str]]] = (),
+               unless: Optional[Callable[[], bool]] = None):
+        """Decorator caching a view's serialized response.
+
+        The key defaults to the view name plus the request path and query
+        string. Tags (or a callable returning them for the current request)
+        name the data the response depends on, for use with invalidate().
+        Expired entries are served while one background thread recomputes
+        them, and concurrent misses share one computation. Requests for
+        which unless() returns True bypass the cache entirely.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if unless is not None and unless():
+                    return func(*args, **kwargs)
+
+                key = key_func() if key_func else f"{func.__name__}:{request.full_path}"
+                job = self._job(key, func, args, kwargs, ttl, tags)
+
+                # Only a live entry can vouch that the client's copy is current
+                entry, state = self.lookup(key)
+                if entry is not None:
+                    if state == 'stale':
+                        self._schedule_refresh(job)
+                    if _not_modified(entry.etag, entry.last_modified):
+                        return self._not_modified_response(entry.etag, entry.last_modified)
+                    response = _build_response(entry)
+                    response.headers['X-Cache'] = 'HIT' if state == 'fresh' else 'STALE'
+                    return response
+
+                response = self._compute_once(job)
+                # A recompute of unchanged data reproduces the client's copy
+                etag, _ = response.get_etag()
+                if response.status_code == 200 and etag and request.if_none_match.contains(etag):
+                    last_modified = response.last_modified.timestamp() if response.last_modified else None
+                    response = self._not_modified_response(etag, last_modified)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _job(key, func, args, kwargs, ttl, tags) -> _Computation:
+        return _Computation(key, func, args, kwargs, ttl, tuple(tags() if callable(tags) else tags))
@@ -0,0 +1,402 @@
+"""
+Cache storage backends for AMR-X Backend
+An in-process LRU store, and a SQLite store on local disk that every
+gunicorn worker on the box shares. Both also track a generation counter
+per cache tag, which versions the data behind tagged responses.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locks, coalescing stays per worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Keys share a fixed set of lock files, so the lock directory stays bounded
+# however many distinct keys (query strings) clients make up
+LOCK_STRIPES = 256
+
+
+class CacheEntry:
+    """A serialized response together with its freshness window."""
+
+    __slots__ = ('body', 'status', 'mimetype', 'tags', 'etag', 'last_modified',
+                 'created_at', 'expires_at', 'stale_until')
+
+    def __init__(self, body: bytes, status: int, mimetype: str, tags: Tuple[str, ...],
+                 etag: str, last_modified: float, created_at: float, expires_at: float,
+                 stale_until: float):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.tags = tags
+        self.etag = etag
+        self.last_modified = last_modified
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+    @classmethod
+    def create(cls, body: bytes, status: int, mimetype: str, ttl: float, stale_ttl: float,
+               tags: Tuple[str, ...], etag: str, last_modified: float) -> 'CacheEntry':
+        now = time.time()
+        return cls(body, status, mimetype, tags, etag, last_modified, now, now + ttl, now + ttl + stale_ttl)
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+
+class CacheBackend:
+    """Storage interface used by cache.ResponseCache."""
+
+    # True when entries written by one worker are visible to the others
+    shared = False
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    def set(self, key: str, entry: CacheEntry):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def invalidate(self, tags: Iterable[str], debounce: float) -> int:
+        """Expire entries carrying any of the tags, but not before created_at + debounce."""
+        raise NotImplementedError
+
+    def generations(self, tags: Iterable[str]) -> Dict[str, Tuple[int, Optional[float]]]:
+        """Return (generation, changed_at) for each tag; untouched tags are (0, None)."""
+        raise NotImplementedError
+
+    def bump_generations(self, tags: Iterable[str]):
+        """Record that the data behind the tags changed."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def lock(self, key: str, timeout: float):
+        """Context manager yielding True once this process may compute the key."""
+        return contextlib.nullcontext(True)
+
+
+class MemoryBackend(CacheBackend):
+    """Thread-safe in-process LRU bounded by entry count and total body bytes."""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._tag_index: Dict[str, set] = {}
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            for tag in entry.tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+            self._bytes = 0
+
+    def invalidate(self, tags, debounce):
+        now = time.time()
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tag_index.get(tag, ()))
+            for key in keys:
+                entry = self._entries[key]
+                entry.expires_at = min(entry.expires_at, max(now, entry.created_at + debounce))
+            return len(keys)
+
+    def generations(self, tags):
+        with self._lock:
+            return {tag: self._generations.get(tag, (0, None)) for tag in tags}
+
+    def bump_generations(self, tags):
+        now = time.time()
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = (self._generations.get(tag, (0, None))[0] + 1, now)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'evictions': self._evictions,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes
+            }
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._forget(key, entry)
+
+    def _forget(self, key: str, entry: CacheEntry):
+        """Release the byte budget and tag index slots of a removed entry."""
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def _evict(self):
+        """Drop least recently used entries until both bounds hold."""
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, entry = self._entries.popitem(last=False)
+            self._forget(key, entry)
+            self._evictions += 1
+
+
+class SQLiteBackend(CacheBackend):
+    """Cache shared by every worker on one machine through a WAL-mode SQLite file.
+
+    LRU order is tracked with an access time that is refreshed at most once
+    per touch_interval so cache hits stay read-only most of the time.
+    Per-key file locks let one worker compute a miss while the others wait.
+    """
+
+    shared = True
+
+    SCHEMA_VERSION = 2
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            status INTEGER NOT NULL,
+            mimetype TEXT,
+            tags TEXT NOT NULL,
+            etag TEXT NOT NULL,
+            last_modified REAL NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            stale_until REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_entries_accessed_at ON entries(accessed_at);
+        CREATE TABLE IF NOT EXISTS entry_tags (
+            tag TEXT NOT NULL,
+            key TEXT NOT NULL,
+            PRIMARY KEY (tag, key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_entry_tags_key ON entry_tags(key);
+        CREATE TABLE IF NOT EXISTS generations (
+            tag TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL,
+            changed_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 256,
+                 max_bytes: int = 8 * 1024 * 1024, touch_interval: float = 5):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'amrx-cache.sqlite3')
+        self.lock_dir = self.path + '.locks'
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._evictions = 0
+        os.makedirs(self.lock_dir, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # The file only holds cache data, so an outdated layout is simply dropped
+            if conn.execute('PRAGMA user_version').fetchone()[0] != self.SCHEMA_VERSION:
+                conn.execute('DROP TABLE IF EXISTS entries')
+                conn.execute('DROP TABLE IF EXISTS entry_tags')
+                conn.execute('DROP TABLE IF EXISTS generations')
+                conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT body, status, mimetype, tags, etag, last_modified, created_at, expires_at, '
+            'stale_until, accessed_at FROM entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        *fields, accessed_at = row
+        now = time.time()
+        if now - accessed_at > self.touch_interval:
+            conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+        body, status, mimetype, tags, *rest = fields
+        return CacheEntry(body, status, mimetype, tuple(tags.split('\n')) if tags else (), *rest)
+
+    def set(self, key, entry):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM entry_tags WHERE key = ?', (key,))
+            conn.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, entry.body, entry.status, entry.mimetype, '\n'.join(entry.tags),
+                 entry.etag, entry.last_modified, entry.created_at, entry.expires_at,
+                 entry.stale_until, time.time(), entry.size)
+            )
+            conn.executemany('INSERT OR IGNORE INTO entry_tags VALUES (?, ?)',
+                             [(tag, key) for tag in entry.tags])
+            self._evict(conn)
+
+    def delete(self, key):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            conn.execute('DELETE FROM entry_tags WHERE key = ?', (key,))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM entries')
+            conn.execute('DELETE FROM entry_tags')
+
+    def invalidate(self, tags, debounce):
+        tags = list(tags)
+        if not tags:
+            return 0
+        conn = self._connect()
+        placeholders = ','.join('?' * len(tags))
+        with conn:
+            cursor = conn.execute(
+                f'UPDATE entries SET expires_at = MIN(expires_at, MAX(?, created_at + ?)) '
+                f'WHERE key IN (SELECT key FROM entry_tags WHERE tag IN ({placeholders}))',
+                (time.time(), debounce, *tags)
+            )
+            return cursor.rowcount
+
+    def generations(self, tags):
+        tags = list(tags)
+        result = {tag: (0, None) for tag in tags}
+        if tags:
+            placeholders = ','.join('?' * len(tags))
+            rows = self._connect().execute(
+                f'SELECT tag, generation, changed_at FROM generations WHERE tag IN ({placeholders})', tags
+            )
+            for tag, generation, changed_at in rows:
+                result[tag] = (generation, changed_at)
+        return result
+
+    def bump_generations(self, tags):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT INTO generations VALUES (?, 1, ?) '
+                'ON CONFLICT(tag) DO UPDATE SET generation = generation + 1, changed_at = excluded.changed_at',
+                [(tag, now) for tag in tags]
+            )
+
+    def stats(self):
+        count, size = self._connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {
+            'backend': 'sqlite',
+            'entries': count,
+            'bytes': size,
+            'evictions': self._evictions,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes
+        }
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used rows until both bounds hold (inside the caller's transaction)."""
+        count, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        evicted = []
+        for key, entry_size in conn.execute('SELECT key, size FROM entries ORDER BY accessed_at'):
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            size -= entry_size
+        conn.executemany('DELETE FROM entries WHERE key = ?', evicted)
+        conn.executemany('DELETE FROM entry_tags WHERE key = ?', evicted)
+        self._evictions += len(evicted)
+
+    @contextlib.contextmanager
+    def lock(self, key, timeout):
+        if fcntl is None:
+            yield True
+            return
+        stripe = int.from_bytes(hashlib.sha1(key.encode()).digest()[:4], 'big') % LOCK_STRIPES
+        with open(os.path.join(self.lock_dir, f"{stripe:03d}.lock"), 'a') as handle:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        yield False
+                        return
+                    time.sleep(0.01)
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def create_backend(name: str, **options) -> CacheBackend:
+    """Build a cache backend from its configured name ('memory' or 'sqlite')."""
+    if name == 'sqlite':
+        return SQLiteBackend(path=options.get('path'), max_entries=options.get('max_entries', 256),
+                             max_bytes=options.get('max_bytes', 8 * 1024 * 1024))
+    if name != 'memory':
+        logger.warning(f"Unknown cache backend '{name}', using in-process memory")
+    return MemoryBackend(max_entries=options.get('max_entries', 256),
+                         max_bytes=options.get('max_bytes', 8 * 1024 * 1024))
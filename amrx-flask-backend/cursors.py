@@ -0,0 +1,109 @@
+"""
+Cursors for AMR-X Backend
+Opaque cursors for the dashboards' since= mode. A cursor records the newest
+submission timestamp a client has seen together with the counters and
+list digests it holds, so the next call returns only newer submissions
+and what changed. Cursors only move forward along the timestamp ordering.
+Page tokens mark a keyset position (timestamp, document id) for paginated
+listings.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+CURSOR_VERSION = 1
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that were not produced by encode_cursor."""
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+
+def snapshot(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce state to what a cursor stores: numbers as-is, anything else as a digest."""
+    return {
+        name: value if isinstance(value, (int, float)) and not isinstance(value, bool) else _digest(value)
+        for name, value in state.items()
+    }
+
+
+def _encode(payload: Dict[str, Any]) -> str:
+    raw = json.dumps({'v': CURSOR_VERSION, **payload}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode(token: str) -> Dict[str, Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+        raise InvalidCursor(str(e)) from e
+    if not isinstance(payload, dict) or payload.get('v') != CURSOR_VERSION:
+        raise InvalidCursor('Unsupported cursor')
+    return payload
+
+
+def _timestamp(value: Any) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def encode_cursor(timestamp: Optional[datetime], state: Dict[str, Any]) -> str:
+    return _encode({
+        't': timestamp.isoformat() if timestamp is not None else None,
+        's': snapshot(state)
+    })
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], Dict[str, Any]]:
+    """Return the (timestamp, snapshot) a cursor was built from."""
+    payload = _decode(cursor)
+    if not isinstance(payload.get('s'), dict):
+        raise InvalidCursor('Not a delta cursor')
+    return _timestamp(payload.get('t')), payload['s']
+
+
+def encode_page_token(timestamp: datetime, document_id: str) -> str:
+    return _encode({'t': timestamp.isoformat(), 'id': document_id})
+
+
+def decode_page_token(token: str) -> Tuple[datetime, str]:
+    """Return the (timestamp, document id) of the last item of the previous page."""
+    payload = _decode(token)
+    timestamp = _timestamp(payload.get('t'))
+    if timestamp is None or not isinstance(payload.get('id'), str):
+        raise InvalidCursor('Not a page token')
+    return timestamp, payload['id']
+
+
+def changes(previous: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
+    """Numeric fields as differences and other fields in full, only where they changed."""
+    current = snapshot(state)
+    delta = {}
+    for name, value in current.items():
+        before = previous.get(name)
+        if value == before:
+            continue
+        if isinstance(value, (int, float)) and isinstance(before, (int, float)):
+            delta[name] = value - before
+        elif isinstance(value, (int, float)):
+            delta[name] = value
+        else:
+            delta[name] = state[name]
+    return delta
+
+
+def advance(timestamp: Optional[datetime], seen: Iterable[Any]) -> Optional[datetime]:
+    """Move a cursor timestamp forward to the newest of the seen timestamps."""
+    for value in seen:
+        if isinstance(value, datetime) and (timestamp is None or value > timestamp):
+            timestamp = value
+    return timestamp
@@ -0,0 +1,166 @@
+"""
+Database client pools for AMR-X Backend
+A bounded pool of reusable database clients for each worker process:
+Supabase clients, whose PostgREST sessions keep their HTTP connections
+alive between calls, or direct Postgres connections. At most size clients
+exist at once. A checkout waits at most acquire_timeout for a free one and
+then raises PoolTimeout, so a slow database backs requests up into a
+bounded queue rather than an unbounded pile of sockets.
+
+Clients are created on first need and reused most recently returned first,
+so the warmest connections stay busy and the rest age out after max_idle
+seconds. A client whose use raised, or that fails its health check after
+use, is closed rather than returned: its session may be left mid-request
+or mid-transaction. A forked gunicorn worker never touches its parent's
+clients: the pool notices the new pid and starts empty, leaving the
+inherited sockets to the parent.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """No pooled client became free in time; retry later."""
+
+
+class ClientPool:
+    """A per-process pool of at most size clients made by factory.
+
+    healthy(client) decides whether a client goes back to the pool after
+    use that raised nothing, close(client) releases one that does not or
+    that has idled longer than max_idle seconds.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 8, acquire_timeout: float = 5.0,
+                 max_idle: float = 300.0, healthy: Optional[Callable[[Any], bool]] = None,
+                 close: Optional[Callable[[Any], None]] = None, name: str = 'database'):
+        self.factory = factory
+        self.size = max(1, size)
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.healthy = healthy
+        self.close = close
+        self.name = name
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_started(self):
+        """Start empty in each process; clients inherited across a fork share
+        their sockets with the parent, so they are dropped without being closed."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._lock = threading.Lock()
+            self._slots = threading.BoundedSemaphore(self.size)
+            self._idle = deque()  # (client, returned at), most recently returned last
+            self._in_use = 0
+            self._stats = {'created': 0, 'closed': 0, 'checkouts': 0, 'waits': 0, 'wait_ms': 0.0,
+                           'max_wait_ms': 0.0, 'hold_ms': 0.0, 'timeouts': 0, 'errors': 0, 'unhealthy': 0}
+            self._pid = os.getpid()
+
+    def _discard(self, client):
+        with self._lock:
+            self._stats['closed'] += 1
+        if self.close:
+            try:
+                self.close(client)
+            except Exception as e:
+                logger.warning(f"Error closing {self.name} client: {e}")
+
+    def _take(self, waited: float):
+        """The most recently returned idle client, closing any that idled too long."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [client for client, returned_at in self._idle if now - returned_at > self.max_idle]
+            self._idle = deque(entry for entry in self._idle if now - entry[1] <= self.max_idle)
+            client = self._idle.pop()[0] if self._idle else None
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            self._stats['waits'] += waited >= 1
+            self._stats['wait_ms'] += waited
+            self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], waited)
+        for old in stale:
+            self._discard(old)
+        return client
+
+    def _give_back(self, client, reuse: bool, held: float, failed: bool):
+        with self._lock:
+            self._in_use -= 1
+            self._stats['hold_ms'] += held
+            self._stats['errors'] += failed
+            if client is None:
+                return
+            if reuse:
+                self._idle.append((client, time.monotonic()))
+            elif not failed:
+                self._stats['unhealthy'] += 1
+        if not reuse:
+            self._discard(client)
+
+    @contextmanager
+    def connection(self):
+        """Check out a client for the duration of the block."""
+        self._ensure_started()
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeout(f"No {self.name} client free after {self.acquire_timeout}s "
+                              f"({self.size} in use)")
+        try:
+            client = self._take((time.monotonic() - started) * 1000)
+            held_from = time.monotonic()
+            failed = False
+            try:
+                if client is None:
+                    client = self.factory()
+                    with self._lock:
+                        self._stats['created'] += 1
+                yield client
+            except Exception:
+                failed = True
+                raise
+            finally:
+                try:
+                    reuse = client is not None and not failed and (self.healthy(client) if self.healthy else True)
+                except Exception:
+                    reuse = False
+                self._give_back(client, reuse, (time.monotonic() - held_from) * 1000, failed)
+        finally:
+            self._slots.release()
+
+    def clear(self):
+        """Close every idle client; clients in use are returned as usual."""
+        self._ensure_started()
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for client, _ in idle:
+            self._discard(client)
+
+    def stats(self) -> Dict[str, Any]:
+        self._ensure_started()
+        with self._lock:
+            in_use, idle, stats = self._in_use, len(self._idle), dict(self._stats)
+        checkouts = stats['checkouts'] or 1
+        return {
+            'name': self.name,
+            'size': self.size,
+            'open': stats['created'] - stats['closed'],
+            'in_use': in_use,
+            'idle': idle,
+            **{key: stats[key] for key in ('created', 'closed', 'checkouts', 'waits', 'timeouts',
+                                           'errors', 'unhealthy')},
+            'avg_wait_ms': round(stats['wait_ms'] / checkouts, 2),
+            'max_wait_ms': round(stats['max_wait_ms'], 2),
+            'avg_hold_ms': round(stats['hold_ms'] / checkouts, 2),
+        }
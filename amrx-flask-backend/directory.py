@@ -0,0 +1,197 @@
+"""
+Pharmacist directory for AMR-X Backend
+Keeps an email -> pharmacist index in each worker, so logins and duplicate
+email checks are dictionary lookups instead of a database query. Each
+entry holds only what authentication needs. The index is loaded in the
+background when the worker starts and then kept current by a change
+listener where the database offers one, or reloaded periodically where it
+does not, and by write-through from this worker's own writes. With a
+listener the index is still reloaded every resync_interval, in case the
+listener stopped delivering changes without saying so. Changes that arrive
+while a reload is running are replayed onto the new index. An email
+that is not in the index is looked up in the database, so an index that is
+still warming or a moment behind another worker is never wrong, only
+slower.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Callable, Iterable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Record = Tuple[str, Dict[str, Any]]  # (pharmacist id, stored fields)
+
+
+class PharmacistEntry(NamedTuple):
+    id: str
+    email: str
+    password_hash: Optional[str]
+    active: bool
+    name: str
+    institution: str
+
+
+def entry_from(pharmacist_id: str, data: Dict[str, Any]) -> PharmacistEntry:
+    return PharmacistEntry(
+        id=pharmacist_id,
+        email=(data.get('email') or '').strip().lower(),
+        password_hash=data.get('password_hash'),
+        active=data.get('active', True) is not False,
+        name=data.get('name') or '',
+        institution=data.get('institution') or ''
+    )
+
+
+class PharmacistDirectory:
+    """Per-worker email index over the pharmacists collection.
+
+    load_all yields every (id, fields); load_one(email) returns one or
+    None. subscribe, if given, is called with on_change(id, fields or None
+    when deleted) and must start delivering changes; the index is then
+    reloaded every resync_interval seconds as a backstop. Without it the
+    index is reloaded every refresh_interval seconds.
+    """
+
+    def __init__(self, load_all: Callable[[], Iterable[Record]],
+                 load_one: Callable[[str], Optional[Record]],
+                 subscribe: Optional[Callable[[Callable[[str, Optional[Dict[str, Any]]], None]], Any]] = None,
+                 refresh_interval: float = 60.0, resync_interval: float = 900.0):
+        self.load_all = load_all
+        self.load_one = load_one
+        self.subscribe = subscribe
+        self.refresh_interval = refresh_interval
+        self.resync_interval = resync_interval
+        self._by_email: Dict[str, PharmacistEntry] = {}
+        self._email_by_id: Dict[str, str] = {}
+        # Entries changed while a reload runs (None when removed), replayed onto its result
+        self._pending: Optional[Dict[str, Optional[PharmacistEntry]]] = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._ready = False
+        self._listening = False
+        self._loaded_at = None
+        self._stats = {'hits': 0, 'misses': 0, 'loads': 0, 'load_errors': 0, 'changes': 0}
+
+    def start(self):
+        """Load the index in the background, again in each forked worker."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._ready = False
+            self._listening = False
+            threading.Thread(target=self._maintain, name='pharmacist-directory', daemon=True).start()
+
+    def _maintain(self):
+        subscribe = self.subscribe
+        while True:
+            try:
+                self._reload()
+            except Exception as e:
+                self._stats['load_errors'] += 1
+                logger.warning(f"Pharmacist directory load failed: {e}")
+            else:
+                if subscribe is not None and not self._listening:
+                    try:
+                        subscribe(self._on_change)
+                        self._listening = True
+                    except Exception as e:
+                        subscribe = None
+                        logger.warning(f"Pharmacist change listener unavailable, reloading every "
+                                       f"{self.refresh_interval:.0f}s instead: {e}")
+            time.sleep(self.resync_interval if self._listening else self.refresh_interval)
+
+    @staticmethod
+    def _apply(by_email: Dict[str, PharmacistEntry], email_by_id: Dict[str, str],
+               pharmacist_id: str, entry: Optional[PharmacistEntry]):
+        """Index entry under pharmacist_id in the given maps, or drop the id if entry is None."""
+        previous = email_by_id.pop(pharmacist_id, None)
+        if previous:
+            by_email.pop(previous, None)
+        if entry is not None and entry.email:
+            by_email[entry.email] = entry
+            email_by_id[pharmacist_id] = entry.email
+
+    def _record(self, pharmacist_id: str, entry: Optional[PharmacistEntry]):
+        """Apply a change to the live index; the caller holds the lock."""
+        self._apply(self._by_email, self._email_by_id, pharmacist_id, entry)
+        if self._pending is not None:
+            self._pending[pharmacist_id] = entry
+
+    def _reload(self):
+        by_email = {}
+        email_by_id = {}
+        with self._lock:
+            self._pending = {}
+        try:
+            for pharmacist_id, data in self.load_all():
+                self._apply(by_email, email_by_id, pharmacist_id, entry_from(pharmacist_id, data))
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            # The snapshot may predate changes made while it loaded
+            for pharmacist_id, entry in self._pending.items():
+                self._apply(by_email, email_by_id, pharmacist_id, entry)
+            self._pending = None
+            self._by_email = by_email
+            self._email_by_id = email_by_id
+            self._ready = True
+            self._loaded_at = time.time()
+        self._stats['loads'] += 1
+        logger.info(f"Pharmacist directory loaded: {len(by_email)} pharmacists")
+
+    def _on_change(self, pharmacist_id: str, data: Optional[Dict[str, Any]]):
+        self._stats['changes'] += 1
+        if data is None:
+            self.remove(pharmacist_id)
+        else:
+            self.put(pharmacist_id, data)
+
+    def put(self, pharmacist_id: str, data: Dict[str, Any]):
+        """Add or replace a pharmacist, e.g. after this worker wrote it."""
+        entry = entry_from(pharmacist_id, data)
+        with self._lock:
+            self._record(pharmacist_id, entry)
+
+    def update(self, email: str, **fields):
+        """Change fields of an indexed pharmacist, e.g. password_hash after a rehash."""
+        with self._lock:
+            entry = self._by_email.get(email)
+            if entry is not None:
+                self._record(entry.id, entry._replace(**fields))
+
+    def remove(self, pharmacist_id: str):
+        with self._lock:
+            self._record(pharmacist_id, None)
+
+    def lookup(self, email: str) -> Optional[PharmacistEntry]:
+        """Find a pharmacist by normalized email, asking the database on a miss."""
+        self.start()
+        entry = self._by_email.get(email)
+        if entry is not None:
+            self._stats['hits'] += 1
+            return entry
+        self._stats['misses'] += 1
+        record = self.load_one(email)
+        if record is None:
+            return None
+        self.put(*record)
+        return entry_from(*record)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            'ready': self._ready,
+            'mode': 'listener' if self._listening else 'refresh',
+            'entries': len(self._by_email),
+            'loaded_at': self._loaded_at,
+            'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+            **self._stats
+        }
@@ -0,0 +1,269 @@
+"""
+Live dashboard events for AMR-X Backend
+Fans compact dashboard delta events out to Server-Sent Events subscribers.
+Each event is serialized once into a bounded ring buffer and every idle
+stream waits on one shared condition, so a publish costs a single
+notify_all however many clients are connected. Event ids are monotonic,
+which lets a reconnecting client resume from its Last-Event-ID. With a
+shared event log, one relay thread per worker feeds the buffer so events
+published by any gunicorn worker reach subscribers of all of them.
+"""
+
+import itertools
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _frame(event_id: str, event_type: str, payload: str) -> str:
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+class SQLiteEventLog:
+    """Append-only event log shared by every worker on one machine."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: Optional[str] = None, retain: int = 1000):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'amrx-events.sqlite3')
+        self.retain = retain
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (secrets.token_hex(4),))
+        # Ids restart with a new file, so clients resuming across files are told to reload
+        self.epoch = conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, event_type: str, payload: str) -> int:
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            event_id = conn.execute(
+                'INSERT INTO events (type, payload, created_at) VALUES (?, ?, ?)',
+                (event_type, payload, time.time())
+            ).lastrowid
+            if event_id % 100 == 0:
+                conn.execute('DELETE FROM events WHERE id <= ?', (event_id - self.retain,))
+        return event_id
+
+    def latest_id(self) -> int:
+        return self._connect().execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+
+    def read_after(self, event_id: int, limit: int = 500) -> List[Tuple[int, str, str]]:
+        return self._connect().execute(
+            'SELECT id, type, payload FROM events WHERE id > ? ORDER BY id LIMIT ?', (event_id, limit)
+        ).fetchall()
+
+
+class EventBroadcaster:
+    """Single publisher fanning events out to any number of streaming subscribers."""
+
+    def __init__(self, history: int = 500, heartbeat: float = 15, retry_ms: int = 5000,
+                 max_age: float = 600, log: Optional[SQLiteEventLog] = None,
+                 poll_interval: float = 0.5, max_subscribers: int = 0):
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+        self.max_age = max_age
+        self.log = log
+        self.poll_interval = poll_interval
+        # Each stream holds a server thread; 0 means no limit
+        self.max_subscribers = max_subscribers
+        self.epoch = log.epoch if log is not None else secrets.token_hex(4)
+        self._events = deque(maxlen=history)
+        self._cond = threading.Condition()
+        self._last_id = 0
+        self._latest: Dict[str, str] = {}
+        self._relay_pid = None
+        self._stats = {'published': 0, 'subscribers': 0, 'resumed': 0, 'resets': 0, 'refused': 0}
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        """Serialize an event once and wake every subscriber."""
+        payload = json.dumps(data, separators=(',', ':'), default=str)
+        if self.log is not None:
+            self.log.append(event_type, payload)
+            self._ensure_relay()
+        else:
+            with self._cond:
+                self._append(self._last_id + 1, event_type, payload)
+        with self._cond:
+            self._stats['published'] += 1
+
+    def publish_if_changed(self, event_type: str, data: Dict[str, Any]) -> bool:
+        """Publish only when data differs from the last event of this type published here."""
+        payload = json.dumps(data, separators=(',', ':'), sort_keys=True, default=str)
+        with self._cond:
+            if self._latest.get(event_type) == payload:
+                return False
+            self._latest[event_type] = payload
+        self.publish(event_type, data)
+        return True
+
+    def _append(self, event_id: int, event_type: str, payload: str):
+        """Add an event to the ring buffer; the caller holds the condition."""
+        self._events.append((event_id, _frame(f"{self.epoch}-{event_id}", event_type, payload)))
+        self._last_id = event_id
+        self._cond.notify_all()
+
+    def _ensure_relay(self):
+        """Start this worker's log relay thread, once per process."""
+        if self.log is None or self._relay_pid == os.getpid():
+            return
+        with self._cond:
+            if self._relay_pid == os.getpid():
+                return
+            # Backfill the buffer so clients that reconnect to this worker can resume
+            self._events.clear()
+            latest = self.log.latest_id()
+            self._last_id = max(0, latest - self._events.maxlen)
+            for event_id, event_type, payload in self.log.read_after(self._last_id, self._events.maxlen):
+                self._append(event_id, event_type, payload)
+            self._relay_pid = os.getpid()
+        threading.Thread(target=self._relay, daemon=True).start()
+
+    def _relay(self):
+        cursor = self._last_id
+        while True:
+            try:
+                rows = self.log.read_after(cursor, self._events.maxlen)
+            except sqlite3.Error as e:
+                logger.error(f"Event relay read failed: {e}")
+                rows = []
+            if rows:
+                with self._cond:
+                    for event_id, event_type, payload in rows:
+                        self._append(event_id, event_type, payload)
+                cursor = rows[-1][0]
+            else:
+                time.sleep(self.poll_interval)
+
+    def _resume_cursor(self, last_event_id: Optional[str]) -> Tuple[int, bool]:
+        """Map a client's Last-Event-ID to a buffer cursor; True means it must reload."""
+        with self._cond:
+            if not last_event_id:
+                return self._last_id, False
+            epoch, _, number = last_event_id.partition('-')
+            oldest = self._events[0][0] if self._events else self._last_id + 1
+            if epoch != self.epoch or not number.isdigit() or not oldest - 1 <= int(number) <= self._last_id:
+                self._stats['resets'] += 1
+                return self._last_id, True
+            self._stats['resumed'] += 1
+            return int(number), False
+
+    def _pending(self, cursor: int) -> List[str]:
+        """Frames newer than cursor; ids are contiguous so the start index is direct."""
+        if not self._events:
+            return []
+        start = max(0, cursor - self._events[0][0] + 1)
+        return [frame for event_id, frame in itertools.islice(self._events, start, None) if event_id > cursor]
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Optional['Subscription']:
+        """Take a subscriber slot and return its stream, or None if max_subscribers are streaming.
+
+        The cap is checked and the slot taken under one lock, so concurrent
+        requests cannot overshoot it. Refusals are counted.
+        """
+        with self._cond:
+            if self.max_subscribers and self._stats['subscribers'] >= self.max_subscribers:
+                self._stats['refused'] += 1
+                return None
+            self._stats['subscribers'] += 1
+        return Subscription(self, self._frames(last_event_id))
+
+    def _release(self):
+        with self._cond:
+            self._stats['subscribers'] -= 1
+
+    def _frames(self, last_event_id: Optional[str]) -> Iterator[str]:
+        """Yield SSE frames for one subscriber until it disconnects or max_age passes."""
+        self._ensure_relay()
+        cursor, reset = self._resume_cursor(last_event_id)
+        yield f"retry: {self.retry_ms}\n\n"
+        if reset:
+            # Missed events are gone from the buffer: the client refetches a snapshot
+            yield _frame(f"{self.epoch}-{cursor}", 'reset', '{}')
+        deadline = time.monotonic() + self.max_age
+        while time.monotonic() < deadline:
+            with self._cond:
+                if self._last_id <= cursor:
+                    self._cond.wait(self.heartbeat)
+                frames = self._pending(cursor)
+                if frames and self._events[0][0] > cursor + 1:
+                    frames.insert(0, _frame(f"{self.epoch}-{cursor}", 'reset', '{}'))
+                cursor = self._last_id
+            yield ''.join(frames) if frames else ': keep-alive\n\n'
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats['last_event_id'] = self._last_id
+            stats['buffered'] = len(self._events)
+        stats['shared'] = self.log is not None
+        return stats
+
+
+class Subscription:
+    """One subscriber's frames; closing it, even before it started, frees its slot."""
+
+    def __init__(self, broadcaster: EventBroadcaster, frames: Iterator[str]):
+        self._broadcaster = broadcaster
+        self._frames = frames
+        self._open = True
+
+    def __iter__(self) -> 'Subscription':
+        return self
+
+    def __next__(self) -> str:
+        try:
+            return next(self._frames)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        """Stop the stream; called by the WSGI server when the client goes away."""
+        self._frames.close()
+        if self._open:
+            self._open = False
+            self._broadcaster._release()
+
+
+def create_broadcaster(name: str = 'memory', path: Optional[str] = None, **options) -> EventBroadcaster:
+    """Build a broadcaster: 'memory' fans out within one worker, 'sqlite' across the host."""
+    if name == 'memory':
+        return EventBroadcaster(**options)
+    if name == 'sqlite':
+        return EventBroadcaster(log=SQLiteEventLog(path), **options)
+    raise ValueError(f"Unknown event backend: {name}")
@@ -0,0 +1,290 @@
+"""
+Write-behind ingestion for AMR-X Backend
+Acknowledges submissions as soon as they are durable in a local append-only
+log, and drains the log to the database from a background thread. Appends
+are fsynced with group commit: concurrent requests share one fsync, so a
+burst costs a handful of syncs rather than one per request. Each worker
+owns its own log file, locked with flock (a byte-range lock on Windows);
+the logs of workers that died are adopted and replayed by a live worker.
+Drained offsets are checkpointed after every committed batch, so a crash
+replays at most one batch, and the sink must make writes idempotent
+(records carry their final document id).
+"""
+
+import glob
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: lock a byte of the file with msvcrt instead
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+LOG_PATTERN = 'ingest-*.log'
+# Windows locks keep other handles out of the locked range, so lock a byte far past any log's data
+WINDOWS_LOCK_OFFSET = 1 << 40
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and '$datetime' in obj:
+        return datetime.fromisoformat(obj['$datetime'])
+    return obj
+
+
+def _read_checkpoint(path: str) -> int:
+    try:
+        with open(path, 'r') as handle:
+            return int(handle.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _try_lock(fd: int) -> bool:
+    """Take an exclusive lock on an open log without waiting; False if another process holds it."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, WINDOWS_LOCK_OFFSET, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _write_checkpoint(path: str, offset: int):
+    """Replace the checkpoint atomically, so a crash leaves the old or the new offset."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as handle:
+        handle.write(str(offset))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+class _Segment:
+    """One log file, locked for the lifetime of this object."""
+
+    def __init__(self, path: str, fd: int):
+        self.path = path
+        self.fd = fd
+        self.checkpoint_path = f"{path}.ckpt"
+        self.offset = _read_checkpoint(self.checkpoint_path)
+
+    @classmethod
+    def claim(cls, path: str, create: bool = False) -> Optional['_Segment']:
+        """Open and lock a log file; None if another live process holds it."""
+        flags = os.O_RDWR | os.O_APPEND | (os.O_CREAT if create else 0)
+        try:
+            fd = os.open(path, flags, 0o600)
+        except FileNotFoundError:
+            return None
+        if not _try_lock(fd):
+            os.close(fd)
+            return None
+        return cls(path, fd)
+
+    def size(self) -> int:
+        return os.fstat(self.fd).st_size
+
+    def advance(self, offset: int):
+        _write_checkpoint(self.checkpoint_path, offset)
+        self.offset = offset
+
+    def remove(self):
+        if fcntl is None:
+            # Windows cannot remove a file that is still open
+            os.close(self.fd)
+        for path in (self.path, self.checkpoint_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        if fcntl is not None:
+            os.close(self.fd)
+
+
+class IngestLog:
+    """Durable local queue of records, drained to a sink in batches.
+
+    sink(records) must write a whole batch or raise; it is retried with
+    backoff until it succeeds, and may see records it already wrote after
+    a crash.
+    """
+
+    def __init__(self, directory: str, sink: Callable[[List[Dict[str, Any]]], None],
+                 batch_size: int = 200, drain_interval: float = 0.5,
+                 max_retry_delay: float = 60.0, rotate_bytes: int = 16 * 1024 * 1024,
+                 rescan_interval: float = 30.0):
+        self.directory = directory
+        self.sink = sink
+        self.batch_size = batch_size
+        self.drain_interval = drain_interval
+        self.max_retry_delay = max_retry_delay
+        self.rotate_bytes = rotate_bytes
+        self.rescan_interval = rescan_interval
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats = {'appended': 0, 'drained': 0, 'fsyncs': 0, 'retries': 0, 'replayed_logs': 0}
+        self._last_error = None
+
+    def _ensure_started(self):
+        """Open this worker's log and start its drain thread, once per process."""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked: the parent keeps its logs, this process opens its own
+                for segment in [self._segment, *self._orphans]:
+                    os.close(segment.fd)
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"ingest-{os.getpid()}-{secrets.token_hex(4)}.log")
+            self._segment = _Segment.claim(path, create=True)
+            self._written = self._synced = self._segment.size()
+            self._append_lock = threading.Lock()
+            self._sync_lock = threading.Lock()
+            self._wake = threading.Event()
+            self._orphans: List[_Segment] = []
+            self._next_scan = 0.0
+            self._retry_delay = 0.0
+            self._pid = os.getpid()
+            threading.Thread(target=self._drain_loop, name='ingest-drain', daemon=True).start()
+
+    def start(self):
+        """Start draining now, replaying logs left behind by earlier processes."""
+        self._ensure_started()
+
+    def append(self, record: Dict[str, Any]):
+        """Return once record is on disk; it is written to the sink later."""
+        self._ensure_started()
+        line = (json.dumps(record, separators=(',', ':'), default=_encode_value) + '\n').encode()
+        with self._append_lock:
+            os.write(self._segment.fd, line)
+            self._written += len(line)
+            target = self._written
+            self._stats['appended'] += 1
+        self._sync(target)
+        self._wake.set()
+
+    def _sync(self, target: int):
+        """Group commit: one fsync covers every append written before it started."""
+        if self._synced >= target:
+            return
+        with self._sync_lock:
+            if self._synced >= target:
+                return
+            with self._append_lock:
+                upto = self._written
+            os.fsync(self._segment.fd)
+            self._synced = upto
+            self._stats['fsyncs'] += 1
+
+    def _scan_orphans(self):
+        """Claim logs whose owning process is gone."""
+        known = {self._segment.path} | {segment.path for segment in self._orphans}
+        for path in sorted(glob.glob(os.path.join(self.directory, LOG_PATTERN))):
+            if path in known:
+                continue
+            segment = _Segment.claim(path)
+            if segment is not None:
+                logger.info(f"Replaying ingest log {path} from offset {segment.offset}")
+                self._orphans.append(segment)
+
+    def _read_batch(self, segment: _Segment, end: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Read up to batch_size complete records between the checkpoint and end."""
+        records = []
+        offset = segment.offset
+        with open(segment.path, 'rb') as handle:
+            handle.seek(offset)
+            while len(records) < self.batch_size and offset < end:
+                line = handle.readline()
+                if not line.endswith(b'\n'):
+                    # Torn tail of a write that was never acknowledged
+                    break
+                offset += len(line)
+                try:
+                    records.append(json.loads(line, object_hook=_decode_object))
+                except ValueError:
+                    logger.error(f"Skipping unreadable record at {segment.path}:{offset - len(line)}")
+        return records, offset
+
+    def _drain(self, segment: _Segment, end: int) -> bool:
+        """Drain one segment up to end; False if the sink failed."""
+        while segment.offset < end:
+            records, offset = self._read_batch(segment, end)
+            if offset == segment.offset:
+                break
+            if records:
+                try:
+                    self.sink(records)
+                except Exception as e:
+                    self._last_error = str(e)
+                    self._stats['retries'] += 1
+                    self._retry_delay = min(self.max_retry_delay, max(1.0, self._retry_delay * 2))
+                    logger.error(f"Ingest drain of {len(records)} records failed, retrying in {self._retry_delay:.0f}s: {e}")
+                    return False
+                self._stats['drained'] += len(records)
+            segment.advance(offset)
+            self._retry_delay = 0.0
+            self._last_error = None
+        return True
+
+    def _rotate(self):
+        """Empty this worker's log once everything in it has been drained."""
+        with self._sync_lock, self._append_lock:
+            if self._segment.offset != self._written or self._written < self.rotate_bytes:
+                return
+            # Checkpoint first: a crash in between only replays already-written records
+            self._segment.advance(0)
+            os.ftruncate(self._segment.fd, 0)
+            self._written = self._synced = 0
+
+    def _drain_loop(self):
+        while True:
+            self._wake.wait(self._retry_delay or self.drain_interval)
+            self._wake.clear()
+            try:
+                if time.monotonic() >= self._next_scan:
+                    self._scan_orphans()
+                    self._next_scan = time.monotonic() + self.rescan_interval
+                for segment in list(self._orphans):
+                    if not self._drain(segment, segment.size()):
+                        break
+                    self._orphans.remove(segment)
+                    segment.remove()
+                    self._stats['replayed_logs'] += 1
+                    logger.info(f"Ingest log {segment.path} fully replayed")
+                else:
+                    if self._drain(self._segment, self._synced):
+                        self._rotate()
+            except Exception as e:
+                logger.error(f"Ingest drain loop error: {e}")
+                self._retry_delay = self.max_retry_delay
+
+    def stats(self) -> Dict[str, Any]:
+        if self._pid != os.getpid():
+            return {'started': False}
+        return {
+            'started': True,
+            'pending_bytes': self._synced - self._segment.offset,
+            'orphan_logs': len(self._orphans),
+            'last_error': self._last_error,
+            **self._stats
+        }
@@ -0,0 +1,282 @@
+"""
+Asynchronous logging for AMR-X Backend
+Request threads only put log records on a bounded in-memory queue; a
+listener thread formats them as JSON lines and writes them in batches with
+one flush per batch, so a slow disk never adds to request latency. When the
+queue is full, records are dropped and counted rather than blocking, and
+the listener reports the drop count in the log itself. The log file is
+rotated by size and by time; workers sharing a file notice each other's
+rotations and reopen it.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+from typing import Dict, Any, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock; the single dev server process rotates alone
+    fcntl = None
+
+# LogRecord attributes that are not user-supplied extras
+_RESERVED_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any extra= fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName
+        }
+        for name, value in vars(record).items():
+            if name not in _RESERVED_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class RotatingLogWriter:
+    """Append-only log file rotated when it exceeds max_bytes or a time period ends.
+
+    Rotation shifts app.log to app.log.1, app.log.1 to app.log.2, and so on,
+    keeping backup_count files. It runs under a lock file so that only one
+    worker rotates, and each worker reopens the file once its inode changes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 interval: Optional[float] = 24 * 60 * 60):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.interval = interval
+        self._stream = None
+        self._open()
+
+    def _period(self, timestamp: float) -> Optional[int]:
+        return int(timestamp // self.interval) if self.interval else None
+
+    def _open(self):
+        if self._stream is not None:
+            self._stream.close()
+        self._stream = open(self.path, 'a', encoding='utf-8')
+        stat = os.fstat(self._stream.fileno())
+        self._inode = stat.st_ino
+        self._size = stat.st_size
+        self._opened_period = self._period(stat.st_mtime if stat.st_size else time.time())
+
+    def _should_rotate(self) -> bool:
+        if self.max_bytes and self._size >= self.max_bytes:
+            return True
+        return self.interval is not None and self._period(time.time()) != self._opened_period
+
+    def _rotate(self):
+        # Windows cannot rename a file that is still open
+        self.close()
+        with open(f"{self.path}.lock", 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another worker may have rotated while we waited for the lock
+                if os.stat(self.path).st_ino == self._inode:
+                    for index in range(self.backup_count - 1, 0, -1):
+                        source = f"{self.path}.{index}"
+                        if os.path.exists(source):
+                            os.replace(source, f"{self.path}.{index + 1}")
+                    if self.backup_count:
+                        os.replace(self.path, f"{self.path}.1")
+                    else:
+                        os.truncate(self.path, 0)
+            except FileNotFoundError:
+                pass
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        self._open()
+
+    def write(self, lines: List[str]):
+        """Write a batch of lines with a single flush."""
+        try:
+            if os.stat(self.path).st_ino != self._inode:
+                self._open()
+        except FileNotFoundError:
+            self._open()
+        if self._should_rotate():
+            self._rotate()
+        data = '\n'.join(lines) + '\n'
+        self._stream.write(data)
+        self._stream.flush()
+        self._size += len(data.encode('utf-8'))
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+class AsyncLogPipeline(QueueHandler):
+    """Logging handler that enqueues without blocking and writes from a listener thread."""
+
+    def __init__(self, writer: Optional[RotatingLogWriter] = None,
+                 handlers: Optional[List[logging.Handler]] = None,
+                 queue_size: int = 10000, batch_size: int = 256, flush_interval: float = 0.5):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.writer = writer
+        self.handlers = handlers or []
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.json_formatter = JsonFormatter()
+        self._stats = {'enqueued': 0, 'dropped': 0, 'written': 0, 'batches': 0, 'write_errors': 0}
+        self._reported_drops = 0
+        self._pid = None
+        self._thread = None
+        self._ensure_listener()
+        atexit.register(self.stop)
+
+    def _ensure_listener(self):
+        """Start the listener thread, again in each forked worker."""
+        if self._pid == os.getpid():
+            return
+        with self.lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._listen, name='log-listener', daemon=True)
+            self._thread.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting, including tracebacks, happens on the listener thread; only
+        # the message is resolved here so later changes to its arguments cannot leak in
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+            self._stats['enqueued'] += 1
+        except queue.Full:
+            self._stats['dropped'] += 1
+
+    def _listen(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._report_drops([])
+                continue
+            if record is None:
+                return
+            batch = [record]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            self._write(batch)
+            if stop:
+                return
+
+    def _report_drops(self, lines: List[str]):
+        dropped = self._stats['dropped']
+        if dropped == self._reported_drops:
+            if lines:
+                self._write_lines(lines)
+            return
+        notice = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                   f"Log queue full: dropped {dropped - self._reported_drops} records",
+                                   None, None)
+        notice.dropped_total = dropped
+        self._reported_drops = dropped
+        self._write_lines(lines + [self.json_formatter.format(notice)])
+
+    def _write(self, records: List[logging.LogRecord]):
+        lines = []
+        for record in records:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            try:
+                lines.append(self.json_formatter.format(record))
+            except Exception:
+                self._stats['write_errors'] += 1
+        for handler in self.handlers:
+            handler.flush()
+        self._report_drops(lines)
+        self._stats['written'] += len(records)
+        self._stats['batches'] += 1
+
+    def _write_lines(self, lines: List[str]):
+        if self.writer is None or not lines:
+            return
+        try:
+            self.writer.write(lines)
+        except OSError:
+            self._stats['write_errors'] += 1
+
+    def stop(self, timeout: float = 5.0):
+        """Flush queued records; called at exit."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        for handler in self.handlers:
+            handler.close()
+        if self.writer is not None:
+            self.writer.close()
+
+    def add_handler(self, handler: logging.Handler):
+        """Also pass records to handler, on the listener thread."""
+        self.handlers.append(handler)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'queued': self.queue.qsize(), **self._stats}
+
+
+def configure_logging(path: Optional[str] = 'app.log', level: str = 'INFO',
+                      max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                      rotate_interval: Optional[float] = 24 * 60 * 60,
+                      queue_size: int = 10000, console: bool = True) -> AsyncLogPipeline:
+    """Route all logging through one asynchronous pipeline on the root logger.
+
+    Records go to path as JSON lines and, with console, to stderr in the
+    usual text format.
+    """
+    handlers = []
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        handlers.append(stream_handler)
+    writer = RotatingLogWriter(path, max_bytes, backup_count, rotate_interval) if path else None
+    pipeline = AsyncLogPipeline(writer, handlers, queue_size=queue_size)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(pipeline)
+    root.setLevel(level.upper())
+    return pipeline
@@ -0,0 +1,494 @@
+-- AMR-X Migration 001: monthly partitions, BRIN indexes and daily rollups
+-- Run once in your Supabase SQL editor, after supabase_schema.sql, on new and
+-- existing databases alike. Existing submissions are copied over.
+--
+-- Both submission tables become partitioned by month on created_at, so
+-- time-range scans only open the months they need. Dashboards read daily
+-- rollup and all-time total tables maintained by triggers on every insert
+-- and delete,
+-- and read the raw tables only for the newest submissions. This replaces
+-- the dashboard materialized views of supabase_schema.sql.
+
+BEGIN;
+
+-- Park the current tables; the dashboard views built on them go with them
+DROP MATERIALIZED VIEW IF EXISTS dashboard_location_counts;
+DROP MATERIALIZED VIEW IF EXISTS dashboard_medicine_counts;
+DROP MATERIALIZED VIEW IF EXISTS dashboard_pharmacist_activity;
+ALTER TABLE public_submissions RENAME TO public_submissions_unpartitioned;
+ALTER TABLE pharmacist_submissions RENAME TO pharmacist_submissions_unpartitioned;
+
+-- The partition key has to be part of the primary key
+CREATE TABLE public_submissions (
+    id UUID DEFAULT gen_random_uuid(),
+    symptoms TEXT NOT NULL,
+    medication TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    location TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    ip_address INET,
+    user_agent TEXT,
+    created_at_utc TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE pharmacist_submissions (
+    id UUID DEFAULT gen_random_uuid(),
+    medicine_name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    region TEXT NOT NULL,
+    pharmacist_id TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    ip_address INET,
+    user_agent TEXT,
+    created_at_utc TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Catches rows for months without a partition yet; create_submission_partitions() moves them out
+CREATE TABLE public_submissions_default PARTITION OF public_submissions DEFAULT;
+CREATE TABLE pharmacist_submissions_default PARTITION OF pharmacist_submissions DEFAULT;
+ALTER TABLE public_submissions_default ENABLE ROW LEVEL SECURITY;
+ALTER TABLE pharmacist_submissions_default ENABLE ROW LEVEL SECURITY;
+
+-- Create the monthly partitions (UTC months) from p_from through p_to that do not exist yet
+CREATE OR REPLACE FUNCTION create_submission_partitions(p_from DATE, p_to DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month DATE := date_trunc('month', p_from)::date;
+    starts_at TIMESTAMP WITH TIME ZONE;
+    ends_at TIMESTAMP WITH TIME ZONE;
+    parent TEXT;
+    partition TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month <= p_to LOOP
+        starts_at := month::timestamp AT TIME ZONE 'UTC';
+        ends_at := (month + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC';
+        FOREACH parent IN ARRAY ARRAY['public_submissions', 'pharmacist_submissions'] LOOP
+            partition := parent || to_char(month, '"_y"YYYY"m"MM');
+            IF to_regclass(partition) IS NULL THEN
+                EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', partition, parent);
+                -- Attaching fails while the default partition holds rows of the month
+                EXECUTE format('WITH moved AS (DELETE FROM %I WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                               'INSERT INTO %I SELECT * FROM moved', parent || '_default', starts_at, ends_at, partition);
+                EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               parent, partition, starts_at, ends_at);
+                -- Reads go through the parent's policies, never straight to a partition
+                EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', partition);
+                created := created + 1;
+            END IF;
+        END LOOP;
+        month := (month + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+SELECT create_submission_partitions(
+    LEAST(
+        (SELECT MIN(COALESCE(created_at, created_at_utc)) FROM public_submissions_unpartitioned),
+        (SELECT MIN(COALESCE(created_at, created_at_utc)) FROM pharmacist_submissions_unpartitioned),
+        NOW()
+    )::date,
+    (NOW() + INTERVAL '3 months')::date
+);
+
+INSERT INTO public_submissions
+SELECT id, symptoms, medication, duration, location, COALESCE(created_at, created_at_utc, NOW()),
+       ip_address, user_agent, created_at_utc
+FROM public_submissions_unpartitioned;
+
+INSERT INTO pharmacist_submissions
+SELECT id, medicine_name, category, quantity, region, pharmacist_id, COALESCE(created_at, created_at_utc, NOW()),
+       ip_address, user_agent, created_at_utc
+FROM pharmacist_submissions_unpartitioned;
+
+DROP TABLE public_submissions_unpartitioned;
+DROP TABLE pharmacist_submissions_unpartitioned;
+
+-- BRIN indexes summarize each block range by its created_at bounds: a few
+-- pages cover millions of append-ordered rows and prune time-range scans
+CREATE INDEX IF NOT EXISTS idx_public_submissions_created_at
+    ON public_submissions USING BRIN (created_at) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS idx_pharmacist_submissions_created_at
+    ON pharmacist_submissions USING BRIN (created_at) WITH (pages_per_range = 32);
+-- One pharmacist's newest submissions and keyset pages
+CREATE INDEX IF NOT EXISTS idx_pharmacist_submissions_pharmacist_created
+    ON pharmacist_submissions(pharmacist_id, created_at DESC, id DESC);
+
+ALTER TABLE public_submissions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE pharmacist_submissions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Public submissions are viewable by everyone" ON public_submissions
+    FOR SELECT USING (true);
+
+CREATE POLICY "Anyone can insert public submissions" ON public_submissions
+    FOR INSERT WITH CHECK (true);
+
+CREATE POLICY "Pharmacist submissions are viewable by owner" ON pharmacist_submissions
+    FOR SELECT USING (pharmacist_id = current_setting('app.current_user_id', true));
+
+CREATE POLICY "Authenticated users can insert pharmacist submissions" ON pharmacist_submissions
+    FOR INSERT WITH CHECK (pharmacist_id = current_setting('app.current_user_id', true));
+
+-- Daily rollups (UTC days). They grow with days x distinct values, not with submissions.
+CREATE TABLE IF NOT EXISTS daily_public_counts (
+    day DATE NOT NULL,
+    location TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (day, location)
+);
+
+CREATE TABLE IF NOT EXISTS daily_medicine_counts (
+    day DATE NOT NULL,
+    medicine_name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (day, medicine_name, category)
+);
+
+CREATE TABLE IF NOT EXISTS daily_pharmacist_counts (
+    pharmacist_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    region TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (pharmacist_id, day, region)
+);
+-- Earlier drafts of this migration also summed quantities for get_quantity_stats
+ALTER TABLE daily_pharmacist_counts DROP COLUMN IF EXISTS quantity;
+
+-- All-time totals for the public dashboard: one row per location or medicine,
+-- so it never sums the daily rows of the whole history
+CREATE TABLE IF NOT EXISTS location_totals (
+    location TEXT PRIMARY KEY,
+    count BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS medicine_totals (
+    medicine_name TEXT PRIMARY KEY,
+    count BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS pharmacist_region_totals (
+    pharmacist_id TEXT NOT NULL,
+    region TEXT NOT NULL,
+    count BIGINT NOT NULL,
+    PRIMARY KEY (pharmacist_id, region)
+);
+
+-- Rollups hold every pharmacist's counts; only the dashboard functions read them
+ALTER TABLE daily_public_counts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE daily_medicine_counts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE daily_pharmacist_counts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE location_totals ENABLE ROW LEVEL SECURITY;
+ALTER TABLE medicine_totals ENABLE ROW LEVEL SECURITY;
+ALTER TABLE pharmacist_region_totals ENABLE ROW LEVEL SECURITY;
+
+-- Statement-level triggers fold a whole multi-row insert into one upsert per
+-- rollup. Keys are upserted in a fixed order so concurrent inserts cannot deadlock.
+CREATE OR REPLACE FUNCTION rollup_public_submissions()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO daily_public_counts (day, location, count)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, location, COUNT(*)
+        FROM new_rows GROUP BY 1, 2 ORDER BY 1, 2
+        ON CONFLICT (day, location) DO UPDATE SET count = daily_public_counts.count + EXCLUDED.count;
+        
+        INSERT INTO location_totals (location, count)
+        SELECT location, COUNT(*) FROM new_rows GROUP BY 1 ORDER BY 1
+        ON CONFLICT (location) DO UPDATE SET count = location_totals.count + EXCLUDED.count;
+    ELSE
+        UPDATE daily_public_counts d SET count = d.count - o.count
+        FROM (SELECT (created_at AT TIME ZONE 'UTC')::date AS day, location, COUNT(*) AS count
+              FROM old_rows GROUP BY 1, 2) o
+        WHERE d.day = o.day AND d.location = o.location;
+        
+        UPDATE location_totals t SET count = t.count - o.count
+        FROM (SELECT location, COUNT(*) AS count FROM old_rows GROUP BY 1) o
+        WHERE t.location = o.location;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION rollup_pharmacist_submissions()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO daily_medicine_counts (day, medicine_name, category, count)
+        SELECT (created_at AT TIME ZONE 'UTC')::date, medicine_name, category, COUNT(*)
+        FROM new_rows GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (day, medicine_name, category) DO UPDATE SET count = daily_medicine_counts.count + EXCLUDED.count;
+        
+        INSERT INTO medicine_totals (medicine_name, count)
+        SELECT medicine_name, COUNT(*) FROM new_rows GROUP BY 1 ORDER BY 1
+        ON CONFLICT (medicine_name) DO UPDATE SET count = medicine_totals.count + EXCLUDED.count;
+        
+        INSERT INTO daily_pharmacist_counts (pharmacist_id, day, region, count)
+        SELECT pharmacist_id, (created_at AT TIME ZONE 'UTC')::date, region, COUNT(*)
+        FROM new_rows GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (pharmacist_id, day, region) DO UPDATE SET count = daily_pharmacist_counts.count + EXCLUDED.count;
+        
+        INSERT INTO pharmacist_region_totals (pharmacist_id, region, count)
+        SELECT pharmacist_id, region, COUNT(*) FROM new_rows GROUP BY 1, 2 ORDER BY 1, 2
+        ON CONFLICT (pharmacist_id, region) DO UPDATE SET count = pharmacist_region_totals.count + EXCLUDED.count;
+    ELSE
+        UPDATE daily_medicine_counts d SET count = d.count - o.count
+        FROM (SELECT (created_at AT TIME ZONE 'UTC')::date AS day, medicine_name, category, COUNT(*) AS count
+              FROM old_rows GROUP BY 1, 2, 3) o
+        WHERE d.day = o.day AND d.medicine_name = o.medicine_name AND d.category = o.category;
+        
+        UPDATE medicine_totals t SET count = t.count - o.count
+        FROM (SELECT medicine_name, COUNT(*) AS count FROM old_rows GROUP BY 1) o
+        WHERE t.medicine_name = o.medicine_name;
+        
+        UPDATE daily_pharmacist_counts d SET count = d.count - o.count
+        FROM (SELECT pharmacist_id, (created_at AT TIME ZONE 'UTC')::date AS day, region, COUNT(*) AS count
+              FROM old_rows GROUP BY 1, 2, 3) o
+        WHERE d.pharmacist_id = o.pharmacist_id AND d.day = o.day AND d.region = o.region;
+        
+        UPDATE pharmacist_region_totals t SET count = t.count - o.count
+        FROM (SELECT pharmacist_id, region, COUNT(*) AS count FROM old_rows GROUP BY 1, 2) o
+        WHERE t.pharmacist_id = o.pharmacist_id AND t.region = o.region;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER public_submissions_rollup_insert AFTER INSERT ON public_submissions
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION rollup_public_submissions();
+CREATE TRIGGER public_submissions_rollup_delete AFTER DELETE ON public_submissions
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION rollup_public_submissions();
+CREATE TRIGGER pharmacist_submissions_rollup_insert AFTER INSERT ON pharmacist_submissions
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION rollup_pharmacist_submissions();
+CREATE TRIGGER pharmacist_submissions_rollup_delete AFTER DELETE ON pharmacist_submissions
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION rollup_pharmacist_submissions();
+
+-- Recompute every rollup from the submissions: the backfill below, and a
+-- repair after rows were changed in place (updates are not tracked)
+CREATE OR REPLACE FUNCTION rebuild_dashboard_rollups()
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE public_submissions, pharmacist_submissions IN SHARE MODE;
+    TRUNCATE daily_public_counts, daily_medicine_counts, daily_pharmacist_counts,
+        location_totals, medicine_totals, pharmacist_region_totals;
+    INSERT INTO daily_public_counts (day, location, count)
+    SELECT (created_at AT TIME ZONE 'UTC')::date, location, COUNT(*)
+    FROM public_submissions GROUP BY 1, 2;
+    INSERT INTO daily_medicine_counts (day, medicine_name, category, count)
+    SELECT (created_at AT TIME ZONE 'UTC')::date, medicine_name, category, COUNT(*)
+    FROM pharmacist_submissions GROUP BY 1, 2, 3;
+    INSERT INTO daily_pharmacist_counts (pharmacist_id, day, region, count)
+    SELECT pharmacist_id, (created_at AT TIME ZONE 'UTC')::date, region, COUNT(*)
+    FROM pharmacist_submissions GROUP BY 1, 2, 3;
+    INSERT INTO location_totals (location, count)
+    SELECT location, SUM(count) FROM daily_public_counts GROUP BY 1;
+    INSERT INTO medicine_totals (medicine_name, count)
+    SELECT medicine_name, SUM(count) FROM daily_medicine_counts GROUP BY 1;
+    INSERT INTO pharmacist_region_totals (pharmacist_id, region, count)
+    SELECT pharmacist_id, region, SUM(count) FROM daily_pharmacist_counts GROUP BY 1, 2;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+SELECT rebuild_dashboard_rollups();
+
+-- Dashboard functions: counts from the rollups, lists from the newest rows
+CREATE OR REPLACE FUNCTION get_dashboard_stats()
+RETURNS JSON AS $$
+DECLARE
+    result JSON;
+    public_total BIGINT;
+    pharmacist_total BIGINT;
+    recent_since TIMESTAMP WITH TIME ZONE;
+BEGIN
+    SELECT COALESCE(SUM(count), 0) INTO public_total FROM location_totals;
+    SELECT COALESCE(SUM(count), 0) INTO pharmacist_total FROM medicine_totals;
+    -- The newest day from which on there are at least 5 submissions, so the
+    -- recent list below only scans the partitions holding those days. The
+    -- running sum walks the primary key backwards and stops at that day.
+    SELECT COALESCE((
+        SELECT day::timestamp AT TIME ZONE 'UTC'
+        FROM (
+            SELECT day, SUM(count) OVER (ORDER BY day DESC, location DESC) AS newer
+            FROM daily_public_counts
+            ORDER BY day DESC, location DESC
+        ) t
+        WHERE newer >= 5
+        LIMIT 1
+    ), '-infinity') INTO recent_since;
+    
+    SELECT json_build_object(
+        'totalEntries', public_total + pharmacist_total,
+        'total_submissions', public_total,
+        'resistance_cases', public_total / 6, -- Estimate 1 in 6 cases show resistance
+        'misuse_percentage', 25, -- Static estimate
+        'countries_affected', (
+            SELECT COUNT(*) FROM location_totals WHERE count > 0
+        ),
+        'highRiskZones', (
+            SELECT COALESCE(json_agg(location ORDER BY count DESC, location), '[]')
+            FROM (
+                SELECT location, count
+                FROM location_totals
+                WHERE count > 0
+                ORDER BY count DESC, location
+                LIMIT 3
+            ) t
+        ),
+        'commonAntibiotics', (
+            SELECT COALESCE(json_agg(medicine_name ORDER BY count DESC, medicine_name), '[]')
+            FROM (
+                SELECT medicine_name, count
+                FROM medicine_totals
+                WHERE count > 0
+                ORDER BY count DESC, medicine_name
+                LIMIT 3
+            ) t
+        ),
+        'recentSubmissions', (
+            SELECT COALESCE(json_agg(
+                json_build_object(
+                    'id', id,
+                    'type', 'public',
+                    'symptoms', symptoms,
+                    'medication', medication,
+                    'location', location,
+                    'timestamp', created_at
+                ) ORDER BY created_at DESC
+            ), '[]')
+            FROM (
+                SELECT * FROM public_submissions
+                WHERE created_at >= recent_since
+                ORDER BY created_at DESC
+                LIMIT 5
+            ) t
+        )
+    ) INTO result;
+    
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION get_pharmacist_dashboard(p_pharmacist_id TEXT)
+RETURNS JSON AS $$
+DECLARE
+    result JSON;
+    total BIGINT;
+    month_start DATE := date_trunc('month', NOW() AT TIME ZONE 'UTC')::date;
+    recent_since TIMESTAMP WITH TIME ZONE;
+BEGIN
+    SELECT COALESCE(SUM(count), 0) INTO total
+    FROM pharmacist_region_totals
+    WHERE pharmacist_id = p_pharmacist_id;
+    -- As in get_dashboard_stats(): the newest day from which on there are 10 submissions
+    SELECT COALESCE((
+        SELECT day::timestamp AT TIME ZONE 'UTC'
+        FROM (
+            SELECT day, SUM(count) OVER (ORDER BY day DESC, region DESC) AS newer
+            FROM daily_pharmacist_counts
+            WHERE pharmacist_id = p_pharmacist_id
+            ORDER BY day DESC, region DESC
+        ) t
+        WHERE newer >= 10
+        LIMIT 1
+    ), '-infinity') INTO recent_since;
+    
+    SELECT json_build_object(
+        'total_submissions', total,
+        'monthly_submissions', (
+            SELECT COALESCE(SUM(count), 0) FROM daily_pharmacist_counts
+            WHERE pharmacist_id = p_pharmacist_id AND day >= month_start
+        ),
+        'resistance_cases', total / 6, -- Estimate
+        'success_rate', 85, -- Static estimate
+        'recent_submissions', (
+            SELECT COALESCE(json_agg(
+                json_build_object(
+                    'id', id,
+                    'medicine_name', medicine_name,
+                    'category', category,
+                    'quantity', quantity,
+                    'region', region,
+                    'timestamp', created_at
+                ) ORDER BY created_at DESC
+            ), '[]')
+            FROM (
+                SELECT * FROM pharmacist_submissions
+                WHERE pharmacist_id = p_pharmacist_id AND created_at >= recent_since
+                ORDER BY created_at DESC
+                LIMIT 10
+            ) t
+        ),
+        'monthly_trends', (
+            SELECT COALESCE(json_agg(
+                json_build_object(
+                    'month', to_char(month, 'YYYY-MM'),
+                    'count', count
+                ) ORDER BY month
+            ), '[]')
+            FROM (
+                SELECT date_trunc('month', day) AS month, SUM(count) AS count
+                FROM daily_pharmacist_counts
+                WHERE pharmacist_id = p_pharmacist_id
+                AND day >= (month_start - INTERVAL '5 months')::date
+                GROUP BY 1
+                HAVING SUM(count) > 0
+            ) t
+        ),
+        'region_counts', (
+            SELECT COALESCE(json_object_agg(region, count), '{}')
+            FROM (
+                SELECT region, count
+                FROM pharmacist_region_totals
+                WHERE pharmacist_id = p_pharmacist_id AND count > 0
+            ) t
+        )
+    ) INTO result;
+    
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
+
+DROP FUNCTION IF EXISTS get_quantity_stats(TEXT);
+
+-- The rollups are always current, so periodic upkeep is only making sure the
+-- next months have partitions. The name is kept for schedulers set up for
+-- the dashboard views.
+CREATE OR REPLACE FUNCTION refresh_dashboard_views()
+RETURNS VOID AS $$
+BEGIN
+    PERFORM create_submission_partitions(CURRENT_DATE, (CURRENT_DATE + INTERVAL '3 months')::date);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Upkeep locks the submission tables and creates partitions, and a
+-- pharmacist dashboard is returned for whatever id the caller names: only
+-- the server's service role and pg_cron may call them, never an API key over /rpc
+REVOKE EXECUTE ON FUNCTION create_submission_partitions(DATE, DATE), rebuild_dashboard_rollups(),
+    refresh_dashboard_views(), get_pharmacist_dashboard(TEXT) FROM PUBLIC;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION create_submission_partitions(DATE, DATE), rebuild_dashboard_rollups(),
+            refresh_dashboard_views(), get_pharmacist_dashboard(TEXT) FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION create_submission_partitions(DATE, DATE), rebuild_dashboard_rollups(),
+            refresh_dashboard_views(), get_pharmacist_dashboard(TEXT) TO service_role;
+    END IF;
+END;
+$$;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        IF EXISTS (SELECT 1 FROM cron.job WHERE jobname = 'refresh-dashboard-views') THEN
+            PERFORM cron.unschedule('refresh-dashboard-views');
+        END IF;
+        PERFORM cron.schedule('create-submission-partitions', '0 3 * * *', 'SELECT refresh_dashboard_views()');
+    END IF;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,152 @@
+"""
+Password hashing for AMR-X Backend
+Hashes passwords with scrypt in a small, bounded thread pool. hashlib.scrypt
+releases the GIL, so hashes run in parallel with each other and with the
+worker's request threads, and the pool size caps how many CPU cores and how
+much memory logins can take. Once the pool and its queue are full, further
+requests are refused at once with HasherBusy instead of piling up behind a
+burst of login attempts; so are requests still waiting when the timeout
+passes.
+
+Stored hashes look like scrypt$<n>$<r>$<p>$<salt>$<hash> (base64). Legacy
+salted SHA-256 hex digests still verify, and are reported as needing a
+rehash so they can be upgraded on the next successful login.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Any, Optional, Tuple
+
+SCHEME = 'scrypt'
+
+
+class HasherBusy(Exception):
+    """The hashing pool is saturated; retry later."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class PasswordHasher:
+    """scrypt hashing and verification on a bounded pool of threads.
+
+    At most workers hashes run at once and at most max_pending more wait;
+    anything beyond that raises HasherBusy. timeout bounds how long a
+    caller waits for its result, and also raises HasherBusy when it passes.
+    """
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1, workers: int = 2,
+                 max_pending: int = 8, timeout: float = 10.0, legacy_salt: Optional[str] = None):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.legacy_salt = legacy_salt
+        self._slots = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._stats = {'hashed': 0, 'verified': 0, 'rejected': 0, 'timed_out': 0, 'legacy': 0}
+        # Verified against for unknown accounts, so they take as long as known ones
+        self._dummy_hash = self._encode(self.n, self.r, self.p, b'\0' * 16, b'\0' * 32)
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        """Create the pool, again in each forked worker."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+                    self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+                    self._pid = os.getpid()
+        return self._executor
+
+    @staticmethod
+    def _encode(n: int, r: int, p: int, salt: bytes, digest: bytes) -> str:
+        return f"{SCHEME}${n}${r}${p}${_b64encode(salt)}${_b64encode(digest)}"
+
+    @staticmethod
+    def _scrypt(password: str, salt: bytes, n: int, r: int, p: int, length: int) -> bytes:
+        # scrypt needs about 128 * r * (n + p) bytes; leave headroom over OpenSSL's 32 MiB default
+        maxmem = 128 * r * (n + p + 2) + 1024 * 1024
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=length)
+
+    def _run(self, function, *args):
+        executor = self._ensure_executor()
+        if not self._slots.acquire(blocking=False):
+            self._stats['rejected'] += 1
+            raise HasherBusy('Password hashing pool is saturated')
+        try:
+            future = executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Still queued behind a saturated pool: drop it rather than hash for nobody
+            future.cancel()
+            self._stats['timed_out'] += 1
+            raise HasherBusy('Password hashing timed out') from None
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the current parameters. Raises HasherBusy."""
+        salt = secrets.token_bytes(16)
+        digest = self._run(self._scrypt, password, salt, self.n, self.r, self.p, 32)
+        self._stats['hashed'] += 1
+        return self._encode(self.n, self.r, self.p, salt, digest)
+
+    def verify(self, password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+        """Return (matches, needs_rehash) for a stored hash. Raises HasherBusy.
+
+        A missing hash still costs one scrypt run, so unknown accounts can
+        not be told apart by timing.
+        """
+        if stored and not stored.startswith(f"{SCHEME}$"):
+            return self._verify_legacy(password, stored), True
+        try:
+            _, n, r, p, salt, expected = (stored or self._dummy_hash).split('$')
+            n, r, p = int(n), int(r), int(p)
+            salt, expected = _b64decode(salt), _b64decode(expected)
+        except ValueError:
+            return False, False
+        digest = self._run(self._scrypt, password, salt, n, r, p, len(expected))
+        self._stats['verified'] += 1
+        if not stored or not hmac.compare_digest(digest, expected):
+            return False, False
+        return True, (n, r, p) != (self.n, self.r, self.p)
+
+    def _verify_legacy(self, password: str, stored: str) -> bool:
+        if self.legacy_salt is None:
+            return False
+        self._stats['legacy'] += 1
+        digest = hashlib.sha256((password + self.legacy_salt).encode()).hexdigest()
+        return hmac.compare_digest(digest, stored)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'workers': self.workers, 'max_pending': self.max_pending,
+                'params': {'n': self.n, 'r': self.r, 'p': self.p}, **self._stats}
+
+
+def create_hasher() -> PasswordHasher:
+    """PasswordHasher configured from the PASSWORD_HASH_* environment variables."""
+    return PasswordHasher(
+        n=int(os.getenv('PASSWORD_HASH_N', 2 ** 14)),
+        r=int(os.getenv('PASSWORD_HASH_R', 8)),
+        p=int(os.getenv('PASSWORD_HASH_P', 1)),
+        workers=int(os.getenv('PASSWORD_HASH_WORKERS', 2)),
+        max_pending=int(os.getenv('PASSWORD_HASH_QUEUE', 8)),
+        legacy_salt=os.getenv('PASSWORD_SALT', 'amr_salt_2024')
+    )
@@ -0,0 +1,257 @@
+"""
+Rate limit storage for AMR-X Backend
+A Flask-Limiter (limits) storage backend kept in a shared memory-mapped
+file, so every gunicorn worker on the box counts against the same limits.
+The file is a fixed-size hash table: a key hashes to a bucket of a few
+slots, and each slot holds the key's 64-bit hash, its expiry and its
+counters. Memory is therefore bounded; expired slots are reused, and when a
+bucket is full of live keys the one closest to expiring is evicted.
+
+Buckets are guarded by byte-range locks on the file, striped so workers
+rarely wait for each other, plus a thread lock per stripe within a worker.
+The sliding window counter keeps both of its windows in one slot, so a
+check-and-hit is one lock, one bucket read and one slot write.
+
+Use it with storage_uri='amrx-shm:///dev/shm/amrx-ratelimit?slots=65536';
+importing this module registers the scheme. Where fcntl is missing
+(Windows), storage_uri() swaps amrx-shm:// for the per-process memory://
+storage.
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport
+
+try:
+    import fcntl
+except ImportError:  # Windows: no byte-range locks, see storage_uri()
+    fcntl = None
+
+MAGIC = b'AMRXRL01'
+HEADER = struct.Struct('<8sII')  # magic, bucket count, slots per bucket
+SLOT = struct.Struct('<Qdqq')  # key hash, expires at, count, previous window count
+HEADER_SIZE = 64
+
+
+def _default_path() -> str:
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, f"amrx-ratelimit-{os.getuid()}")
+
+
+def storage_uri(uri: str) -> str:
+    """uri, or memory:// when it names amrx-shm:// and fcntl is unavailable."""
+    if fcntl is None and urlparse(uri).scheme in SharedMemoryStorage.STORAGE_SCHEME:
+        return 'memory://'
+    return uri
+
+
+def _key_hash(key: str) -> int:
+    # 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+
+class SharedMemoryStorage(Storage, SlidingWindowCounterSupport):
+    """Cross-worker rate limit counters in a memory-mapped file.
+
+    Supports the fixed-window and sliding-window-counter strategies.
+    """
+
+    STORAGE_SCHEME = ['amrx-shm']
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options):
+        parsed = urlparse(uri or 'amrx-shm://')
+        query = {name: values[-1] for name, values in parse_qs(parsed.query).items()}
+        self.path = parsed.path or _default_path()
+        slots = int(options.get('slots', query.get('slots', 65536)))
+        self.bucket_slots = int(options.get('bucket_slots', query.get('bucket_slots', 8)))
+        self.buckets = max(1, slots // self.bucket_slots)
+        self.stripes = int(options.get('stripes', query.get('stripes', 64)))
+        self.bucket = struct.Struct('<' + SLOT.format[1:] * self.bucket_slots)
+        self._pid = None
+        self._stats = {'evictions': 0}
+        super().__init__(uri, wrap_exceptions=wrap_exceptions)
+        self._open()
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def _open(self):
+        """Map the table, creating it if needed; again in each forked worker."""
+        if self._pid is not None:
+            self._map.close()
+            os.close(self._fd)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX, HEADER_SIZE, 0)
+        try:
+            header = os.pread(fd, HEADER.size, 0)
+            if len(header) == HEADER.size and header[:8] == MAGIC:
+                # Another worker created it; its geometry wins
+                _, self.buckets, self.bucket_slots = HEADER.unpack(header)
+                self.bucket = struct.Struct('<' + SLOT.format[1:] * self.bucket_slots)
+            else:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, HEADER_SIZE + self.buckets * self.bucket.size)
+                os.pwrite(fd, HEADER.pack(MAGIC, self.buckets, self.bucket_slots), 0)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, HEADER_SIZE, 0)
+        self._fd = fd
+        self._map = mmap.mmap(fd, HEADER_SIZE + self.buckets * self.bucket.size)
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _locked_bucket(self, key: str):
+        """Lock the bucket for key; yields (key hash, bucket offset, unpacked slots)."""
+        if self._pid != os.getpid():
+            self._open()
+        key_hash = _key_hash(key)
+        index = key_hash % self.buckets
+        stripe = index % self.stripes
+        offset = HEADER_SIZE + index * self.bucket.size
+        with self._locks[stripe]:
+            # Byte 'stripe' of the header stands for every bucket in the stripe
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield key_hash, offset, self.bucket.unpack_from(self._map, offset)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    @staticmethod
+    def _find(key_hash: int, slots: Tuple, now: float) -> Tuple[int, Optional[Tuple[float, int, int]]]:
+        """(slot position, (expires at, count, previous) if still live) of a key, else (-1, None).
+
+        A key keeps its slot once it has one, so its hash appears at most once per bucket.
+        """
+        try:
+            position = slots[0::4].index(key_hash)
+        except ValueError:
+            return -1, None
+        start = position * 4 + 1
+        return position, (slots[start:start + 3] if slots[start] > now else None)
+
+    def _store(self, key_hash: int, offset: int, slots: Tuple, position: int, now: float,
+               expires_at: float, count: int, previous: int = 0):
+        if position < 0:
+            # Reuse an empty or expired slot, or evict the live key closest to expiring
+            expiries = slots[1::4]
+            position = min(range(len(expiries)), key=lambda slot: (slots[slot * 4] != 0 and expiries[slot] > now,
+                                                                   expiries[slot]))
+            if slots[position * 4] != 0 and expiries[position] > now:
+                self._stats['evictions'] += 1
+        SLOT.pack_into(self._map, offset + position * SLOT.size, key_hash, expires_at, count, previous)
+
+    # Fixed window
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._locked_bucket(key) as (key_hash, offset, slots):
+            position, entry = self._find(key_hash, slots, now)
+            if entry is None:
+                expires_at, count = now + expiry, amount
+            else:
+                expires_at, count = entry[0], entry[1] + amount
+            self._store(key_hash, offset, slots, position, now, expires_at, count)
+            return count
+
+    def get(self, key: str) -> int:
+        with self._locked_bucket(key) as (key_hash, _, slots):
+            _, entry = self._find(key_hash, slots, time.time())
+            return entry[1] if entry else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._locked_bucket(key) as (key_hash, _, slots):
+            _, entry = self._find(key_hash, slots, now)
+            return entry[0] if entry else now
+
+    def clear(self, key: str) -> None:
+        now = time.time()
+        with self._locked_bucket(key) as (key_hash, offset, slots):
+            position, _ = self._find(key_hash, slots, now)
+            if position >= 0:
+                SLOT.pack_into(self._map, offset + position * SLOT.size, 0, 0.0, 0, 0)
+
+    def check(self) -> bool:
+        return not self._map.closed
+
+    def reset(self) -> Optional[int]:
+        """Clear every key; returns how many were live."""
+        if self._pid != os.getpid():
+            self._open()
+        now = time.time()
+        live = 0
+        for lock in self._locks:
+            lock.acquire()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, self.stripes, 0)
+        try:
+            table = memoryview(self._map)[HEADER_SIZE:]
+            live = sum(1 for key_hash, expires_at, _, _ in SLOT.iter_unpack(table) if key_hash and expires_at > now)
+            table.release()
+            self._map[HEADER_SIZE:] = bytes(len(self._map) - HEADER_SIZE)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, self.stripes, 0)
+            for lock in self._locks:
+                lock.release()
+        return live
+
+    # Sliding window counter: one slot per key holds the current and previous
+    # window counts and expires two windows after the current one started
+
+    @staticmethod
+    def _windows(entry: Optional[Tuple[float, int, int]], expiry: int, now: float) -> Tuple[int, int]:
+        """(previous count, current count) as of now."""
+        if entry is None:
+            return 0, 0
+        window = round(entry[0] / expiry) - 2
+        current_window = math.floor(now / expiry)
+        if window == current_window:
+            return entry[2], entry[1]
+        if window == current_window - 1:
+            return entry[1], 0
+        return 0, 0
+
+    @staticmethod
+    def _ttls(previous: int, expiry: int, now: float) -> Tuple[float, float]:
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_ttl, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = time.time()
+        with self._locked_bucket(f"sw:{key}") as (key_hash, offset, slots):
+            position, entry = self._find(key_hash, slots, now)
+            previous, current = self._windows(entry, expiry, now)
+            previous_ttl, _ = self._ttls(previous, expiry, now)
+            if math.floor(previous * previous_ttl / expiry + current) + amount > limit:
+                return False
+            expires_at = (math.floor(now / expiry) + 2) * expiry
+            self._store(key_hash, offset, slots, position, now, expires_at, current + amount, previous)
+            return True
+
+    def get_sliding_window(self, key: str, expiry: int) -> Tuple[int, float, int, float]:
+        now = time.time()
+        with self._locked_bucket(f"sw:{key}") as (key_hash, _, slots):
+            _, entry = self._find(key_hash, slots, now)
+        previous, current = self._windows(entry, expiry, now)
+        previous_ttl, current_ttl = self._ttls(previous, expiry, now)
+        return previous, previous_ttl, current, current_ttl
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        self.clear(f"sw:{key}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {'path': self.path, 'capacity': self.buckets * self.bucket_slots, **self._stats}
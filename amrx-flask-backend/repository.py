@@ -0,0 +1,605 @@
+"""
+Data repositories for AMR-X Backend
+One interface for saving submissions, aggregating dashboards, paginating a
+pharmacist's submissions and looking up pharmacists, with Firestore,
+Supabase and embedded SQLite implementations chosen by STORAGE_BACKEND.
+
+Records use the column names of supabase_schema.sql whatever the backend:
+public submissions have symptoms, medication, duration and location,
+pharmacist submissions have medicine_name, category, quantity, region and
+pharmacist_id, and both have id, created_at, ip_address and user_agent.
+
+The SQLite backend keeps everything in one local WAL-mode file with the
+indexes of supabase_schema.sql, for single-node deployments and load tests
+that should not wait on the network.
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from cursors import InvalidCursor
+from directory import PharmacistDirectory, PharmacistEntry, entry_from
+
+logger = logging.getLogger(__name__)
+
+Row = Dict[str, Any]
+PageKey = Tuple[datetime, str]  # (created_at, id) of the last row of the previous page
+
+RESISTANCE_ESTIMATE = 6  # 1 in 6 public cases is assumed to show resistance, as in get_dashboard_stats()
+MISUSE_PERCENTAGE = 25
+SUCCESS_RATE = 85
+TREND_MONTHS = 6  # Months in a pharmacist's monthly trend, this one included
+REGION_SCAN_LIMIT = 1000  # Newest submissions read for region counts where the store cannot group them
+
+
+def utc_timestamp(value: Any = None) -> str:
+    """Fixed-width ISO 8601 UTC timestamp, so timestamps also sort as strings.
+
+    Naive datetimes (and naive ISO strings) are taken as local time, which is
+    what datetime.now() returns.
+    """
+    if value is None:
+        moment = datetime.now(timezone.utc)
+    elif isinstance(value, datetime):
+        moment = value
+    else:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
+
+
+def _months_ago(months: int) -> datetime:
+    """Midnight UTC at the start of the month, months months back (0 for this month)."""
+    now = datetime.now(timezone.utc)
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    return now.replace(year=year, month=month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _month_of(value: Any) -> Optional[str]:
+    return f"{value.year}-{value.month:02d}" if hasattr(value, 'month') else None
+
+
+def monthly_trends(counts: Dict[str, int]) -> List[Row]:
+    """[{'month': 'YYYY-MM', 'count'}] for the last TREND_MONTHS months, oldest first, with 0 for empty months."""
+    months = [_month_of(_months_ago(months)) for months in range(TREND_MONTHS - 1, -1, -1)]
+    return [{'month': month, 'count': counts.get(month, 0)} for month in months]
+
+
+class SubmissionRepository:
+    """Storage interface shared by every app variant."""
+
+    name = 'base'
+    demo = False  # No database behind it: only the demo pharmacist can sign in
+
+    def save_public_submissions(self, rows: List[Row]) -> List[Row]:
+        """Insert public submissions; rows that carry an id already saved are skipped.
+
+        Returns the saved rows with their ids. Raises on failure.
+        """
+        raise NotImplementedError
+
+    def save_pharmacist_submissions(self, rows: List[Row]) -> List[Row]:
+        """Insert pharmacist submissions in as few round trips as possible.
+
+        Returns the rows saved; on a failure part way, the saved prefix.
+        """
+        raise NotImplementedError
+
+    def dashboard_stats(self) -> Dict[str, Any]:
+        """Public dashboard counters, top lists and the 5 newest public submissions."""
+        raise NotImplementedError
+
+    def pharmacist_dashboard(self, pharmacist_id: str) -> Dict[str, Any]:
+        """One pharmacist's counters, recent submissions, monthly trend and regions."""
+        raise NotImplementedError
+
+    def list_pharmacist_submissions(self, pharmacist_id: str, limit: int,
+                                    after: Optional[PageKey] = None) -> Tuple[List[Row], bool]:
+        """One keyset page of a pharmacist's submissions, newest first: (rows, more pages).
+
+        Raises InvalidCursor for a position whose id this store cannot hold.
+        """
+        raise NotImplementedError
+
+    def find_pharmacist(self, email: str) -> Optional[PharmacistEntry]:
+        """The pharmacist with a normalized email, if any."""
+        raise NotImplementedError
+
+    def create_pharmacist(self, data: Row) -> Optional[str]:
+        """Insert a pharmacist; returns its id, or None if the email is taken."""
+        raise NotImplementedError
+
+    def update_pharmacist(self, email: str, fields: Row):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.name}
+
+
+class SQLiteRepository(SubmissionRepository):
+    """Every table in one local SQLite file, shared by the workers on the machine."""
+
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS public_submissions (
+            id TEXT PRIMARY KEY,
+            symptoms TEXT NOT NULL,
+            medication TEXT NOT NULL,
+            duration INTEGER NOT NULL,
+            location TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            ip_address TEXT,
+            user_agent TEXT
+        );
+        CREATE TABLE IF NOT EXISTS pharmacist_submissions (
+            id TEXT PRIMARY KEY,
+            medicine_name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            region TEXT NOT NULL,
+            pharmacist_id TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            ip_address TEXT,
+            user_agent TEXT
+        );
+        CREATE TABLE IF NOT EXISTS pharmacists (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            institution TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL,
+            last_login TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_public_submissions_created_at ON public_submissions(created_at);
+        CREATE INDEX IF NOT EXISTS idx_public_submissions_location ON public_submissions(location);
+        CREATE INDEX IF NOT EXISTS idx_pharmacist_submissions_created_at ON pharmacist_submissions(created_at);
+        -- Also serves keyset pages of one pharmacist's submissions, newest first
+        CREATE INDEX IF NOT EXISTS idx_pharmacist_submissions_pharmacist_id
+            ON pharmacist_submissions(pharmacist_id, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_pharmacist_submissions_region ON pharmacist_submissions(region);
+        -- Covers the top antibiotics GROUP BY, which Postgres answers from its own statistics-backed plans
+        CREATE INDEX IF NOT EXISTS idx_pharmacist_submissions_medicine_name ON pharmacist_submissions(medicine_name);
+    """
+
+    PUBLIC_COLUMNS = ('id', 'symptoms', 'medication', 'duration', 'location', 'created_at', 'ip_address', 'user_agent')
+    PHARMACIST_COLUMNS = ('id', 'medicine_name', 'category', 'quantity', 'region', 'pharmacist_id',
+                          'created_at', 'ip_address', 'user_agent')
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'amrx.sqlite3')
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            # WAL with NORMAL sync stays consistent on a crash and may lose only the last commits on power loss
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA cache_size=-16000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _insert(self, table: str, columns: Tuple[str, ...], rows: List[Row], ignore_existing: bool) -> List[Row]:
+        saved = []
+        for row in rows:
+            saved.append({**row, 'id': row.get('id') or str(uuid.uuid4()),
+                          'created_at': utc_timestamp(row.get('created_at'))})
+        verb = 'INSERT OR IGNORE' if ignore_existing else 'INSERT'
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [tuple(row.get(column) for column in columns) for row in saved]
+            )
+        return saved
+
+    def save_public_submissions(self, rows):
+        return self._insert('public_submissions', self.PUBLIC_COLUMNS, rows, ignore_existing=True)
+
+    def save_pharmacist_submissions(self, rows):
+        return self._insert('pharmacist_submissions', self.PHARMACIST_COLUMNS, rows, ignore_existing=False)
+
+    def dashboard_stats(self):
+        conn = self._connect()
+        public_total, locations = conn.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT location) FROM public_submissions').fetchone()
+        pharmacist_total = conn.execute('SELECT COUNT(*) FROM pharmacist_submissions').fetchone()[0]
+        zones = conn.execute('SELECT location FROM public_submissions GROUP BY location '
+                             'ORDER BY COUNT(*) DESC LIMIT 3').fetchall()
+        medicines = conn.execute('SELECT medicine_name FROM pharmacist_submissions GROUP BY medicine_name '
+                                 'ORDER BY COUNT(*) DESC LIMIT 3').fetchall()
+        recent = conn.execute('SELECT id, symptoms, medication, location, created_at FROM public_submissions '
+                              'ORDER BY created_at DESC LIMIT 5').fetchall()
+        return {
+            'totalEntries': public_total + pharmacist_total,
+            'total_submissions': public_total,
+            'resistance_cases': public_total // RESISTANCE_ESTIMATE,
+            'misuse_percentage': MISUSE_PERCENTAGE,
+            'countries_affected': locations,
+            'highRiskZones': [row[0] for row in zones],
+            'commonAntibiotics': [row[0] for row in medicines],
+            'recentSubmissions': [{'id': row['id'], 'type': 'public', 'symptoms': row['symptoms'],
+                                   'medication': row['medication'], 'location': row['location'],
+                                   'timestamp': row['created_at']} for row in recent]
+        }
+
+    def pharmacist_dashboard(self, pharmacist_id):
+        conn = self._connect()
+        total, monthly = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(created_at >= ?), 0) FROM pharmacist_submissions '
+            'WHERE pharmacist_id = ?', (utc_timestamp(_months_ago(0)), pharmacist_id)).fetchone()
+        recent, _ = self.list_pharmacist_submissions(pharmacist_id, 10)
+        trends = conn.execute(
+            'SELECT substr(created_at, 1, 7) AS month, COUNT(*) FROM pharmacist_submissions '
+            'WHERE pharmacist_id = ? AND created_at >= ? GROUP BY month',
+            (pharmacist_id, utc_timestamp(_months_ago(TREND_MONTHS - 1)))).fetchall()
+        regions = conn.execute('SELECT region, COUNT(*) FROM pharmacist_submissions WHERE pharmacist_id = ? '
+                               'GROUP BY region', (pharmacist_id,)).fetchall()
+        return {
+            'total_submissions': total,
+            'monthly_submissions': monthly,
+            'resistance_cases': total // RESISTANCE_ESTIMATE,
+            'success_rate': SUCCESS_RATE,
+            'recent_submissions': [{'id': row['id'], 'medicine_name': row['medicine_name'],
+                                    'category': row['category'], 'quantity': row['quantity'],
+                                    'region': row['region'], 'timestamp': row['created_at']} for row in recent],
+            'monthly_trends': monthly_trends(dict(trends)),
+            'region_counts': {region: count for region, count in regions}
+        }
+
+    def list_pharmacist_submissions(self, pharmacist_id, limit, after=None):
+        query = ('SELECT id, medicine_name, category, quantity, region, created_at FROM pharmacist_submissions '
+                 'WHERE pharmacist_id = ?')
+        params: list = [pharmacist_id]
+        if after is not None:
+            query += ' AND (created_at, id) < (?, ?)'
+            params.extend((utc_timestamp(after[0]), after[1]))
+        query += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+        rows = [dict(row) for row in self._connect().execute(query, params)]
+        return rows[:limit], len(rows) > limit
+
+    def find_pharmacist(self, email):
+        row = self._connect().execute(
+            'SELECT id, email, password_hash, active, name, institution FROM pharmacists WHERE email = ?',
+            (email,)).fetchone()
+        return entry_from(row['id'], {**dict(row), 'active': bool(row['active'])}) if row else None
+
+    def create_pharmacist(self, data):
+        pharmacist_id = data.get('id') or str(uuid.uuid4())
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT INTO pharmacists (id, name, email, password_hash, institution, active, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (pharmacist_id, data['name'], data['email'], data['password_hash'], data['institution'],
+                     int(data.get('active', True)), utc_timestamp(data.get('created_at'))))
+        except sqlite3.IntegrityError:
+            return None
+        return pharmacist_id
+
+    def update_pharmacist(self, email, fields):
+        if not fields:
+            return
+        with self._connect() as conn:
+            conn.execute(f"UPDATE pharmacists SET {', '.join(f'{column} = ?' for column in fields)} WHERE email = ?",
+                         (*fields.values(), email))
+
+    def stats(self):
+        return {'backend': self.name, 'path': self.path}
+
+
+class SupabaseRepository(SubmissionRepository):
+    """Supabase tables through SupabaseService, which also covers its demo mode."""
+
+    name = 'supabase'
+
+    def __init__(self, service):
+        self.service = service
+        self.pool = service.pool
+        self.demo = self.pool is None
+
+    def save_public_submissions(self, rows):
+        if all(row.get('id') for row in rows):
+            self.service.insert_public_submissions(rows)
+            return rows
+        if not self.pool:
+            return [self.service.save_public_submission(row) for row in rows]
+        with self.pool.connection() as client:
+            return client.table('public_submissions').insert(rows).execute().data or []
+
+    def save_pharmacist_submissions(self, rows):
+        return self.service.save_pharmacist_submissions(rows)
+
+    def dashboard_stats(self):
+        return self.service.get_dashboard_stats()
+
+    def pharmacist_dashboard(self, pharmacist_id):
+        dashboard = self.service.get_pharmacist_dashboard(pharmacist_id)
+        # The SQL function lists only months with submissions
+        counts = {trend['month']: trend['count'] for trend in dashboard.get('monthly_trends') or []}
+        return {**dashboard, 'monthly_trends': monthly_trends(counts)}
+
+    def list_pharmacist_submissions(self, pharmacist_id, limit, after=None):
+        if after is not None:
+            try:
+                # The id is spliced into a PostgREST filter, so only a canonical UUID may reach it
+                created_at, row_id = utc_timestamp(after[0]), str(uuid.UUID(after[1]))
+            except ValueError:
+                raise InvalidCursor('Not a submission id') from None
+        if not self.pool:
+            return [], False
+        with self.pool.connection() as client:
+            query = (client.table('pharmacist_submissions')
+                     .select('id,medicine_name,category,quantity,region,created_at')
+                     .eq('pharmacist_id', pharmacist_id))
+            if after is not None:
+                query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})')
+            rows = query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute().data or []
+        return rows[:limit], len(rows) > limit
+
+    def find_pharmacist(self, email):
+        return self.service.pharmacists.lookup(email) if self.pool else None
+
+    def create_pharmacist(self, data):
+        if not self.pool:
+            print(f"Demo mode: Would register pharmacist: {data['email']}")
+            return 'demo_pharmacist'
+        if self.service.pharmacists.lookup(data['email']):
+            return None
+        with self.pool.connection() as client:
+            result = client.table('pharmacists').insert(data).execute()
+        if not result.data:
+            return None
+        self.service.pharmacists.put(str(result.data[0]['id']), result.data[0])
+        return str(result.data[0]['id'])
+
+    def update_pharmacist(self, email, fields):
+        if not self.pool:
+            return
+        with self.pool.connection() as client:
+            client.table('pharmacists').update(fields).eq('email', email).execute()
+        self.service.pharmacists.update(email, **{name: value for name, value in fields.items()
+                                                  if name in PharmacistEntry._fields})
+
+    def stats(self):
+        return {'backend': self.name, 'connected': self.pool is not None,
+                'pools': self.service.stats(),
+                'pharmacist_directory': self.service.pharmacists.stats()}
+
+
+class FirestoreRepository(SubmissionRepository):
+    """Firestore collections, with the document fields app.py writes.
+
+    Pharmacist lookups go through a per-worker PharmacistDirectory kept
+    current by a snapshot listener. The Firestore helpers are imported on
+    first use, so the other backends run without the Google libraries.
+    """
+
+    name = 'firestore'
+
+    # Record column -> Firestore field, where they differ
+    PHARMACIST_FIELDS = {'medicine_name': 'medicineName', 'created_at': 'timestamp'}
+    PUBLIC_FIELDS = {'created_at': 'timestamp'}
+    BATCH_ROWS = 499  # Firestore batches hold 500 writes; one is the rollup shard
+
+    def __init__(self, db, refresh_interval: float = 60.0):
+        self.db = db
+        self.pharmacists = PharmacistDirectory(self._load_pharmacists, self._load_pharmacist,
+                                               self._watch_pharmacists, refresh_interval=refresh_interval)
+        self.pharmacists.start()
+
+    @staticmethod
+    def _to_document(row: Row, fields: Dict[str, str], submission_type: str) -> Row:
+        document = {fields.get(name, name): value for name, value in row.items() if name != 'id'}
+        timestamp = row.get('created_at')
+        document['timestamp'] = (datetime.fromisoformat(utc_timestamp(timestamp))
+                                 if timestamp is not None else datetime.now(timezone.utc))
+        document['type'] = submission_type
+        return document
+
+    @staticmethod
+    def _to_row(doc_id: str, data: Row, fields: Dict[str, str]) -> Row:
+        columns = {field: name for name, field in fields.items()}
+        row = {columns.get(name, name): value for name, value in data.items() if name != 'type'}
+        row['id'] = doc_id
+        if isinstance(row.get('created_at'), datetime):
+            row['created_at'] = utc_timestamp(row['created_at'])
+        return row
+
+    def _commit(self, collection: str, rows: List[Row], fields: Dict[str, str], submission_type: str,
+                add_rollups) -> List[Row]:
+        """Write rows and their rollup increments in one batch.
+
+        Rows that carry an id are created, so replaying them fails instead of double counting.
+        """
+        batch = self.db.batch()
+        documents = []
+        saved = []
+        for row in rows:
+            ref = self.db.collection(collection).document(row.get('id') or None)
+            document = self._to_document(row, fields, submission_type)
+            if row.get('id'):
+                batch.create(ref, document)
+            else:
+                batch.set(ref, document)
+            documents.append(document)
+            saved.append({**row, 'id': ref.id})
+        add_rollups(batch, self.db, documents)
+        batch.commit()
+        return saved
+
+    def save_public_submissions(self, rows):
+        import rollups
+        from google.api_core.exceptions import Conflict
+        saved = []
+        for start in range(0, len(rows), self.BATCH_ROWS):
+            chunk = rows[start:start + self.BATCH_ROWS]
+            try:
+                saved.extend(self._commit('public_submissions', chunk, self.PUBLIC_FIELDS, 'public',
+                                          rollups.add_public_submissions))
+            except Conflict:
+                # Some of these were saved before: fall back to one commit each
+                for row in chunk:
+                    try:
+                        saved.extend(self._commit('public_submissions', [row], self.PUBLIC_FIELDS, 'public',
+                                                  rollups.add_public_submissions))
+                    except Conflict:
+                        pass
+        return saved
+
+    def save_pharmacist_submissions(self, rows):
+        import rollups
+        saved = []
+        for start in range(0, len(rows), self.BATCH_ROWS):
+            try:
+                saved.extend(self._commit('pharmacist_submissions', rows[start:start + self.BATCH_ROWS],
+                                          self.PHARMACIST_FIELDS, 'pharmacist', rollups.add_pharmacist_submissions))
+            except Exception as e:
+                logger.error(f"Failed to save pharmacist submissions after {len(saved)} rows: {e}")
+                break
+        return saved
+
+    def dashboard_stats(self):
+        import aggregation
+        import rollups
+        rollup = rollups.read_dashboard_rollup(self.db)
+        if rollup is None:
+            rollup = {'public_total': aggregation.count(self.db.collection('public_submissions')),
+                      'pharmacist_total': aggregation.count(self.db.collection('pharmacist_submissions')),
+                      'locations': {}, 'medicines': {}}
+        recent = (self.db.collection('public_submissions')
+                  .order_by('timestamp', direction='DESCENDING').limit(5).stream())
+        return {
+            'totalEntries': rollup['public_total'] + rollup['pharmacist_total'],
+            'total_submissions': rollup['public_total'],
+            'resistance_cases': rollup['public_total'] // RESISTANCE_ESTIMATE,
+            'misuse_percentage': MISUSE_PERCENTAGE,
+            'countries_affected': len(rollup['locations']),
+            'highRiskZones': rollups.top_keys(rollup['locations']),
+            'commonAntibiotics': rollups.top_keys(rollup['medicines']),
+            'recentSubmissions': [
+                {'id': doc.id, 'type': 'public', **{name: row.get(name) for name in ('symptoms', 'medication', 'location')},
+                 'timestamp': row.get('created_at')}
+                for doc in recent for row in [self._to_row(doc.id, doc.to_dict() or {}, self.PUBLIC_FIELDS)]
+            ]
+        }
+
+    def pharmacist_dashboard(self, pharmacist_id):
+        import aggregation
+        from aggregation import GroupCount, aggregate
+        query = self.db.collection('pharmacist_submissions').where('pharmacist_id', '==', pharmacist_id)
+        total = aggregation.count(query)
+        recent, _ = self.list_pharmacist_submissions(pharmacist_id, 10)
+        # One count query per month, so the trend costs the same however many submissions there are
+        months = {}
+        for months_ago in range(TREND_MONTHS):
+            month_query = query.where('timestamp', '>=', _months_ago(months_ago))
+            if months_ago:
+                month_query = month_query.where('timestamp', '<', _months_ago(months_ago - 1))
+            months[_month_of(_months_ago(months_ago))] = aggregation.count(month_query)
+        monthly = months[_month_of(_months_ago(0))]
+        # Firestore cannot group, so regions are counted over the newest submissions only, as app.py does
+        counts = aggregate(query.order_by('timestamp', direction='DESCENDING').limit(REGION_SCAN_LIMIT),
+                           {'regions': GroupCount('region')})
+        return {
+            'total_submissions': total,
+            'monthly_submissions': monthly,
+            'resistance_cases': total // RESISTANCE_ESTIMATE,
+            'success_rate': SUCCESS_RATE,
+            'recent_submissions': [{'id': row['id'], 'medicine_name': row.get('medicine_name'),
+                                    'category': row.get('category'), 'quantity': row.get('quantity'),
+                                    'region': row.get('region'), 'timestamp': row.get('created_at')}
+                                   for row in recent],
+            'monthly_trends': monthly_trends(months),
+            'region_counts': counts['regions']
+        }
+
+    def list_pharmacist_submissions(self, pharmacist_id, limit, after=None):
+        query = (self.db.collection('pharmacist_submissions')
+                 .where('pharmacist_id', '==', pharmacist_id)
+                 .order_by('timestamp', direction='DESCENDING')
+                 .order_by('__name__', direction='DESCENDING'))
+        if after is not None:
+            query = query.start_after({'timestamp': after[0], '__name__': after[1]})
+        docs = list(query.limit(limit + 1).stream())
+        rows = [self._to_row(doc.id, doc.to_dict() or {}, self.PHARMACIST_FIELDS) for doc in docs[:limit]]
+        for row in rows:
+            for name in ('pharmacist_id', 'ip_address', 'user_agent'):
+                row.pop(name, None)
+        return rows, len(docs) > limit
+
+    def _load_pharmacists(self) -> Iterable[Tuple[str, Row]]:
+        return ((doc.id, doc.to_dict()) for doc in self.db.collection('pharmacists').stream())
+
+    def _load_pharmacist(self, email: str) -> Optional[Tuple[str, Row]]:
+        doc = next(self.db.collection('pharmacists').where('email', '==', email).limit(1).stream(), None)
+        return (doc.id, doc.to_dict()) if doc else None
+
+    def _watch_pharmacists(self, on_change):
+        def on_snapshot(snapshot, changes, read_time):
+            for change in changes:
+                removed = change.type.name == 'REMOVED'
+                on_change(change.document.id, None if removed else change.document.to_dict())
+        return self.db.collection('pharmacists').on_snapshot(on_snapshot)
+
+    def find_pharmacist(self, email):
+        return self.pharmacists.lookup(email)
+
+    def create_pharmacist(self, data):
+        if self.pharmacists.lookup(data['email']):
+            return None
+        _, ref = self.db.collection('pharmacists').add(data)
+        self.pharmacists.put(ref.id, data)
+        return ref.id
+
+    def update_pharmacist(self, email, fields):
+        pharmacist = self.pharmacists.lookup(email)
+        if pharmacist is None:
+            return
+        self.db.collection('pharmacists').document(pharmacist.id).update(fields)
+        self.pharmacists.update(email, **{name: value for name, value in fields.items()
+                                          if name in PharmacistEntry._fields})
+
+    def stats(self):
+        return {'backend': self.name, 'pharmacist_directory': self.pharmacists.stats()}
+
+
+def create_repository(name: str, **options) -> SubmissionRepository:
+    """Build the repository named by STORAGE_BACKEND: 'sqlite', 'supabase' or 'firestore'.
+
+    Options: path (sqlite), service (supabase; a SupabaseService is created
+    if omitted), db (firestore; the default Firebase app's client if omitted).
+    """
+    if name == 'sqlite':
+        return SQLiteRepository(options.get('path'))
+    if name == 'supabase':
+        service = options.get('service')
+        if service is None:
+            from supabase_config import SupabaseService
+            service = SupabaseService()
+        return SupabaseRepository(service)
+    if name == 'firestore':
+        db = options.get('db')
+        if db is None:
+            import firebase_admin
+            from firebase_admin import firestore
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app()
+            db = firestore.client()
+        return FirestoreRepository(db, refresh_interval=float(os.getenv('PHARMACIST_DIRECTORY_REFRESH', 60)))
+    raise ValueError(f"Unknown storage backend: {name}")
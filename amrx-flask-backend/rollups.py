@@ -0,0 +1,263 @@
+"""
+Dashboard rollups for AMR-X Backend
+Sharded counters maintained on every submission write so the dashboard
+never has to re-scan the submission collections. Each map counter holds at
+most ROLLUP_MAX_KEYS keys; values beyond that are counted as 'Other'.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+
+logger = logging.getLogger(__name__)
+
+# Rollup configuration
+ROLLUP_COLLECTION = 'rollups'
+ROLLUP_DOCUMENT = 'dashboard'
+ROLLUP_SHARDS = int(os.getenv('ROLLUP_SHARDS', 10))
+
+# Map counters kept per shard, keyed by the submission field they count
+PUBLIC_MAP_FIELDS = {'locations': 'location'}
+PHARMACIST_MAP_FIELDS = {'medicines': 'medicineName', 'categories': 'category'}
+MAP_NAMES = ('locations', 'medicines', 'categories')
+
+# Free-text values could otherwise grow a shard past Firestore's 1 MiB and
+# 20,000-field document limits: keys are trimmed, and once a map holds
+# ROLLUP_MAX_KEYS keys any new value is counted under OTHER_KEY
+ROLLUP_MAX_KEYS = int(os.getenv('ROLLUP_MAX_KEYS', 1000))
+MAX_KEY_LENGTH = 64
+OTHER_KEY = 'Other'
+KNOWN_KEYS_REFRESH = 300  # seconds between reloads of the keys in use
+
+_known_lock = threading.Lock()
+_known_keys: Dict[str, set] = {name: set() for name in MAP_NAMES}
+_known_loaded_at = None
+
+
+def _shard_ref(db, shard: int):
+    """Return the document reference for a counter shard."""
+    return (db.collection(ROLLUP_COLLECTION)
+            .document(ROLLUP_DOCUMENT)
+            .collection('shards')
+            .document(str(shard)))
+
+
+def _counter_key(value: Any) -> str:
+    """Normalize a field value into a map key (Firestore rejects empty keys)."""
+    key = ' '.join(str(value).split())[:MAX_KEY_LENGTH] if value is not None else ''
+    return key or 'Unknown'
+
+
+def _remember_keys(rollup: Dict[str, Any]):
+    global _known_loaded_at
+    with _known_lock:
+        for name in MAP_NAMES:
+            _known_keys[name] = set(rollup[name])
+        _known_loaded_at = time.monotonic()
+
+
+def _load_known_keys(db):
+    """Learn the keys already in use once per KNOWN_KEYS_REFRESH, so the cap holds across workers."""
+    global _known_loaded_at
+    if _known_loaded_at is not None and time.monotonic() - _known_loaded_at < KNOWN_KEYS_REFRESH:
+        return
+    try:
+        read_dashboard_rollup(db)
+    except Exception as e:
+        # Count against the keys known so far rather than fail the write
+        logger.warning(f"Could not load rollup keys: {e}")
+        with _known_lock:
+            _known_loaded_at = time.monotonic()
+
+
+def _admit(name: str, key: str) -> str:
+    """key, or OTHER_KEY if the map is full and key is new."""
+    with _known_lock:
+        known = _known_keys[name]
+        if key in known:
+            return key
+        if len(known) >= ROLLUP_MAX_KEYS:
+            return OTHER_KEY
+        known.add(key)
+        return key
+
+
+def _count(submissions: Iterable[Dict[str, Any]], map_fields: Dict[str, str],
+           admit: Optional[Callable[[str, str], str]] = None) -> Tuple[int, Dict[str, Dict[str, int]]]:
+    """Count submissions in total and per key of each map field."""
+    total = 0
+    maps = {name: defaultdict(int) for name in map_fields}
+    for data in submissions:
+        total += 1
+        for name, field in map_fields.items():
+            key = _counter_key(data.get(field))
+            maps[name][admit(name, key) if admit else key] += 1
+    return total, maps
+
+
+def _build_increments(submissions: Iterable[Dict[str, Any]], total_field: str,
+                      map_fields: Dict[str, str]) -> Dict[str, Any]:
+    """Fold submissions into one increment payload for a single shard write."""
+    total, maps = _count(submissions, map_fields, _admit)
+    payload = {total_field: firestore.Increment(total)}
+    for name, counts in maps.items():
+        payload[name] = {key: firestore.Increment(n) for key, n in counts.items()}
+    return payload
+
+
+def _add_increments(batch, db, payload: Dict[str, Any]):
+    """Queue an increment payload on a random shard as part of a write batch."""
+    shard = random.randrange(ROLLUP_SHARDS)
+    batch.set(_shard_ref(db, shard), payload, merge=True)
+
+
+def add_public_submissions(batch, db, submissions: Iterable[Dict[str, Any]]):
+    """Queue rollup increments for public submissions on a write batch."""
+    _load_known_keys(db)
+    _add_increments(batch, db, _build_increments(submissions, 'public_total', PUBLIC_MAP_FIELDS))
+
+
+def add_pharmacist_submissions(batch, db, submissions: Iterable[Dict[str, Any]]):
+    """Queue rollup increments for pharmacist submissions on a write batch."""
+    _load_known_keys(db)
+    _add_increments(batch, db, _build_increments(submissions, 'pharmacist_total', PHARMACIST_MAP_FIELDS))
+
+
+def _merge_shards(shards: Iterable[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """Sum shard contents into one rollup, or None if no shard exists."""
+    rollup = {'public_total': 0, 'pharmacist_total': 0, **{name: defaultdict(int) for name in MAP_NAMES}}
+    found = False
+    for data in shards:
+        if data is None:
+            continue
+        found = True
+        rollup['public_total'] += data.get('public_total', 0)
+        rollup['pharmacist_total'] += data.get('pharmacist_total', 0)
+        for name in MAP_NAMES:
+            for key, count in (data.get(name) or {}).items():
+                rollup[name][key] += count
+    if not found:
+        return None
+    for name in MAP_NAMES:
+        # A rebuild zeroes keys no submission has any more
+        rollup[name] = {key: count for key, count in rollup[name].items() if count > 0}
+    return rollup
+
+
+def _read_shards(db, **options) -> List[Optional[Dict[str, Any]]]:
+    """The contents of every shard in shard order, None for missing ones."""
+    snapshots = {snapshot.id: snapshot
+                 for snapshot in db.get_all([_shard_ref(db, shard) for shard in range(ROLLUP_SHARDS)], **options)}
+    return [(snapshots[str(shard)].to_dict() or {}) if str(shard) in snapshots and snapshots[str(shard)].exists
+            else None for shard in range(ROLLUP_SHARDS)]
+
+
+def read_dashboard_rollup(db) -> Optional[Dict[str, Any]]:
+    """Merge all counter shards into one rollup, or None if none exist yet."""
+    rollup = _merge_shards(_read_shards(db))
+    if rollup is not None:
+        _remember_keys(rollup)
+    return rollup
+
+
+def top_keys(counts: Dict[str, int], k: int = 3) -> list:
+    """Return the k most frequent keys of a counter map."""
+    return [key for key, _ in sorted(counts.items(), key=lambda x: x[1], reverse=True)[:k]]
+
+
+def _cap_keys(counts: Dict[str, int]) -> Dict[str, int]:
+    """Keep the ROLLUP_MAX_KEYS most frequent keys and fold the rest into OTHER_KEY."""
+    if len(counts) <= ROLLUP_MAX_KEYS:
+        return dict(counts)
+    ranked = sorted((item for item in counts.items() if item[0] != OTHER_KEY), key=lambda item: -item[1])
+    kept = dict(ranked[:ROLLUP_MAX_KEYS - 1])
+    kept[OTHER_KEY] = counts.get(OTHER_KEY, 0) + sum(count for _, count in ranked[ROLLUP_MAX_KEYS - 1:])
+    return kept
+
+
+def _correction(scanned: Dict[str, Any], shards: List[Optional[Dict[str, Any]]]) -> Dict[int, Dict[str, Any]]:
+    """Per-shard increments that turn the shard contents into the scanned totals.
+
+    Keys no submission has any more are zeroed on every shard that holds
+    them, so they can be pruned; any other difference goes to shard 0.
+    """
+    shards = [data or {} for data in shards]
+    payloads = defaultdict(dict)
+    for field in ('public_total', 'pharmacist_total'):
+        difference = scanned[field] - sum(data.get(field, 0) for data in shards)
+        if difference:
+            payloads[0][field] = firestore.Increment(difference)
+    for name in MAP_NAMES:
+        held = defaultdict(int)
+        for data in shards:
+            for key, count in (data.get(name) or {}).items():
+                held[key] += count
+        for key in set(scanned[name]) | set(held):
+            if key in scanned[name]:
+                difference = scanned[name][key] - held[key]
+                if difference:
+                    payloads[0].setdefault(name, {})[key] = firestore.Increment(difference)
+                continue
+            for shard, data in enumerate(shards):
+                count = (data.get(name) or {}).get(key, 0)
+                if count:
+                    payloads[shard].setdefault(name, {})[key] = firestore.Increment(-count)
+    return dict(payloads)
+
+
+def _prune_zero_keys(db):
+    """Delete map keys that a rebuild left at zero, one shard transaction each."""
+    @firestore.transactional
+    def prune(transaction, ref):
+        snapshot = ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return
+        data = snapshot.to_dict() or {}
+        zero = {FieldPath(name, key).to_api_repr(): firestore.DELETE_FIELD
+                for name in MAP_NAMES for key, count in (data.get(name) or {}).items() if count == 0}
+        if zero:
+            transaction.update(ref, zero)
+
+    for shard in range(ROLLUP_SHARDS):
+        prune(db.transaction(), _shard_ref(db, shard))
+
+
+def rebuild_rollups(db) -> Dict[str, Any]:
+    """Recompute the rollup counters from a full scan of the submission collections.
+
+    The scan and the shards are read at one read time, and the difference
+    is applied as increments, so submissions written while the scan runs
+    keep the increments they made. The scan must finish within the hour
+    for which Firestore keeps old versions.
+    """
+    # A little in the past, so a fast local clock still reads committed data
+    read_time = datetime.now(timezone.utc) - timedelta(seconds=5)
+    shards = _read_shards(db, read_time=read_time)
+
+    def scan(collection: str, map_fields: Dict[str, str]):
+        query = db.collection(collection).select(list(map_fields.values()))
+        return _count((doc.to_dict() or {} for doc in query.stream(read_time=read_time)), map_fields)
+
+    public_total, public_maps = scan('public_submissions', PUBLIC_MAP_FIELDS)
+    pharmacist_total, pharmacist_maps = scan('pharmacist_submissions', PHARMACIST_MAP_FIELDS)
+    scanned = {'public_total': public_total, 'pharmacist_total': pharmacist_total,
+               **{name: _cap_keys(counts) for name, counts in {**public_maps, **pharmacist_maps}.items()}}
+
+    payloads = _correction(scanned, shards)
+    if payloads:
+        batch = db.batch()
+        for shard, payload in payloads.items():
+            batch.set(_shard_ref(db, shard), payload, merge=True)
+        batch.commit()
+    _prune_zero_keys(db)
+
+    logger.info("Dashboard rollups rebuilt")
+    return read_dashboard_rollup(db)
@@ -4,14 +4,36 @@ Replace the demo data with actual Supabase integration
 """
 
 import os
+import time
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 from dotenv import load_dotenv
+from passwords import HasherBusy
+from directory import PharmacistDirectory
+from db_pool import ClientPool, PoolTimeout
+
+# Only the columns authentication needs are read into the pharmacist directory
+PHARMACIST_AUTH_COLUMNS = 'id,email,password_hash,active,name,institution'
 
 load_dotenv()
 
 # Supabase configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_ANON_KEY')
+# The server signs pharmacists in itself and calls get_pharmacist_dashboard(),
+# which the schema grants to the service role only
+SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY')
+if SUPABASE_KEY and not os.getenv('SUPABASE_SERVICE_ROLE_KEY'):
+    print("Warning: SUPABASE_SERVICE_ROLE_KEY not set; pharmacist accounts and dashboards need it.")
+# Seconds before a PostgREST call gives up
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', 10))
+# Clients per worker, and seconds a request waits for one before failing
+SUPABASE_POOL_SIZE = int(os.getenv('SUPABASE_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+# Optional direct connection string to the Supabase Postgres, for the dashboard functions
+SUPABASE_DB_URL = os.getenv('SUPABASE_DB_URL')
+SUPABASE_DB_POOL_SIZE = int(os.getenv('SUPABASE_DB_POOL_SIZE', 4))
+# After a failed direct call, PostgREST alone is used for 1s, then 2s, 4s... up to this many seconds
+DIRECT_RETRY_MAX_DELAY = 60
 
 def get_supabase_client() -> Client:
     """Get Supabase client"""
@@ -19,42 +41,166 @@ def get_supabase_client() -> Client:
         print("Warning: Supabase credentials not found. Using demo mode.")
         return None
     
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    # The client's PostgREST session keeps its HTTP connections alive between calls
+    return create_client(SUPABASE_URL, SUPABASE_KEY,
+                         options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT))
+
+def get_supabase_pool():
+    """Get a per-worker pool of Supabase clients, or None in demo mode"""
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("Warning: Supabase credentials not found. Using demo mode.")
+        return None
+    
+    return ClientPool(get_supabase_client, size=SUPABASE_POOL_SIZE, acquire_timeout=DB_POOL_TIMEOUT,
+                      close=lambda client: client.postgrest.session.close(), name='supabase')
+
+def _connect_postgres():
+    import psycopg  # Only needed with SUPABASE_DB_URL
+    return psycopg.connect(
+        SUPABASE_DB_URL, autocommit=True, connect_timeout=max(1, int(SUPABASE_TIMEOUT)),
+        options=f"-c statement_timeout={int(SUPABASE_TIMEOUT * 1000)}",
+        keepalives=1, keepalives_idle=30
+    )
+
+def get_postgres_pool():
+    """Get a per-worker pool of direct Postgres connections, or None without SUPABASE_DB_URL"""
+    if not SUPABASE_DB_URL:
+        return None
+    
+    return ClientPool(_connect_postgres, size=SUPABASE_DB_POOL_SIZE, acquire_timeout=DB_POOL_TIMEOUT,
+                      healthy=lambda conn: not conn.closed and not conn.broken,
+                      close=lambda conn: conn.close(), name='postgres')
 
 # Database operations
 class SupabaseService:
     def __init__(self):
-        self.client = get_supabase_client()
+        # Clients are checked out per call; nothing connects until the first one
+        self.pool = get_supabase_pool()
+        self.postgres = get_postgres_pool() if self.pool else None
+        self._direct_delay = 0
+        self._direct_retry_at = 0.0
+        # Supabase has no change listener here, so the directory reloads periodically
+        self.pharmacists = PharmacistDirectory(
+            self._load_pharmacists, self._load_pharmacist,
+            refresh_interval=float(os.getenv('PHARMACIST_DIRECTORY_REFRESH', 60))
+        )
+        if self.pool:
+            self.pharmacists.start()
+    
+    def _load_pharmacists(self):
+        """Every pharmacist as (id, fields), a page at a time"""
+        page_size = 1000
+        start = 0
+        while True:
+            # The client goes back to the pool between pages
+            with self.pool.connection() as client:
+                result = client.table('pharmacists').select(PHARMACIST_AUTH_COLUMNS) \
+                    .order('id').range(start, start + page_size - 1).execute()
+            for row in result.data or []:
+                yield str(row['id']), row
+            if len(result.data or []) < page_size:
+                return
+            start += page_size
+    
+    def _load_pharmacist(self, email):
+        """One pharmacist by email, for directory misses"""
+        with self.pool.connection() as client:
+            result = client.table('pharmacists').select(PHARMACIST_AUTH_COLUMNS).eq('email', email).limit(1).execute()
+        return (str(result.data[0]['id']), result.data[0]) if result.data else None
     
     def save_public_submission(self, data):
         """Save public submission to Supabase"""
-        if not self.client:
+        if not self.pool:
             print(f"Demo mode: Would save public submission: {data}")
             return {"id": "demo_id"}
         
         try:
-            result = self.client.table('public_submissions').insert(data).execute()
+            with self.pool.connection() as client:
+                result = client.table('public_submissions').insert(data).execute()
             return result.data[0] if result.data else {"id": "demo_id"}
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error saving public submission: {e}")
             return {"id": "demo_id"}
     
+    def insert_public_submissions(self, rows):
+        """Insert public submissions that carry their own ids, skipping ids already saved
+
+        Raises on failure so that callers can retry the same rows
+        """
+        if not self.pool:
+            print(f"Demo mode: Would save {len(rows)} public submissions")
+            return
+        
+        # Conflicts are on the primary key: id, or (id, created_at) once partitioned; rows keep both on retry
+        with self.pool.connection() as client:
+            client.table('public_submissions').upsert(rows, ignore_duplicates=True).execute()
+    
     def save_pharmacist_submission(self, data):
         """Save pharmacist submission to Supabase"""
-        if not self.client:
+        if not self.pool:
             print(f"Demo mode: Would save pharmacist submission: {data}")
             return {"id": "demo_id"}
         
         try:
-            result = self.client.table('pharmacist_submissions').insert(data).execute()
+            with self.pool.connection() as client:
+                result = client.table('pharmacist_submissions').insert(data).execute()
             return result.data[0] if result.data else {"id": "demo_id"}
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error saving pharmacist submission: {e}")
             return {"id": "demo_id"}
     
+    def save_pharmacist_submissions(self, rows, chunk_size=500):
+        """Save many pharmacist submissions with one multi-row insert per chunk
+
+        Returns the saved rows; if a chunk fails, the rows before it stay
+        saved and the rest are not attempted
+        """
+        if not self.pool:
+            print(f"Demo mode: Would save {len(rows)} pharmacist submissions")
+            return [{"id": "demo_id"} for _ in rows]
+        
+        saved = []
+        with self.pool.connection() as client:
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                try:
+                    result = client.table('pharmacist_submissions').insert(chunk).execute()
+                    saved.extend(result.data or [{"id": None} for _ in chunk])
+                except Exception as e:
+                    print(f"Error saving pharmacist submissions {start}-{start + len(chunk) - 1}: {e}")
+                    break
+        return saved
+    
+    def _rpc(self, function, params):
+        """Call a database function, over the direct Postgres pool when there is one
+
+        Falls back to PostgREST if the direct call fails, and skips the direct
+        pool for a growing back-off after a failure, so a database that is
+        down does not cost every request a connect timeout
+        """
+        if self.postgres and time.monotonic() >= self._direct_retry_at:
+            arguments = ', '.join(f"{name} => %({name})s" for name in params)
+            try:
+                with self.postgres.connection() as conn:
+                    result = conn.execute(f"SELECT {function}({arguments})", params).fetchone()[0]
+                self._direct_delay = 0
+                return result
+            except PoolTimeout:
+                raise
+            except Exception as e:
+                self._direct_delay = min(DIRECT_RETRY_MAX_DELAY, max(1, self._direct_delay * 2))
+                self._direct_retry_at = time.monotonic() + self._direct_delay
+                print(f"Direct Postgres call to {function} failed, using PostgREST for {self._direct_delay}s: {e}")
+        with self.pool.connection() as client:
+            return client.rpc(function, params).execute().data
+    
     def get_dashboard_stats(self):
         """Get dashboard statistics from Supabase"""
-        if not self.client:
+        if not self.pool:
             return {
                 'totalEntries': 150,
                 'total_submissions': 120,
@@ -67,26 +213,10 @@ class SupabaseService:
             }
         
         try:
-            # Get public submissions count
-            public_count = self.client.table('public_submissions').select('*', count='exact').execute()
-            
-            # Get pharmacist submissions count
-            pharmacist_count = self.client.table('pharmacist_submissions').select('*', count='exact').execute()
-            
-            # Get recent submissions
-            recent_public = self.client.table('public_submissions').select('*').order('created_at', desc=True).limit(5).execute()
-            recent_pharmacist = self.client.table('pharmacist_submissions').select('*').order('created_at', desc=True).limit(5).execute()
-            
-            return {
-                'totalEntries': (public_count.count or 0) + (pharmacist_count.count or 0),
-                'total_submissions': public_count.count or 0,
-                'resistance_cases': int((public_count.count or 0) * 0.15),
-                'misuse_percentage': 25,
-                'countries_affected': 8,
-                'highRiskZones': ['North America', 'Europe', 'Asia'],
-                'commonAntibiotics': ['Amoxicillin', 'Azithromycin', 'Ciprofloxacin'],
-                'recentSubmissions': (recent_public.data or []) + (recent_pharmacist.data or [])
-            }
+            # One round trip; get_dashboard_stats() aggregates from the dashboard views
+            return self._rpc('get_dashboard_stats', {})
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error getting dashboard stats: {e}")
             return {
@@ -100,9 +230,44 @@ class SupabaseService:
                 'recentSubmissions': []
             }
     
-    def authenticate_pharmacist(self, email, password):
-        """Authenticate pharmacist with Supabase"""
-        if not self.client:
+    def get_pharmacist_dashboard(self, pharmacist_id):
+        """Get one pharmacist's dashboard with a single get_pharmacist_dashboard() RPC"""
+        empty = {
+            'total_submissions': 0,
+            'monthly_submissions': 0,
+            'resistance_cases': 0,
+            'success_rate': 85,
+            'recent_submissions': [],
+            'monthly_trends': [],
+            'region_counts': {}
+        }
+        if not self.pool:
+            return empty
+        
+        try:
+            return self._rpc('get_pharmacist_dashboard', {'p_pharmacist_id': pharmacist_id})
+        except PoolTimeout:
+            raise
+        except Exception as e:
+            print(f"Error getting pharmacist dashboard: {e}")
+            return empty
+    
+    def refresh_dashboard_views(self):
+        """Run the periodic dashboard upkeep: refresh the dashboard views, or after
+        migrations/001 create the coming months' partitions
+
+        Only needed where pg_cron does not schedule it
+        """
+        if not self.pool:
+            return
+        self._rpc('refresh_dashboard_views', {})
+    
+    def authenticate_pharmacist(self, email, password, hasher):
+        """Authenticate pharmacist with Supabase, upgrading outdated password hashes
+
+        hasher is a passwords.PasswordHasher; its HasherBusy is not caught here
+        """
+        if not self.pool:
             # Demo credentials
             if email == 'demo@amrx.com' and password == 'demo123':
                 return {
@@ -114,33 +279,58 @@ class SupabaseService:
             return None
         
         try:
-            # Query pharmacists table
-            result = self.client.table('pharmacists').select('*').eq('email', email).execute()
-            
-            if result.data and len(result.data) > 0:
-                pharmacist = result.data[0]
-                # In production, use proper password hashing
-                if pharmacist.get('password_hash') == password:  # This should be hashed
-                    return {
-                        'id': pharmacist['id'],
-                        'name': pharmacist['name'],
-                        'email': pharmacist['email'],
-                        'institution': pharmacist['institution']
-                    }
+            # Directory lookup; queries the pharmacists table only on a miss
+            pharmacist = self.pharmacists.lookup(email)
+            valid, needs_rehash = hasher.verify(password, pharmacist.password_hash if pharmacist else None)
+            if valid and pharmacist.active:
+                if needs_rehash:
+                    try:
+                        password_hash = hasher.hash(password)
+                        with self.pool.connection() as client:
+                            client.table('pharmacists').update(
+                                {'password_hash': password_hash}
+                            ).eq('id', pharmacist.id).execute()
+                        self.pharmacists.update(email, password_hash=password_hash)
+                    except (HasherBusy, PoolTimeout):
+                        pass  # Upgraded on a later login
+                return {
+                    'id': pharmacist.id,
+                    'name': pharmacist.name,
+                    'email': pharmacist.email,
+                    'institution': pharmacist.institution
+                }
             return None
+        except (HasherBusy, PoolTimeout):
+            raise
         except Exception as e:
             print(f"Error authenticating pharmacist: {e}")
             return None
     
     def register_pharmacist(self, pharmacist_data):
         """Register new pharmacist in Supabase"""
-        if not self.client:
+        if not self.pool:
             print(f"Demo mode: Would register pharmacist: {pharmacist_data['email']}")
             return True
         
         try:
-            result = self.client.table('pharmacists').insert(pharmacist_data).execute()
+            if self.pharmacists.lookup(pharmacist_data['email']):
+                print(f"Pharmacist already registered: {pharmacist_data['email']}")
+                return False
+            with self.pool.connection() as client:
+                result = client.table('pharmacists').insert(pharmacist_data).execute()
+            if result.data:
+                self.pharmacists.put(str(result.data[0]['id']), result.data[0])
             return result.data is not None
+        except PoolTimeout:
+            raise
         except Exception as e:
             print(f"Error registering pharmacist: {e}")
             return False
+    
+    def stats(self):
+        """Pool metrics for this worker, for sizing the pools under load"""
+        return {
+            'supabase': self.pool.stats() if self.pool else None,
+            'postgres': self.postgres.stats() if self.postgres else None,
+            'postgres_backoff': max(0.0, round(self._direct_retry_at - time.monotonic(), 1))
+        }
@@ -82,50 +82,105 @@ CREATE POLICY "Pharmacists can view own data" ON pharmacists
 CREATE POLICY "Pharmacists can insert own data" ON pharmacists
     FOR INSERT WITH CHECK (true);
 
+-- Dashboard aggregates, kept as materialized views so a dashboard reads a
+-- few pre-grouped rows instead of scanning the submission tables. They are
+-- refreshed by refresh_dashboard_views() (below), so counts can be up to one
+-- refresh interval behind; the recent submission lists are always live.
+CREATE MATERIALIZED VIEW IF NOT EXISTS dashboard_location_counts AS
+    SELECT location, COUNT(*) AS count
+    FROM public_submissions
+    GROUP BY location;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dashboard_location_counts ON dashboard_location_counts(location);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS dashboard_medicine_counts AS
+    SELECT medicine_name, COUNT(*) AS count
+    FROM pharmacist_submissions
+    GROUP BY medicine_name;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dashboard_medicine_counts ON dashboard_medicine_counts(medicine_name);
+
+-- One row per pharmacist, region and UTC month
+CREATE MATERIALIZED VIEW IF NOT EXISTS dashboard_pharmacist_activity AS
+    SELECT pharmacist_id, region, date_trunc('month', created_at AT TIME ZONE 'UTC')::date AS month, COUNT(*) AS count
+    FROM pharmacist_submissions
+    GROUP BY pharmacist_id, region, date_trunc('month', created_at AT TIME ZONE 'UTC')::date;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dashboard_pharmacist_activity
+    ON dashboard_pharmacist_activity(pharmacist_id, month, region);
+
+-- The views hold every pharmacist's counts; only the dashboard functions read them
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE ALL ON dashboard_location_counts, dashboard_medicine_counts, dashboard_pharmacist_activity
+            FROM anon, authenticated;
+    END IF;
+END;
+$$;
+
+-- Recent submissions of one pharmacist, newest first, straight from the index
+CREATE INDEX IF NOT EXISTS idx_pharmacist_submissions_pharmacist_created
+    ON pharmacist_submissions(pharmacist_id, created_at DESC);
+
+-- Refresh the dashboard views. CONCURRENTLY keeps dashboard reads unblocked
+-- while it runs, but it still recomputes each view in full and then diffs
+-- the result against the old contents, so it costs more than a plain refresh.
+CREATE OR REPLACE FUNCTION refresh_dashboard_views()
+RETURNS VOID AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY dashboard_location_counts;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY dashboard_medicine_counts;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY dashboard_pharmacist_activity;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Refresh every minute with pg_cron (enable it under Database > Extensions);
+-- without it, schedule `flask --app app_production refresh-dashboard-views`
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule('refresh-dashboard-views', '* * * * *', 'SELECT refresh_dashboard_views()');
+    END IF;
+END;
+$$;
+
 -- Create a function to get dashboard statistics
 CREATE OR REPLACE FUNCTION get_dashboard_stats()
 RETURNS JSON AS $$
 DECLARE
     result JSON;
+    public_total BIGINT;
+    pharmacist_total BIGINT;
 BEGIN
+    SELECT COALESCE(SUM(count), 0) INTO public_total FROM dashboard_location_counts;
+    SELECT COALESCE(SUM(count), 0) INTO pharmacist_total FROM dashboard_medicine_counts;
+    
     SELECT json_build_object(
-        'totalEntries', (
-            SELECT COUNT(*) FROM public_submissions
-        ) + (
-            SELECT COUNT(*) FROM pharmacist_submissions
-        ),
-        'total_submissions', (
-            SELECT COUNT(*) FROM public_submissions
-        ),
-        'resistance_cases', (
-            SELECT COUNT(*) FROM public_submissions
-        ) / 6, -- Estimate 1 in 6 cases show resistance
+        'totalEntries', public_total + pharmacist_total,
+        'total_submissions', public_total,
+        'resistance_cases', public_total / 6, -- Estimate 1 in 6 cases show resistance
         'misuse_percentage', 25, -- Static estimate
         'countries_affected', (
-            SELECT COUNT(DISTINCT location) FROM public_submissions
+            SELECT COUNT(*) FROM dashboard_location_counts
         ),
         'highRiskZones', (
-            SELECT json_agg(location ORDER BY count DESC)
+            SELECT COALESCE(json_agg(location ORDER BY count DESC, location), '[]')
             FROM (
-                SELECT location, COUNT(*) as count
-                FROM public_submissions
-                GROUP BY location
-                ORDER BY count DESC
+                SELECT location, count
+                FROM dashboard_location_counts
+                ORDER BY count DESC, location
                 LIMIT 3
             ) t
         ),
         'commonAntibiotics', (
-            SELECT json_agg(medicine_name ORDER BY count DESC)
+            SELECT COALESCE(json_agg(medicine_name ORDER BY count DESC, medicine_name), '[]')
             FROM (
-                SELECT medicine_name, COUNT(*) as count
-                FROM pharmacist_submissions
-                GROUP BY medicine_name
-                ORDER BY count DESC
+                SELECT medicine_name, count
+                FROM dashboard_medicine_counts
+                ORDER BY count DESC, medicine_name
                 LIMIT 3
             ) t
         ),
         'recentSubmissions', (
-            SELECT json_agg(
+            SELECT COALESCE(json_agg(
                 json_build_object(
                     'id', id,
                     'type', 'public',
@@ -133,8 +188,8 @@ BEGIN
                     'medication', medication,
                     'location', location,
                     'timestamp', created_at
-                )
-            )
+                ) ORDER BY created_at DESC
+            ), '[]')
             FROM (
                 SELECT * FROM public_submissions
                 ORDER BY created_at DESC
@@ -145,31 +200,30 @@ BEGIN
     
     RETURN result;
 END;
-$$ LANGUAGE plpgsql SECURITY DEFINER;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
 
 -- Create a function to get pharmacist dashboard data
 CREATE OR REPLACE FUNCTION get_pharmacist_dashboard(p_pharmacist_id TEXT)
 RETURNS JSON AS $$
 DECLARE
     result JSON;
+    total BIGINT;
 BEGIN
+    SELECT COALESCE(SUM(count), 0) INTO total
+    FROM dashboard_pharmacist_activity
+    WHERE pharmacist_id = p_pharmacist_id;
+    
     SELECT json_build_object(
-        'total_submissions', (
-            SELECT COUNT(*) FROM pharmacist_submissions
-            WHERE pharmacist_id = p_pharmacist_id
-        ),
+        'total_submissions', total,
         'monthly_submissions', (
-            SELECT COUNT(*) FROM pharmacist_submissions
+            SELECT COALESCE(SUM(count), 0) FROM dashboard_pharmacist_activity
             WHERE pharmacist_id = p_pharmacist_id
-            AND created_at >= date_trunc('month', CURRENT_DATE)
+            AND month = date_trunc('month', NOW() AT TIME ZONE 'UTC')::date
         ),
-        'resistance_cases', (
-            SELECT COUNT(*) FROM pharmacist_submissions
-            WHERE pharmacist_id = p_pharmacist_id
-        ) / 6, -- Estimate
+        'resistance_cases', total / 6, -- Estimate
         'success_rate', 85, -- Static estimate
         'recent_submissions', (
-            SELECT json_agg(
+            SELECT COALESCE(json_agg(
                 json_build_object(
                     'id', id,
                     'medicine_name', medicine_name,
@@ -177,8 +231,8 @@ BEGIN
                     'quantity', quantity,
                     'region', region,
                     'timestamp', created_at
-                )
-            )
+                ) ORDER BY created_at DESC
+            ), '[]')
             FROM (
                 SELECT * FROM pharmacist_submissions
                 WHERE pharmacist_id = p_pharmacist_id
@@ -187,28 +241,25 @@ BEGIN
             ) t
         ),
         'monthly_trends', (
-            SELECT json_agg(
+            SELECT COALESCE(json_agg(
                 json_build_object(
-                    'month', month,
+                    'month', to_char(month, 'YYYY-MM'),
                     'count', count
-                )
-            )
+                ) ORDER BY month
+            ), '[]')
             FROM (
-                SELECT 
-                    to_char(created_at, 'YYYY-MM') as month,
-                    COUNT(*) as count
-                FROM pharmacist_submissions
+                SELECT month, SUM(count) AS count
+                FROM dashboard_pharmacist_activity
                 WHERE pharmacist_id = p_pharmacist_id
-                AND created_at >= CURRENT_DATE - INTERVAL '6 months'
-                GROUP BY to_char(created_at, 'YYYY-MM')
-                ORDER BY month
+                AND month >= (date_trunc('month', NOW() AT TIME ZONE 'UTC') - INTERVAL '5 months')::date
+                GROUP BY month
             ) t
         ),
         'region_counts', (
-            SELECT json_object_agg(region, count)
+            SELECT COALESCE(json_object_agg(region, count), '{}')
             FROM (
-                SELECT region, COUNT(*) as count
-                FROM pharmacist_submissions
+                SELECT region, SUM(count) AS count
+                FROM dashboard_pharmacist_activity
                 WHERE pharmacist_id = p_pharmacist_id
                 GROUP BY region
             ) t
@@ -217,13 +268,33 @@ BEGIN
     
     RETURN result;
 END;
-$$ LANGUAGE plpgsql SECURITY DEFINER;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER;
+
+-- Upkeep recomputes every view, and a pharmacist dashboard is returned for
+-- whatever id the caller names: both are for the server's service role only
+REVOKE EXECUTE ON FUNCTION refresh_dashboard_views(), get_pharmacist_dashboard(TEXT) FROM PUBLIC;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION refresh_dashboard_views(), get_pharmacist_dashboard(TEXT) FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION refresh_dashboard_views(), get_pharmacist_dashboard(TEXT) TO service_role;
+    END IF;
+END;
+$$;
 
--- Insert demo data
+-- Nothing calls get_quantity_stats, and as SECURITY DEFINER it let any API key
+-- read every pharmacist's totals: drop it where an earlier version created it
+DROP FUNCTION IF EXISTS get_quantity_stats(TEXT);
+
+-- Insert demo data; the password is demo123, hashed with passwords.PasswordHasher
 INSERT INTO pharmacists (name, email, password_hash, institution) VALUES
-('Demo Pharmacist', 'demo@amrx.com', 'demo123', 'Demo Hospital')
+('Demo Pharmacist', 'demo@amrx.com', 'scrypt$16384$8$1$SZ7dCbCNjrPUBJ1b7CaCCQ$whFuR3Dt8Vq66RpC3Xf/1X6Eto8PNfiKRau43flDNEc', 'Demo Hospital')
 ON CONFLICT (email) DO NOTHING;
 
+-- Earlier versions of this file seeded the password in plain text
+UPDATE pharmacists SET password_hash = 'scrypt$16384$8$1$SZ7dCbCNjrPUBJ1b7CaCCQ$whFuR3Dt8Vq66RpC3Xf/1X6Eto8PNfiKRau43flDNEc'
+WHERE email = 'demo@amrx.com' AND password_hash = 'demo123';
+
 -- Insert some sample public submissions
 INSERT INTO public_submissions (symptoms, medication, duration, location) VALUES
 ('Fever, cough, chest pain', 'Amoxicillin', 7, 'North America'),
@@ -239,3 +310,6 @@ INSERT INTO pharmacist_submissions (medicine_name, category, quantity, region, p
 ('Azithromycin', 'macrolides', 50, 'Europe', 'demo_pharmacist'),
 ('Ciprofloxacin', 'fluoroquinolones', 75, 'Asia', 'demo_pharmacist')
 ON CONFLICT DO NOTHING;
+
+-- Include the sample data in the dashboard views
+SELECT refresh_dashboard_views();
@@ -0,0 +1,17 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The backend is a flat set of modules; import them the way the apps do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def backend(tmp_path_factory):
+    """The Flask app without a database, logging under a temporary directory and rate limiting in memory."""
+    directory = tmp_path_factory.mktemp('app')
+    os.environ.update({'LOG_FILE': str(directory / 'app.log'), 'AUDIT_DIR': str(directory / 'audit'),
+                       'RATELIMIT_STORAGE_URI': 'memory://'})
+    return importlib.import_module('app')
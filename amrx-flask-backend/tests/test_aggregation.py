@@ -0,0 +1,21 @@
+from aggregation import GroupCount, RecentN, aggregate
+
+
+def test_recent_keeps_records_without_a_timestamp_last():
+    records = [{'id': 1, 'timestamp': 5}, {'id': 2}, {'id': 3, 'timestamp': 9}, {'id': 4, 'timestamp': None}]
+    recent = aggregate(records, {'recent': RecentN(10)})['recent']
+    assert [record['id'] for record in recent] == [3, 1, 4, 2]
+
+
+def test_recent_prefers_timestamped_records_when_full():
+    records = [{'id': 1}, {'id': 2, 'timestamp': 1}, {'id': 3}, {'id': 4, 'timestamp': 2}]
+    stats = aggregate(records, {'recent': RecentN(2), 'ids': GroupCount('id')})
+    assert [record['id'] for record in stats['recent']] == [4, 2]
+    assert sum(stats['ids'].values()) == 4
+
+
+def test_recent_fills_with_untimestamped_records():
+    recent = RecentN(2)
+    for record in ({'id': 1}, {'id': 2, 'timestamp': 1}):
+        recent.add(record)
+    assert [record['id'] for record in recent.result()] == [2, 1]
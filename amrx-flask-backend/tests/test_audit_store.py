@@ -0,0 +1,100 @@
+import glob
+import logging
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from audit_store import AuditReader, AuditWriter, configure_audit_logging
+from log_pipeline import configure_logging
+
+HOUR = datetime(2026, 10, 16, 8, tzinfo=timezone.utc).timestamp()
+
+
+def entry(ts, ip='203.0.113.7', pharmacist_id=None, n=0):
+    return {'ts': ts, 'type': 'public', 'ip': ip, 'pharmacist_id': pharmacist_id, 'data': {'n': n}}
+
+
+def segment_files(directory, suffix):
+    return sorted(glob.glob(os.path.join(directory, f'audit-*{suffix}')))
+
+
+def test_segments_rotate_hourly_and_seal_their_key_index(tmp_path):
+    writer = AuditWriter(str(tmp_path), index_interval=4, retention_days=None)
+    for n in range(10):
+        writer.append(entry(HOUR + n, ip='198.51.100.1' if n % 2 else '203.0.113.7', n=n))
+    writer.append(entry(HOUR + 3600, n=10))
+    writer.flush()
+    assert len(segment_files(tmp_path, '.ndjson')) == 2
+    # Only the finished hour is sealed
+    assert len(segment_files(tmp_path, '.keys')) == 1
+    writer.close()
+    assert len(segment_files(tmp_path, '.keys')) == 2
+
+
+def test_reader_answers_time_and_key_queries(tmp_path):
+    writer = AuditWriter(str(tmp_path), index_interval=4, retention_days=None)
+    for n in range(20):
+        writer.append(entry(HOUR + n * 300, ip='198.51.100.1' if n % 3 == 0 else '203.0.113.7',
+                            pharmacist_id='p1' if n == 5 else None, n=n))
+    writer.flush()  # The newest hour stays open: unsealed segments are scanned
+    reader = AuditReader(str(tmp_path))
+
+    records = list(reader.query(since=HOUR + 3600, until=HOUR + 3600 + 900))
+    assert [record['data']['n'] for record in records] == [12, 13, 14]
+    assert [record['data']['n'] for record in reader.query(ip='198.51.100.1')] == [0, 3, 6, 9, 12, 15, 18]
+    assert [record['data']['n'] for record in reader.query(pharmacist_id='p1')] == [5]
+    assert [record['data']['n'] for record in reader.query(ip='198.51.100.1', since=HOUR + 3600, limit=2)] == [12, 15]
+
+
+def test_old_segments_are_pruned(tmp_path):
+    writer = AuditWriter(str(tmp_path), retention_days=1)
+    writer.append(entry(HOUR - 3 * 24 * 3600))
+    writer.append(entry(datetime.now(timezone.utc).timestamp()))
+    writer.close()
+    assert len(segment_files(tmp_path, '.ndjson')) == 1
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_child_does_not_rewrite_the_parents_pending_entries(tmp_path):
+    writer = AuditWriter(str(tmp_path), retention_days=None)
+    writer.append(entry(HOUR, n=0))
+    pid = os.fork()
+    if pid == 0:
+        try:
+            writer.append(entry(HOUR, n=1))
+            writer.close()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    writer.close()
+    counts = sorted(len(open(path).read().splitlines()) for path in segment_files(tmp_path, '.ndjson'))
+    assert counts == [1, 1]
+    assert sorted(record['data']['n'] for record in AuditReader(str(tmp_path)).query()) == [0, 1]
+
+
+def test_audit_records_stay_out_of_the_main_log(tmp_path):
+    root = logging.getLogger()
+    saved = list(root.handlers), root.level
+    audit_logger = logging.getLogger('amrx.audit')
+    try:
+        main = configure_logging(path=str(tmp_path / 'app.log'), console=False)
+        audit = configure_audit_logging(str(tmp_path / 'audit'), retention_days=None)
+        logging.getLogger('amrx.test').info('Ordinary record')
+        audit_logger.info('Submission logged', extra={'submission_type': 'public', 'ip_address': '203.0.113.7',
+                                                      'user_agent': 'test', 'data': {'n': 1}})
+        audit.stop()
+        main.stop()
+        log = (tmp_path / 'app.log').read_text()
+        assert 'Ordinary record' in log
+        assert 'Submission logged' not in log
+        assert [record['ip'] for record in AuditReader(str(tmp_path / 'audit')).query()] == ['203.0.113.7']
+    finally:
+        for handler in list(audit_logger.handlers):
+            audit_logger.removeHandler(handler)
+        audit_logger.propagate = True
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in saved[0]:
+            root.addHandler(handler)
+        root.setLevel(saved[1])
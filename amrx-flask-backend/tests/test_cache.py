@@ -0,0 +1,188 @@
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+from cache import ResponseCache
+from cache_backends import MemoryBackend
+
+
+@pytest.fixture
+def app_and_cache():
+    """An app with one cached, tagged view over a mutable data dict."""
+    app = Flask(__name__)
+    cache = ResponseCache(MemoryBackend(), default_ttl=60, stale_ttl=60)
+    data = {'count': 1, 'calls': 0}
+
+    @app.route('/dashboard')
+    @cache.cached(tags=('dashboard',))
+    def dashboard():
+        data['calls'] += 1
+        return jsonify({'count': data['count']})
+
+    return app, cache, data
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('condition not met in time')
+        time.sleep(0.01)
+
+
+def test_hit_and_not_modified(app_and_cache):
+    app, cache, data = app_and_cache
+    client = app.test_client()
+    first = client.get('/dashboard')
+    assert first.headers['X-Cache'] == 'MISS'
+    etag = first.headers['ETag']
+
+    second = client.get('/dashboard')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.headers['ETag'] == etag
+
+    assert client.get('/dashboard', headers={'If-None-Match': etag}).status_code == 304
+    assert data['calls'] == 1
+
+
+def test_expired_entry_never_answers_304_for_changed_data(app_and_cache):
+    app, cache, data = app_and_cache
+    cache.default_ttl = cache.stale_ttl = 0.05
+    client = app.test_client()
+    etag = client.get('/dashboard').headers['ETag']
+
+    # Another worker changed the data; this worker never saw the invalidation
+    data['count'] = 2
+    time.sleep(0.15)
+
+    response = client.get('/dashboard', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json == {'count': 2}
+    assert response.headers['ETag'] != etag
+
+
+def test_etag_follows_the_body(app_and_cache):
+    app, cache, data = app_and_cache
+    client = app.test_client()
+    etag = client.get('/dashboard').headers['ETag']
+    cache.clear()
+    # Same data recomputed: same ETag, so the client's copy is still good
+    response = client.get('/dashboard', headers={'If-None-Match': etag})
+    assert (response.status_code, response.headers['X-Cache']) == (304, 'MISS')
+    assert client.get('/dashboard', headers={'If-None-Match': etag}).status_code == 304
+    data['count'] = 2
+    cache.clear()
+    assert client.get('/dashboard', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_recompute_of_unchanged_data_keeps_the_etag():
+    app = Flask(__name__)
+    cache = ResponseCache(MemoryBackend(), default_ttl=0.05, stale_ttl=0.05)
+    data = {'count': 1}
+
+    @app.route('/dashboard')
+    @cache.cached(tags=('dashboard',))
+    def dashboard():
+        return jsonify({'count': data['count'], 'lastUpdated': cache.changed_at(('dashboard',))})
+
+    client = app.test_client()
+    etag = client.get('/dashboard').headers['ETag']
+    time.sleep(0.15)
+    response = client.get('/dashboard', headers={'If-None-Match': etag})
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.status_code == 304
+
+    data['count'] = 2
+    cache.invalidate(['dashboard'])
+    time.sleep(0.15)
+    assert client.get('/dashboard', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_invalidation_serves_stale_then_refreshes(app_and_cache):
+    app, cache, data = app_and_cache
+    client = app.test_client()
+    etag = client.get('/dashboard').headers['ETag']
+
+    data['count'] = 2
+    assert cache.invalidate(['dashboard']) == 1
+    stale = client.get('/dashboard', headers={'If-None-Match': etag})
+    # The stale entry still vouches for its own body while the refresh runs
+    assert stale.status_code == 304
+
+    wait_for(lambda: cache.stats()['refreshes'] == 1)
+    fresh = client.get('/dashboard', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['X-Cache'] == 'HIT'
+    assert fresh.json == {'count': 2}
+
+
+def test_invalidating_other_tags_keeps_entries_fresh(app_and_cache):
+    app, cache, data = app_and_cache
+    client = app.test_client()
+    client.get('/dashboard')
+    assert cache.invalidate(['pharmacist:someone']) == 0
+    assert client.get('/dashboard').headers['X-Cache'] == 'HIT'
+
+
+def test_invalidation_debounce_keeps_young_entries_fresh(app_and_cache):
+    app, cache, data = app_and_cache
+    cache.invalidation_debounce = 0.2
+    client = app.test_client()
+    client.get('/dashboard')
+    cache.invalidate(['dashboard'])
+    assert client.get('/dashboard').headers['X-Cache'] == 'HIT'
+    time.sleep(0.25)
+    assert client.get('/dashboard').headers['X-Cache'] == 'STALE'
+
+
+def test_concurrent_misses_compute_once():
+    app = Flask(__name__)
+    cache = ResponseCache(MemoryBackend())
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    @app.route('/slow')
+    @cache.cached()
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return jsonify({'ok': True})
+
+    results = []
+
+    def fetch():
+        results.append(app.test_client().get('/slow').json)
+
+    threads = [threading.Thread(target=fetch) for _ in range(5)]
+    threads[0].start()
+    started.wait(2)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: cache.stats()['coalesced'] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'ok': True}] * 5
+
+
+def test_server_errors_are_not_cached():
+    app = Flask(__name__)
+    cache = ResponseCache(MemoryBackend())
+    calls = []
+
+    @app.route('/broken')
+    @cache.cached()
+    def broken():
+        calls.append(1)
+        return jsonify({'error': 'down'}), 503
+
+    client = app.test_client()
+    client.get('/broken')
+    client.get('/broken')
+    assert len(calls) == 2
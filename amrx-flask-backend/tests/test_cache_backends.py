@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+import cache_backends
+from cache import ResponseCache
+from cache_backends import CacheEntry, MemoryBackend, SQLiteBackend
+
+
+def entry(body=b'{}', tags=('dashboard',), ttl=60):
+    return CacheEntry.create(body, 200, 'application/json', ttl, 60, tags, 'etag', time.time())
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend(max_entries=3)
+    return SQLiteBackend(path=str(tmp_path / 'cache.sqlite3'), max_entries=3)
+
+
+def test_set_get_delete(backend):
+    backend.set('a', entry(b'one'))
+    assert backend.get('a').body == b'one'
+    assert backend.get('a').tags == ('dashboard',)
+    backend.delete('a')
+    assert backend.get('a') is None
+
+
+def test_invalidate_only_touches_tagged_entries(backend):
+    backend.set('a', entry(tags=('dashboard',)))
+    backend.set('b', entry(tags=('pharmacist:1',)))
+    assert backend.invalidate(['dashboard'], 0) == 1
+    assert backend.get('a').expires_at <= time.time()
+    assert backend.get('b').expires_at > time.time()
+
+
+def test_generations_advance(backend):
+    assert backend.generations(['dashboard']) == {'dashboard': (0, None)}
+    backend.bump_generations(['dashboard'])
+    backend.bump_generations(['dashboard'])
+    generation, changed_at = backend.generations(['dashboard'])['dashboard']
+    assert generation == 2
+    assert changed_at == pytest.approx(time.time(), abs=5)
+
+
+def test_evicts_least_recently_used(backend):
+    if isinstance(backend, SQLiteBackend):
+        backend.touch_interval = 0
+    for key in 'abc':
+        backend.set(key, entry())
+        time.sleep(0.01)
+    backend.get('a')
+    backend.set('d', entry())
+    assert backend.get('b') is None
+    assert all(backend.get(key) is not None for key in 'acd')
+
+
+def test_sqlite_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    first, second = SQLiteBackend(path=path), SQLiteBackend(path=path)
+    first.set('a', entry(b'shared'))
+    assert second.get('a').body == b'shared'
+    second.bump_generations(['dashboard'])
+    assert second.invalidate(['dashboard'], 0) == 1
+    assert first.generations(['dashboard'])['dashboard'][0] == 1
+    assert first.get('a').expires_at <= time.time()
+
+
+def _hold_lock(path, held, release):
+    with SQLiteBackend(path=path).lock('dashboard', 1) as acquired:
+        assert acquired
+        held.set()
+        release.wait(5)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_sqlite_lock_excludes_other_processes(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    backend = SQLiteBackend(path=path)
+    context = multiprocessing.get_context('fork')
+    held, release = context.Event(), context.Event()
+    child = context.Process(target=_hold_lock, args=(path, held, release))
+    child.start()
+    try:
+        assert held.wait(5)
+        with backend.lock('dashboard', 0.05) as acquired:
+            assert not acquired
+        with backend.lock('other', 0.05) as acquired:
+            assert acquired
+    finally:
+        release.set()
+        child.join(5)
+    with backend.lock('dashboard', 1) as acquired:
+        assert acquired
+
+
+@pytest.mark.skipif(cache_backends.fcntl is None, reason='needs fcntl')
+def test_lock_files_stay_bounded(tmp_path):
+    backend = SQLiteBackend(path=str(tmp_path / 'cache.sqlite3'))
+    for n in range(2 * cache_backends.LOCK_STRIPES):
+        with backend.lock(f'/api/dashboard?since={n}', 0) as acquired:
+            assert acquired
+    assert len(os.listdir(backend.lock_dir)) <= cache_backends.LOCK_STRIPES
+
+
+def test_invalidation_in_one_worker_refreshes_the_other(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    data = {'count': 1}
+    clients = []
+    caches = []
+    for _ in range(2):
+        app = Flask(__name__)
+        cache = ResponseCache(SQLiteBackend(path=path))
+
+        @app.route('/dashboard')
+        @cache.cached(tags=('dashboard',))
+        def dashboard():
+            return jsonify({'count': data['count']})
+
+        clients.append(app.test_client())
+        caches.append(cache)
+
+    assert clients[0].get('/dashboard').headers['X-Cache'] == 'MISS'
+    assert clients[1].get('/dashboard').headers['X-Cache'] == 'HIT'
+
+    data['count'] = 2
+    caches[0].invalidate(['dashboard'])
+    assert clients[1].get('/dashboard').headers['X-Cache'] == 'STALE'
+    deadline = time.time() + 2
+    while caches[1].stats()['refreshes'] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    response = clients[0].get('/dashboard')
+    assert response.headers['X-Cache'] == 'HIT'
+    assert response.json == {'count': 2}
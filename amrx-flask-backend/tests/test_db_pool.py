@@ -0,0 +1,103 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from db_pool import ClientPool, PoolTimeout
+
+
+class Clients:
+    """Factory of numbered clients that remembers which were closed."""
+
+    def __init__(self):
+        self.numbers = itertools.count()
+        self.closed = []
+
+    def create(self):
+        return {'n': next(self.numbers), 'broken': False}
+
+    def close(self, client):
+        self.closed.append(client['n'])
+
+
+@pytest.fixture
+def clients():
+    return Clients()
+
+
+def test_returned_clients_are_reused_most_recent_first(clients):
+    pool = ClientPool(clients.create, size=2, close=clients.close)
+    with pool.connection() as first, pool.connection() as second:
+        assert (first['n'], second['n']) == (0, 1)
+    # The outer checkout, client 0, was returned last
+    with pool.connection() as client:
+        assert client['n'] == 0
+    stats = pool.stats()
+    assert (stats['created'], stats['checkouts'], stats['in_use'], stats['idle']) == (2, 3, 0, 2)
+    assert clients.closed == []
+
+    pool.clear()
+    assert sorted(clients.closed) == [0, 1]
+    assert pool.stats()['open'] == 0
+
+
+def test_exhausted_pool_waits_then_times_out(clients):
+    pool = ClientPool(clients.create, size=1, acquire_timeout=0.1)
+    with pool.connection():
+        started = time.monotonic()
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+        assert time.monotonic() - started >= 0.1
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_waiting_checkout_gets_the_returned_client(clients):
+    pool = ClientPool(clients.create, size=1, acquire_timeout=2)
+    release = threading.Event()
+    held = threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            release.wait(2)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait(2)
+    threading.Timer(0.05, release.set).start()
+    with pool.connection() as client:
+        assert client['n'] == 0
+    thread.join()
+    assert pool.stats()['created'] == 1
+
+
+def test_client_whose_use_raised_is_discarded(clients):
+    pool = ClientPool(clients.create, size=1, close=clients.close)
+    with pytest.raises(ConnectionError):
+        with pool.connection():
+            raise ConnectionError('connection reset')
+    assert clients.closed == [0]
+    with pool.connection() as client:
+        assert client['n'] == 1
+    stats = pool.stats()
+    assert (stats['errors'], stats['unhealthy'], stats['open']) == (1, 0, 1)
+
+
+def test_unhealthy_client_is_discarded(clients):
+    pool = ClientPool(clients.create, size=1, close=clients.close, healthy=lambda client: not client['broken'])
+    with pool.connection() as client:
+        client['broken'] = True
+    assert clients.closed == [0]
+    assert pool.stats()['unhealthy'] == 1
+
+
+def test_idle_clients_age_out(clients):
+    pool = ClientPool(clients.create, size=2, max_idle=0.05, close=clients.close)
+    with pool.connection():
+        pass
+    time.sleep(0.1)
+    with pool.connection() as client:
+        assert client['n'] == 1
+    assert clients.closed == [0]
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from directory import PharmacistDirectory
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_changes_during_a_reload_survive_it():
+    loading = threading.Event()
+    release = threading.Event()
+
+    def load_all():
+        loading.set()
+        release.wait(2)
+        return [('1', {'email': 'old@example.com'}), ('2', {'email': 'gone@example.com'})]
+
+    directory = PharmacistDirectory(load_all, lambda email: None)
+    reload = threading.Thread(target=directory._reload)
+    reload.start()
+    loading.wait(2)
+    directory.put('1', {'email': 'new@example.com'})
+    directory.put('3', {'email': 'added@example.com'})
+    directory.remove('2')
+    release.set()
+    reload.join()
+
+    assert sorted(directory._by_email) == ['added@example.com', 'new@example.com']
+    assert directory._pending is None
+
+
+def test_update_during_a_reload_survives_it():
+    release = threading.Event()
+    release.set()
+
+    def load_all():
+        release.wait(2)
+        return [('1', {'email': 'a@example.com', 'password_hash': 'old'})]
+
+    directory = PharmacistDirectory(load_all, lambda email: None)
+    directory._reload()
+    release.clear()
+    reload = threading.Thread(target=directory._reload)
+    reload.start()
+    wait_for(lambda: directory._pending is not None)
+    directory.update('a@example.com', password_hash='new')
+    release.set()
+    reload.join()
+
+    assert directory._by_email['a@example.com'].password_hash == 'new'
+
+
+def test_listener_keeps_a_periodic_reload():
+    loads = []
+    subscribed = []
+
+    def load_all():
+        loads.append(time.monotonic())
+        return [('1', {'email': 'a@example.com'})]
+
+    directory = PharmacistDirectory(load_all, lambda email: None, subscribe=subscribed.append,
+                                    refresh_interval=60, resync_interval=0.05)
+    directory.start()
+    wait_for(lambda: len(loads) >= 3)
+
+    assert len(subscribed) == 1
+    assert directory.stats()['mode'] == 'listener'
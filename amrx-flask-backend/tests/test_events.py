@@ -0,0 +1,42 @@
+import threading
+
+from events import EventBroadcaster
+
+
+def test_subscriber_cap_holds_under_concurrent_requests():
+    broadcaster = EventBroadcaster(max_subscribers=3)
+    start = threading.Barrier(20)
+    subscriptions = []
+
+    def request():
+        start.wait()
+        subscriptions.append(broadcaster.subscribe())
+
+    threads = [threading.Thread(target=request) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    admitted = [subscription for subscription in subscriptions if subscription is not None]
+    assert len(admitted) == 3
+    assert (broadcaster.stats()['subscribers'], broadcaster.stats()['refused']) == (3, 17)
+
+    # Closing a stream that never started still frees its slot, once
+    admitted[0].close()
+    admitted[0].close()
+    assert broadcaster.stats()['subscribers'] == 2
+    assert broadcaster.subscribe() is not None
+    assert broadcaster.subscribe() is None
+
+
+def test_subscription_streams_published_events():
+    broadcaster = EventBroadcaster(heartbeat=0.05, max_subscribers=1)
+    subscription = broadcaster.subscribe()
+    assert next(subscription).startswith('retry:')
+    broadcaster.publish('stats', {'total': 1})
+    frame = next(subscription)
+    assert frame.startswith(f"id: {broadcaster.epoch}-1\nevent: stats\n")
+    assert 'data: {"total":1}' in frame
+    subscription.close()
+    assert broadcaster.stats()['subscribers'] == 0
@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import ingest
+from ingest import IngestLog
+
+
+class Sink:
+    """Collects drained records; fails the first `failures` calls."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.records = []
+        self.lock = threading.Lock()
+
+    def __call__(self, records):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError('database unavailable')
+            self.records.extend(records)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def write_log(path, records, checkpoint=None, tail=b''):
+    with open(path, 'wb') as handle:
+        for record in records:
+            handle.write((json.dumps(record) + '\n').encode())
+        handle.write(tail)
+    if checkpoint is not None:
+        with open(f"{path}.ckpt", 'w') as handle:
+            handle.write(str(checkpoint))
+
+
+def test_appended_records_reach_the_sink(tmp_path):
+    sink = Sink()
+    log = IngestLog(str(tmp_path), sink, drain_interval=0.01)
+    stamp = datetime(2024, 5, 1, 12, 30, 0, 250)
+    for n in range(5):
+        log.append({'id': n, 'timestamp': stamp})
+    assert wait_for(lambda: len(sink.records) == 5)
+    assert [record['id'] for record in sink.records] == list(range(5))
+    assert sink.records[0]['timestamp'] == stamp
+    assert log.stats()['pending_bytes'] == 0
+
+
+def test_orphaned_log_is_replayed_from_its_checkpoint(tmp_path):
+    orphan = str(tmp_path / 'ingest-1-dead.log')
+    first = (json.dumps({'id': 0}) + '\n').encode()
+    # Record 0 was drained before the owner died; the torn tail was never acknowledged
+    write_log(orphan, [{'id': 0}, {'id': 1}, {'id': 2}], checkpoint=len(first), tail=b'{"id": 3')
+    sink = Sink()
+    log = IngestLog(str(tmp_path), sink, drain_interval=0.01)
+    log.start()
+    assert wait_for(lambda: log.stats()['replayed_logs'] == 1)
+    assert [record['id'] for record in sink.records] == [1, 2]
+    assert not os.path.exists(orphan)
+    assert not os.path.exists(f"{orphan}.ckpt")
+
+
+def test_log_of_a_live_worker_is_not_adopted(tmp_path):
+    held = str(tmp_path / 'ingest-2-live.log')
+    write_log(held, [{'id': 0}])
+    segment = ingest._Segment.claim(held)
+    assert segment is not None
+    try:
+        sink = Sink()
+        log = IngestLog(str(tmp_path), sink, drain_interval=0.01)
+        log.start()
+        time.sleep(0.2)
+        assert sink.records == []
+        assert log.stats()['orphan_logs'] == 0
+    finally:
+        os.close(segment.fd)
+
+
+def test_failed_drain_is_retried_without_losing_records(tmp_path):
+    sink = Sink(failures=1)
+    log = IngestLog(str(tmp_path), sink, drain_interval=0.01)
+    log.append({'id': 'a'})
+    assert wait_for(lambda: log.stats()['retries'] == 1)
+    log.append({'id': 'b'})
+    assert wait_for(lambda: len(sink.records) == 2)
+    assert [record['id'] for record in sink.records] == ['a', 'b']
+    assert log.stats()['last_error'] is None
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+
+import pytest
+
+from passwords import HasherBusy, PasswordHasher
+from repository import SQLiteRepository
+
+LEGACY_SALT = 'amr_salt_2024'
+
+
+def legacy_hash(password):
+    return hashlib.sha256((password + LEGACY_SALT).encode()).hexdigest()
+
+
+@pytest.fixture
+def hasher():
+    # Cheap parameters; the scheme is the same whatever n is
+    return PasswordHasher(n=2 ** 4, legacy_salt=LEGACY_SALT)
+
+
+def test_hash_and_verify(hasher):
+    stored = hasher.hash('correct horse')
+    assert stored.startswith('scrypt$16$8$1$')
+    assert stored != hasher.hash('correct horse')
+    assert hasher.verify('correct horse', stored) == (True, False)
+    assert hasher.verify('wrong horse', stored) == (False, False)
+    assert hasher.verify('correct horse', 'scrypt$garbage') == (False, False)
+
+
+def test_unknown_accounts_still_cost_a_hash(hasher):
+    assert hasher.verify('correct horse', None) == (False, False)
+    assert hasher.stats()['verified'] == 1
+
+
+def test_outdated_and_legacy_hashes_need_a_rehash(hasher):
+    weaker = PasswordHasher(n=2 ** 3).hash('correct horse')
+    assert hasher.verify('correct horse', weaker) == (True, True)
+    assert hasher.verify('correct horse', legacy_hash('correct horse')) == (True, True)
+    assert hasher.verify('wrong horse', legacy_hash('correct horse')) == (False, True)
+    assert PasswordHasher(n=2 ** 4).verify('correct horse', legacy_hash('correct horse')) == (False, True)
+
+
+def block_pool(hasher):
+    """Occupy every worker until the returned event is set."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    def submit():
+        try:
+            hasher._run(hold)
+        except HasherBusy:
+            pass  # Timed out waiting; the worker stays busy until release
+
+    threading.Thread(target=submit, daemon=True).start()
+    assert started.wait(2)
+    return release
+
+
+def test_full_pool_refuses_at_once():
+    hasher = PasswordHasher(n=2 ** 4, workers=1, max_pending=0)
+    release = block_pool(hasher)
+    with pytest.raises(HasherBusy):
+        hasher.hash('correct horse')
+    assert hasher.stats()['rejected'] == 1
+    release.set()
+
+
+def test_request_stuck_behind_a_saturated_pool_times_out():
+    hasher = PasswordHasher(n=2 ** 4, workers=1, max_pending=1)
+    release = block_pool(hasher)
+    hasher.timeout = 0.1
+    with pytest.raises(HasherBusy):
+        hasher.hash('correct horse')
+    # The blocking request may have timed out too
+    assert hasher.stats()['timed_out'] >= 1
+    # The timed-out request gave its queue slot back
+    with pytest.raises(HasherBusy):
+        hasher.hash('correct horse')
+    assert hasher.stats()['rejected'] == 0
+    release.set()
+    hasher.timeout = 5
+    assert hasher.hash('correct horse').startswith('scrypt$')
+
+
+@pytest.fixture
+def accounts(backend, monkeypatch, tmp_path):
+    """The app backed by a SQLite repository, as if a database were configured."""
+    repository = SQLiteRepository(str(tmp_path / 'amrx.sqlite3'))
+    monkeypatch.setattr(backend, 'repository', repository)
+    monkeypatch.setattr(backend, 'db', object())
+    monkeypatch.setattr(backend, 'password_hasher', PasswordHasher(n=2 ** 4, legacy_salt=LEGACY_SALT))
+    return repository
+
+
+def login(backend, password):
+    return backend.app.test_client().post('/api/auth/pharmacist/login',
+                                          json={'email': 'ada@example.com', 'password': password})
+
+
+def test_legacy_hash_is_upgraded_on_login(backend, accounts):
+    accounts.create_pharmacist({'name': 'Ada', 'email': 'ada@example.com', 'institution': 'Clinic',
+                                'password_hash': legacy_hash('Correct-horse-1')})
+    assert login(backend, 'Correct-horse-1').status_code == 200
+    upgraded = accounts.find_pharmacist('ada@example.com').password_hash
+    assert upgraded.startswith('scrypt$')
+    assert backend.password_hasher.verify('Correct-horse-1', upgraded) == (True, False)
+    assert login(backend, 'Wrong-horse-1').status_code == 401
+
+
+def test_saturated_hasher_answers_503(backend, accounts, monkeypatch):
+    accounts.create_pharmacist({'name': 'Ada', 'email': 'ada@example.com', 'institution': 'Clinic',
+                                'password_hash': backend.password_hasher.hash('Correct-horse-1')})
+    hasher = PasswordHasher(n=2 ** 4, workers=1, max_pending=1, timeout=0.1)
+    monkeypatch.setattr(backend, 'password_hasher', hasher)
+    release = block_pool(hasher)
+    response = login(backend, 'Correct-horse-1')
+    release.set()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert response.json['code'] == 'AUTH_BUSY'
@@ -0,0 +1,80 @@
+import types
+
+import pytest
+
+import rate_limit_storage
+from rate_limit_storage import SharedMemoryStorage
+
+pytestmark = pytest.mark.skipif(rate_limit_storage.fcntl is None, reason='needs fcntl')
+
+WINDOW = 60
+START = 1000 * WINDOW  # The start of a window
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=float(START))
+    monkeypatch.setattr(rate_limit_storage, 'time', types.SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def uri(tmp_path):
+    return f"amrx-shm://{tmp_path / 'ratelimit'}?slots=64"
+
+
+def acquire(storage, times, limit=3):
+    return [storage.acquire_sliding_window_entry('client', limit, WINDOW) for _ in range(times)]
+
+
+def test_sliding_window_refuses_past_the_limit(clock, uri):
+    storage = SharedMemoryStorage(uri)
+    assert acquire(storage, 4) == [True, True, True, False]
+    previous, _, current, current_ttl = storage.get_sliding_window('client', WINDOW)
+    assert (previous, current) == (0, 3)
+    assert current_ttl == pytest.approx(2 * WINDOW)
+
+
+def test_previous_window_is_weighted_by_its_overlap(clock, uri):
+    storage = SharedMemoryStorage(uri)
+    acquire(storage, 3)
+    # Half way through the next window, the previous one still counts for 1.5
+    clock.now = START + WINDOW * 1.5
+    assert acquire(storage, 3) == [True, True, False]
+    previous, previous_ttl, current, _ = storage.get_sliding_window('client', WINDOW)
+    assert (previous, current) == (3, 2)
+    assert previous_ttl == pytest.approx(WINDOW / 2)
+
+
+def test_counts_lapse_after_two_windows(clock, uri):
+    storage = SharedMemoryStorage(uri)
+    acquire(storage, 3)
+    clock.now = START + WINDOW * 2
+    assert acquire(storage, 3) == [True, True, True]
+
+
+def test_workers_share_counts(clock, uri):
+    first, second = SharedMemoryStorage(uri), SharedMemoryStorage(uri)
+    assert acquire(first, 2) == [True, True]
+    assert acquire(second, 2) == [True, False]
+    second.clear_sliding_window('client', WINDOW)
+    assert acquire(first, 1) == [True]
+
+
+def test_fixed_window_counts_and_expires(clock, uri):
+    storage = SharedMemoryStorage(uri)
+    assert [storage.incr('key', WINDOW) for _ in range(3)] == [1, 2, 3]
+    assert storage.get_expiry('key') == START + WINDOW
+    clock.now = START + WINDOW
+    assert storage.get('key') == 0
+    assert storage.incr('key', WINDOW) == 1
+
+
+def test_full_bucket_evicts_the_key_closest_to_expiring(clock, tmp_path):
+    storage = SharedMemoryStorage(f"amrx-shm://{tmp_path / 'ratelimit'}?slots=2&bucket_slots=2")
+    storage.incr('short', 10)
+    storage.incr('long', 100)
+    storage.incr('new', 50)
+    assert (storage.get('short'), storage.get('long'), storage.get('new')) == (0, 1, 1)
+    assert storage.stats()['evictions'] == 1
+    assert storage.reset() == 2
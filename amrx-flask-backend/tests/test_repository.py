@@ -0,0 +1,85 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from cursors import InvalidCursor
+from repository import SQLiteRepository, SupabaseRepository, monthly_trends
+
+
+def test_supabase_page_position_must_be_a_uuid():
+    repository = SupabaseRepository(SimpleNamespace(pool=None))
+    with pytest.raises(InvalidCursor):
+        repository.list_pharmacist_submissions('p1', 10, (datetime.now(), '0),id.gt.(0'))
+    assert repository.list_pharmacist_submissions('p1', 10, (datetime.now(), str(uuid.uuid4()))) == ([], False)
+
+
+@pytest.fixture
+def sqlite_repository(tmp_path):
+    return SQLiteRepository(str(tmp_path / 'amrx.sqlite3'))
+
+
+def pharmacist_rows(count, pharmacist_id='p1', start=None):
+    start = start or datetime.now(timezone.utc) - timedelta(seconds=10)
+    return [{'medicine_name': f'Medicine {n % 3}', 'category': 'penicillins', 'quantity': n + 1,
+             'region': 'Lagos' if n % 2 else 'Delhi', 'pharmacist_id': pharmacist_id,
+             'created_at': start + timedelta(seconds=n)} for n in range(count)]
+
+
+def test_sqlite_saves_public_submissions_once(sqlite_repository):
+    saved = sqlite_repository.save_public_submissions(
+        [{'symptoms': 'fever', 'medication': 'Amoxicillin', 'duration': 3, 'location': location}
+         for location in ('Delhi', 'Delhi', 'Lima')])
+    assert all(uuid.UUID(row['id']) for row in saved)
+    # Replays of rows that carry their id are skipped
+    sqlite_repository.save_public_submissions(saved[:1])
+    stats = sqlite_repository.dashboard_stats()
+    assert (stats['total_submissions'], stats['countries_affected']) == (3, 2)
+    assert stats['highRiskZones'][0] == 'Delhi'
+    assert [row['id'] for row in stats['recentSubmissions']] == [row['id'] for row in reversed(saved)]
+
+
+def test_sqlite_keyset_pages_cover_every_submission_once(sqlite_repository):
+    saved = sqlite_repository.save_pharmacist_submissions(pharmacist_rows(23))
+    sqlite_repository.save_pharmacist_submissions(pharmacist_rows(4, pharmacist_id='p2'))
+    seen = []
+    after = None
+    while True:
+        rows, more = sqlite_repository.list_pharmacist_submissions('p1', 10, after)
+        seen.extend(rows)
+        if not more:
+            break
+        after = (datetime.fromisoformat(rows[-1]['created_at']), rows[-1]['id'])
+    assert [row['id'] for row in seen] == [row['id'] for row in reversed(saved)]
+    assert len(seen) == 23
+
+
+def test_sqlite_pharmacist_dashboard_has_every_month(sqlite_repository):
+    sqlite_repository.save_pharmacist_submissions(pharmacist_rows(5))
+    sqlite_repository.save_pharmacist_submissions(pharmacist_rows(2, start=datetime.now(timezone.utc) - timedelta(days=400)))
+    dashboard = sqlite_repository.pharmacist_dashboard('p1')
+    assert (dashboard['total_submissions'], dashboard['monthly_submissions']) == (7, 5)
+    assert dashboard['region_counts'] == {'Delhi': 4, 'Lagos': 3}
+    assert len(dashboard['recent_submissions']) == 7
+    assert dashboard['monthly_trends'] == monthly_trends({f"{datetime.now(timezone.utc):%Y-%m}": 5})
+    assert [trend['count'] for trend in dashboard['monthly_trends']] == [0, 0, 0, 0, 0, 5]
+
+
+def test_sqlite_pharmacist_accounts(sqlite_repository):
+    data = {'name': 'Ada', 'email': 'ada@example.com', 'password_hash': 'hash', 'institution': 'Clinic'}
+    pharmacist_id = sqlite_repository.create_pharmacist(data)
+    assert sqlite_repository.create_pharmacist(data) is None
+    sqlite_repository.update_pharmacist('ada@example.com', {'password_hash': 'rehashed'})
+    pharmacist = sqlite_repository.find_pharmacist('ada@example.com')
+    assert (pharmacist.id, pharmacist.password_hash, pharmacist.active) == (pharmacist_id, 'rehashed', True)
+    assert sqlite_repository.find_pharmacist('nobody@example.com') is None
+
+
+def test_supabase_monthly_trends_are_zero_filled():
+    month = f"{datetime.now(timezone.utc):%Y-%m}"
+    service = SimpleNamespace(pool=None, get_pharmacist_dashboard=lambda pharmacist_id: {
+        'total_submissions': 2, 'monthly_trends': [{'month': month, 'count': 2}]})
+    trends = SupabaseRepository(service).pharmacist_dashboard('p1')['monthly_trends']
+    assert len(trends) == 6
+    assert trends[-1] == {'month': month, 'count': 2}
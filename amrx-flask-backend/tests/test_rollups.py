@@ -0,0 +1,77 @@
+import pytest
+
+import rollups
+
+
+def apply(shards, payloads):
+    """What Firestore does with merge=True increments on each shard."""
+    shards = [dict(data or {}) for data in shards]
+    for shard, payload in payloads.items():
+        for field, value in payload.items():
+            if isinstance(value, dict):
+                counts = dict(shards[shard].get(field) or {})
+                for key, increment in value.items():
+                    counts[key] = counts.get(key, 0) + increment.value
+                shards[shard][field] = counts
+            else:
+                shards[shard][field] = shards[shard].get(field, 0) + value.value
+    return shards
+
+
+def totals(public_total=0, pharmacist_total=0, **maps):
+    return {'public_total': public_total, 'pharmacist_total': pharmacist_total,
+            **{name: maps.get(name, {}) for name in rollups.MAP_NAMES}}
+
+
+@pytest.fixture(autouse=True)
+def fresh_keys(monkeypatch):
+    monkeypatch.setattr(rollups, '_known_keys', {name: set() for name in rollups.MAP_NAMES})
+
+
+def test_keys_are_trimmed():
+    assert rollups._counter_key('  Lagos \n  Island ') == 'Lagos Island'
+    assert rollups._counter_key('x' * 500) == 'x' * rollups.MAX_KEY_LENGTH
+    assert rollups._counter_key(None) == 'Unknown'
+    assert rollups._counter_key('   ') == 'Unknown'
+
+
+def test_new_keys_past_the_cap_count_as_other(monkeypatch):
+    monkeypatch.setattr(rollups, 'ROLLUP_MAX_KEYS', 2)
+    payload = rollups._build_increments(
+        [{'location': 'Delhi'}, {'location': 'Lagos'}, {'location': 'Lima'}, {'location': 'Delhi'}],
+        'public_total', rollups.PUBLIC_MAP_FIELDS)
+    counts = {key: increment.value for key, increment in payload['locations'].items()}
+    assert counts == {'Delhi': 2, 'Lagos': 1, rollups.OTHER_KEY: 1}
+    assert payload['public_total'].value == 4
+
+
+def test_rebuild_caps_to_the_most_frequent_keys(monkeypatch):
+    monkeypatch.setattr(rollups, 'ROLLUP_MAX_KEYS', 3)
+    capped = rollups._cap_keys({'a': 5, 'b': 4, 'c': 1, 'd': 1, rollups.OTHER_KEY: 2})
+    assert capped == {'a': 5, 'b': 4, rollups.OTHER_KEY: 4}
+
+
+def test_correction_keeps_increments_made_during_the_scan():
+    at_read_time = [totals(public_total=7, locations={'Delhi': 4, 'Gone': 3}),
+                    totals(public_total=2, locations={'Delhi': 1, 'Gone': 1})]
+    scanned = totals(public_total=6, locations={'Delhi': 6})
+    payloads = rollups._correction(scanned, at_read_time)
+
+    # A submission from Lima was counted on shard 1 after the read time
+    during_scan = apply(at_read_time, {1: {'public_total': rollups.firestore.Increment(1),
+                                           'locations': {'Lima': rollups.firestore.Increment(1)}}})
+    rollup = rollups._merge_shards(apply(during_scan, payloads))
+    assert rollup['public_total'] == 7
+    assert rollup['locations'] == {'Delhi': 6, 'Lima': 1}
+
+
+def test_correction_zeroes_stale_keys_on_every_shard():
+    shards = apply([totals(locations={'Gone': 3}), totals(locations={'Gone': -1}), None],
+                   rollups._correction(totals(), [totals(locations={'Gone': 3}),
+                                                  totals(locations={'Gone': -1}), None]))
+    assert [data.get('locations', {}).get('Gone', 0) for data in shards] == [0, 0, 0]
+
+
+def test_correction_is_empty_when_nothing_changed():
+    shards = [totals(public_total=3, locations={'Delhi': 3}), None]
+    assert rollups._correction(totals(public_total=3, locations={'Delhi': 3}), shards) == {}
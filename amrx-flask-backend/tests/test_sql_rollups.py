@@ -0,0 +1,130 @@
+"""Rollup triggers and dashboard functions of migrations/, against a real Postgres.
+
+Set AMRX_TEST_DATABASE_URL (e.g. postgresql://postgres@localhost/postgres) to
+run them; each test loads the schema into a throwaway schema and drops it.
+"""
+
+import os
+import re
+
+import pytest
+
+DATABASE_URL = os.getenv('AMRX_TEST_DATABASE_URL')
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason='set AMRX_TEST_DATABASE_URL to run the SQL tests')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(BACKEND_DIR, 'migrations')
+
+
+def schema_scripts():
+    with open(os.path.join(BACKEND_DIR, 'supabase_schema.sql')) as f:
+        # Database-wide settings are not the tests' to change
+        scripts = [re.sub(r'^ALTER DATABASE .*?;$', '', f.read(), flags=re.MULTILINE)]
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+            scripts.append(f.read())
+    return scripts
+
+
+@pytest.fixture
+def db():
+    psycopg = pytest.importorskip('psycopg')
+    schema = f"amrx_test_{os.getpid()}"
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        conn.execute(f'CREATE SCHEMA {schema}')
+        try:
+            conn.execute(f'SET search_path TO {schema}, public')
+            for script in schema_scripts():
+                conn.execute(script)
+            # The seed rows of supabase_schema.sql are not part of any test
+            conn.execute('DELETE FROM public_submissions')
+            conn.execute('DELETE FROM pharmacist_submissions')
+            conn.execute("SELECT create_submission_partitions((CURRENT_DATE - INTERVAL '90 days')::date, CURRENT_DATE)")
+            yield conn
+        finally:
+            conn.execute(f'DROP SCHEMA {schema} CASCADE')
+
+
+def value(conn, sql, *params):
+    return conn.execute(sql, params).fetchone()[0]
+
+
+def insert_public(conn, locations, days_ago=0):
+    conn.execute("""
+        INSERT INTO public_submissions (symptoms, medication, duration, location, created_at)
+        SELECT 'fever', 'Amoxicillin', 3, location, NOW() - %s * INTERVAL '1 day' - n * INTERVAL '1 second'
+        FROM unnest(%s::text[]) WITH ORDINALITY AS t(location, n)
+    """, (days_ago, locations))
+
+
+def insert_pharmacist(conn, pharmacist_id, rows, days_ago=0):
+    """rows: [(medicine, region)]"""
+    conn.execute("""
+        INSERT INTO pharmacist_submissions (medicine_name, category, quantity, region, pharmacist_id, created_at)
+        SELECT medicine, 'penicillins', 10, region, %s, NOW() - %s * INTERVAL '1 day' - n * INTERVAL '1 second'
+        FROM unnest(%s::text[], %s::text[]) WITH ORDINALITY AS t(medicine, region, n)
+    """, (pharmacist_id, days_ago, [medicine for medicine, _ in rows], [region for _, region in rows]))
+
+
+def assert_consistent(conn):
+    """The rollup-backed dashboards agree with aggregates over the raw tables."""
+    stats = value(conn, 'SELECT get_dashboard_stats()')
+    assert stats['total_submissions'] == value(conn, 'SELECT count(*) FROM public_submissions')
+    assert stats['totalEntries'] == stats['total_submissions'] + value(conn, 'SELECT count(*) FROM pharmacist_submissions')
+    assert stats['countries_affected'] == value(conn, 'SELECT count(DISTINCT location) FROM public_submissions')
+    assert stats['highRiskZones'] == value(conn, """
+        SELECT coalesce(json_agg(location), '[]') FROM (SELECT location FROM public_submissions
+            GROUP BY 1 ORDER BY count(*) DESC, 1 LIMIT 3) t""")
+    assert stats['commonAntibiotics'] == value(conn, """
+        SELECT coalesce(json_agg(medicine_name), '[]') FROM (SELECT medicine_name FROM pharmacist_submissions
+            GROUP BY 1 ORDER BY count(*) DESC, 1 LIMIT 3) t""")
+    for pharmacist_id in ('p1', 'p2', 'nobody'):
+        dashboard = value(conn, 'SELECT get_pharmacist_dashboard(%s)', pharmacist_id)
+        assert dashboard['total_submissions'] == value(
+            conn, 'SELECT count(*) FROM pharmacist_submissions WHERE pharmacist_id = %s', pharmacist_id)
+        assert (dashboard['region_counts'] or {}) == value(conn, """
+            SELECT coalesce(json_object_agg(region, count), '{}') FROM (SELECT region, count(*) AS count
+                FROM pharmacist_submissions WHERE pharmacist_id = %s GROUP BY 1) t""", pharmacist_id)
+    return stats
+
+
+def seed(conn):
+    insert_public(conn, ['Delhi', 'Delhi', 'Lagos', 'Lima', 'Delhi', 'Lagos'])
+    insert_public(conn, ['Lima', 'Oslo'], days_ago=40)
+    insert_pharmacist(conn, 'p1', [('Amoxicillin', 'South Asia'), ('Azithromycin', 'South Asia')])
+    insert_pharmacist(conn, 'p1', [('Amoxicillin', 'Europe')], days_ago=35)
+    insert_pharmacist(conn, 'p2', [('Doxycycline', 'West Africa')])
+
+
+def test_inserts_across_partitions_update_the_rollups(db):
+    seed(db)
+    stats = assert_consistent(db)
+    assert stats['total_submissions'] == 8
+    assert stats['highRiskZones'][0] == 'Delhi'
+    assert [row['location'] for row in stats['recentSubmissions']] == ['Delhi', 'Delhi', 'Lagos', 'Lima', 'Delhi']
+
+
+def test_deletes_are_subtracted(db):
+    seed(db)
+    db.execute("DELETE FROM public_submissions WHERE location = 'Delhi'")
+    db.execute("DELETE FROM pharmacist_submissions WHERE pharmacist_id = 'p1' AND region = 'Europe'")
+    stats = assert_consistent(db)
+    assert 'Delhi' not in stats['highRiskZones']
+    assert value(db, "SELECT count(*) FROM location_totals WHERE location = 'Delhi' AND count > 0") == 0
+
+
+def test_rebuild_repairs_drifted_rollups(db):
+    seed(db)
+    db.execute('UPDATE location_totals SET count = count + 100')
+    db.execute("DELETE FROM pharmacist_region_totals WHERE pharmacist_id = 'p2'")
+    db.execute('SELECT rebuild_dashboard_rollups()')
+    assert_consistent(db)
+
+
+def test_rows_in_the_default_partition_move_to_their_month(db):
+    insert_public(db, ['Quito'], days_ago=400)
+    assert value(db, 'SELECT count(*) FROM public_submissions_default') == 1
+    db.execute("SELECT create_submission_partitions((CURRENT_DATE - INTERVAL '430 days')::date, CURRENT_DATE)")
+    assert value(db, 'SELECT count(*) FROM public_submissions_default') == 0
+    assert value(db, "SELECT count(*) FROM public_submissions WHERE location = 'Quito'") == 1
+    assert_consistent(db)
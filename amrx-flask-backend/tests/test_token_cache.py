@@ -0,0 +1,32 @@
+import time
+
+from token_cache import TokenCache
+
+
+def payload(iat, subject='p1'):
+    return {'pharmacist_id': subject, 'iat': iat, 'exp': time.time() + 60}
+
+
+def test_subject_revocation_uses_sub_second_issue_time():
+    cache = TokenCache()
+    revoked_at = int(time.time()) + 0.5
+    cache.revoke_subject('p1', revoked_at)
+    assert not cache.put('before', payload(revoked_at - 0.25))
+    assert cache.put('after', payload(revoked_at + 0.25))
+    assert cache.get('after')[1] is False
+    assert cache.put('other', payload(revoked_at - 0.25, subject='p2'))
+
+
+def test_whole_second_tokens_from_the_revocation_second_are_refused():
+    cache = TokenCache()
+    revoked_at = int(time.time()) + 0.5
+    cache.revoke_subject('p1', revoked_at)
+    assert not cache.put('same-second', payload(int(revoked_at)))
+    assert cache.put('next-second', payload(int(revoked_at) + 1))
+
+
+def test_revoked_token_is_refused_until_it_expires():
+    cache = TokenCache()
+    cache.put('token', payload(time.time()))
+    cache.revoke_token('token', time.time() + 60)
+    assert cache.get('token') == (None, True)
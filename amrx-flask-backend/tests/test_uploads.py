@@ -0,0 +1,130 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from uploads import UploadJob, UploadManager, UploadQueueFull, UploadTooLarge, spool_to_disk
+
+COLUMNS = {'medicinename': 'medicineName', 'quantity': 'quantity'}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def prepare(index, data):
+    if not data.get('medicineName'):
+        return None, {'error': 'medicineName is required', 'code': 'VALIDATION_ERROR'}
+    return dict(data), None
+
+
+def csv_upload(tmp_path, rows, extra=''):
+    body = 'Medicine Name,Quantity\n' + ''.join(f'Medicine {n},{n}\n' for n in range(rows)) + extra
+    return spool_to_disk(io.BytesIO(body.encode()), 1 << 20, directory=str(tmp_path))
+
+
+def test_spooled_file_is_parsed_into_batches(tmp_path):
+    manager = UploadManager(writers=2, batch_size=4, progress_interval=0)
+    written, finished = [], []
+    lock = threading.Lock()
+
+    def write(records):
+        with lock:
+            written.extend(records)
+
+    path = csv_upload(tmp_path, 10, extra=',7\n')
+    job = manager.submit(path, UploadJob('p1', 'csv'), COLUMNS, prepare, write,
+                         lambda progress: None, lambda job, newest: finished.append(newest))
+    assert wait_for(lambda: job.status == 'completed')
+    assert sorted(record['medicineName'] for record in written) == sorted(f'Medicine {n}' for n in range(10))
+    progress = job.to_dict()
+    assert (progress['rows_read'], progress['inserted'], progress['rejected']) == (11, 10, 1)
+    assert progress['errors'] == [{'row': 10, 'error': 'medicineName is required', 'code': 'VALIDATION_ERROR'}]
+    assert finished and finished[0]
+    # The spooled copy is removed once the job is done
+    assert not os.path.exists(path)
+
+
+def test_oversized_upload_is_not_spooled(tmp_path):
+    with pytest.raises(UploadTooLarge):
+        spool_to_disk(io.BytesIO(b'x' * 100), 10, directory=str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_batches_are_reported_and_kept_out_of_newest(tmp_path):
+    manager = UploadManager(writers=1, batch_size=3, progress_interval=0)
+    reports, finished = [], []
+
+    def write(records):
+        if records[0]['medicineName'] == 'Medicine 3':
+            raise RuntimeError('database unavailable')
+
+    path = csv_upload(tmp_path, 6)
+    job = manager.submit(path, UploadJob('p1', 'csv'), COLUMNS, prepare, write,
+                         reports.append, lambda job, newest: finished.append(newest))
+    assert wait_for(lambda: job.status == 'completed')
+    progress = job.to_dict()
+    assert (progress['inserted'], progress['failed']) == (3, 3)
+    assert progress['errors'][0]['code'] == 'DATABASE_ERROR'
+    assert progress['errors_truncated'] is False
+    assert reports[-1]['status'] == 'completed'
+    assert [record['medicineName'] for record in finished[0]] == ['Medicine 0', 'Medicine 1', 'Medicine 2']
+
+
+def test_repeated_failures_stop_the_job(tmp_path):
+    manager = UploadManager(writers=1, batch_size=2, max_consecutive_failures=2)
+
+    def write(records):
+        raise RuntimeError('database unavailable')
+
+    job = manager.submit(csv_upload(tmp_path, 10), UploadJob('p1', 'csv'), COLUMNS, prepare, write,
+                         lambda progress: None)
+    assert wait_for(lambda: job.status == 'failed')
+    assert job.inserted == 0
+    assert job.message == 'Stopped after repeated database errors'
+
+
+def test_submissions_past_the_queue_are_refused(tmp_path):
+    manager = UploadManager(max_jobs=1, max_queued=1, writers=1, batch_size=1)
+    release = threading.Event()
+
+    def write(records):
+        release.wait(5)
+
+    jobs = [manager.submit(csv_upload(tmp_path, 1), UploadJob('p1', 'csv'), COLUMNS, prepare, write,
+                           lambda progress: None) for _ in range(2)]
+    path = csv_upload(tmp_path, 1)
+    with pytest.raises(UploadQueueFull):
+        manager.submit(path, UploadJob('p1', 'csv'), COLUMNS, prepare, write, lambda progress: None)
+    assert not os.path.exists(path)
+
+    release.set()
+    assert wait_for(lambda: all(job.status == 'completed' for job in jobs))
+    # Finished jobs give their slots back
+    job = manager.submit(csv_upload(tmp_path, 1), UploadJob('p1', 'csv'), COLUMNS, prepare, write,
+                         lambda progress: None)
+    assert wait_for(lambda: job.status == 'completed')
+
+
+def test_upload_status_endpoint(backend):
+    client = backend.app.test_client()
+    owner = {'Authorization': f"Bearer {backend.generate_token('p1')}"}
+    body = 'medicine,category,quantity,region\n' + 'Amoxicillin,penicillins,2,Delhi\n' * 3 + 'Amoxicillin,,0,\n'
+
+    response = client.post('/api/pharmacist/uploads', data=body, content_type='text/csv', headers=owner)
+    assert response.status_code == 202
+    status_url = response.json['status_url']
+
+    assert wait_for(lambda: client.get(status_url, headers=owner).json['status'] == 'completed')
+    progress = client.get(status_url, headers=owner).json
+    assert (progress['rows_read'], progress['inserted'], progress['rejected']) == (4, 3, 1)
+    assert progress['errors'][0]['row'] == 3
+
+    other = {'Authorization': f"Bearer {backend.generate_token('p2')}"}
+    assert client.get(status_url, headers=other).status_code == 404
+    assert client.get(status_url).status_code == 401
@@ -0,0 +1,123 @@
+"""
+Verified-token cache for AMR-X Backend
+Remembers the payloads of bearer tokens that passed signature and claim
+verification, keyed by a digest of the token, until the token expires, so
+repeated requests with the same token skip jwt.decode. Entries are bounded
+by an LRU limit. Revocations, of one token or of every token issued to a
+pharmacist before a point in time, are checked on every lookup, cached or
+not.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    """Bounded map of token digest -> verified payload, valid until the token's exp."""
+
+    def __init__(self, max_entries: int = 4096, subject_claim: str = 'pharmacist_id',
+                 max_token_age: float = 24 * 60 * 60):
+        self.max_entries = max_entries
+        self.subject_claim = subject_claim
+        self.max_token_age = max_token_age
+        self._entries: 'OrderedDict[str, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self._revoked_tokens: Dict[str, float] = {}  # digest -> exp
+        self._revoked_subjects: Dict[str, float] = {}  # subject -> tokens issued before this are revoked
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'revoked': 0}
+
+    def _is_revoked(self, digest: str, payload: Dict[str, Any]) -> bool:
+        if digest in self._revoked_tokens:
+            return True
+        revoked_at = self._revoked_subjects.get(payload.get(self.subject_claim))
+        if revoked_at is None:
+            return False
+        issued_at = payload.get('iat', 0)
+        if isinstance(issued_at, int):
+            # Whole-second iat: the token may have been issued up to a second later than it says
+            return issued_at <= int(revoked_at)
+        return issued_at <= revoked_at
+
+    def get(self, token: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Return (payload, revoked) for a cached token; (None, False) means verify it."""
+        digest = token_digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None, digest in self._revoked_tokens
+            payload, expires_at = entry
+            if expires_at <= now:
+                del self._entries[digest]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None, False
+            if self._is_revoked(digest, payload):
+                del self._entries[digest]
+                self._stats['revoked'] += 1
+                return None, True
+            self._entries.move_to_end(digest)
+            self._stats['hits'] += 1
+            return payload, False
+
+    def put(self, token: str, payload: Dict[str, Any]) -> bool:
+        """Cache a freshly verified payload; False if it is revoked and must be refused."""
+        digest = token_digest(token)
+        with self._lock:
+            if self._is_revoked(digest, payload):
+                self._stats['revoked'] += 1
+                return False
+            expires_at = payload.get('exp')
+            if not isinstance(expires_at, (int, float)):
+                return True  # No expiry to bound the entry by: verify every time
+            self._entries[digest] = (payload, float(expires_at))
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return True
+
+    def revoke_token(self, token: str, expires_at: float):
+        """Refuse one token until it expires."""
+        self.apply_revocations(tokens=[(token_digest(token), expires_at)])
+
+    def revoke_subject(self, subject: str, revoked_at: Optional[float] = None):
+        """Refuse every token issued to subject up to revoked_at (default now)."""
+        self.apply_revocations(subjects=[(subject, revoked_at if revoked_at is not None else time.time())])
+
+    def apply_revocations(self, tokens: Iterable[Tuple[str, float]] = (),
+                          subjects: Iterable[Tuple[str, float]] = ()):
+        """Merge revocations, e.g. ones loaded from a shared store: (digest, exp) and (subject, revoked_at)."""
+        now = time.time()
+        with self._lock:
+            for digest, expires_at in tokens:
+                if expires_at > now:
+                    self._revoked_tokens[digest] = expires_at
+                    self._entries.pop(digest, None)
+            for subject, revoked_at in subjects:
+                self._revoked_subjects[subject] = max(revoked_at, self._revoked_subjects.get(subject, 0))
+            # Revocations are only needed until the tokens they cover would have expired anyway
+            for digest in [digest for digest, expires_at in self._revoked_tokens.items() if expires_at <= now]:
+                del self._revoked_tokens[digest]
+            for subject in [subject for subject, revoked_at in self._revoked_subjects.items()
+                            if revoked_at + self.max_token_age <= now]:
+                del self._revoked_subjects[subject]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                'entries': len(self._entries),
+                'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+                'revoked_tokens': len(self._revoked_tokens),
+                'revoked_subjects': len(self._revoked_subjects),
+                **self._stats
+            }
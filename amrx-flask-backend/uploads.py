@@ -0,0 +1,305 @@
+"""
+Background file uploads for AMR-X Backend
+Runs large CSV/NDJSON uploads as background jobs. The uploaded file is
+spooled to disk, then one parser thread streams it row by row into bounded
+batches while a few writer threads commit them; a full queue blocks the
+parser, so memory stays bounded whatever the file size. Only a fixed number
+of jobs may wait for the pool; past that, submissions are refused. Job
+progress is kept in memory and mirrored through a reporting callback.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Raised while spooling an upload that exceeds the size limit."""
+
+
+class UploadQueueFull(RuntimeError):
+    """Raised when every job slot, running or queued, is taken."""
+
+
+def spool_to_disk(stream: BinaryIO, max_bytes: int, directory: Optional[str] = None) -> str:
+    """Copy a stream to a temporary file in fixed-size chunks and return its path."""
+    fd, path = tempfile.mkstemp(prefix='amrx-upload-', dir=directory)
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            while True:
+                chunk = stream.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f'Upload exceeds {max_bytes} bytes')
+                target.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _normalize_header(name: str) -> str:
+    return re.sub(r'[^a-z0-9]', '', (name or '').lower())
+
+
+def iter_rows(path: str, file_format: str, columns: Dict[str, str]) -> Iterator[Tuple[int, Optional[Dict[str, Any]]]]:
+    """Yield (row index, record) pairs from a CSV or NDJSON file; None marks an unreadable row.
+
+    CSV headers are matched to fields case- and punctuation-insensitively
+    through columns, so 'medicine_name' and 'Medicine Name' both work.
+    """
+    with io.open(path, 'r', encoding='utf-8-sig', newline='') as handle:
+        if file_format == 'ndjson':
+            index = 0
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield index, record if isinstance(record, dict) else None
+                index += 1
+            return
+
+        reader = csv.reader(handle)
+        header = next(reader, None)
+        if header is None:
+            return
+        fields = [columns.get(_normalize_header(name)) for name in header]
+        for index, values in enumerate(reader):
+            yield index, {field: value.strip() for field, value in zip(fields, values) if field}
+
+
+class UploadJob:
+    """Progress of one background upload."""
+
+    def __init__(self, owner: str, file_format: str, max_errors: int = 100):
+        self.id = secrets.token_hex(12)
+        self.owner = owner
+        self.format = file_format
+        self.status = 'queued'
+        self.rows_read = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.max_errors = max_errors
+        self.errors_truncated = False
+        self.message = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    def add_error(self, row: int, error: Dict[str, Any]):
+        """Record a row error; only the first max_errors are kept in full."""
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, **error})
+        else:
+            self.errors_truncated = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0
+            return {
+                'job_id': self.id,
+                'pharmacist_id': self.owner,
+                'format': self.format,
+                'status': self.status,
+                'rows_read': self.rows_read,
+                'inserted': self.inserted,
+                'rejected': self.rejected,
+                'failed': self.failed,
+                'rows_per_second': round(self.rows_read / elapsed, 1) if elapsed else 0,
+                'errors': list(self.errors),
+                # A failed batch is one error for many rows, so counts can't tell
+                'errors_truncated': self.errors_truncated,
+                'message': self.message,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at
+            }
+
+
+class UploadManager:
+    """Runs upload jobs on a small pool, each with its own bounded write pipeline."""
+
+    def __init__(self, max_jobs: int = 2, max_queued: int = 4, writers: int = 4, batch_size: int = 499,
+                 queue_batches: int = 8, progress_interval: float = 2.0,
+                 max_consecutive_failures: int = 3, retention: float = 3600):
+        self.writers = writers
+        self.batch_size = batch_size
+        self.queue_batches = queue_batches
+        self.progress_interval = progress_interval
+        self.max_consecutive_failures = max_consecutive_failures
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='upload')
+        # The executor's own queue is unbounded; a slot is held from submit until the job ends
+        self._slots = threading.BoundedSemaphore(max_jobs + max_queued)
+        self._jobs: Dict[str, UploadJob] = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def submit(self, path: str, job: UploadJob, columns: Dict[str, str],
+               prepare: Callable[[int, Dict[str, Any]], Tuple[Optional[Dict[str, Any]], Optional[Dict[str, str]]]],
+               write: Callable[[List[Dict[str, Any]]], None],
+               report: Callable[[Dict[str, Any]], None],
+               finish: Optional[Callable[[UploadJob, List[Dict[str, Any]]], None]] = None) -> UploadJob:
+        """Queue a spooled file for processing.
+
+        prepare(row index, record) returns (record to write, None) or
+        (None, error); write(records) commits one batch; report(progress)
+        is called periodically and at the end; finish(job, newest committed
+        records) runs once after the last batch. Raises UploadQueueFull,
+        after removing the file, when no job slot is free.
+        """
+        if not self._slots.acquire(blocking=False):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            raise UploadQueueFull('Too many uploads in progress')
+        with self._lock:
+            self._forget_finished()
+            self._jobs[job.id] = job
+        try:
+            report(job.to_dict())
+        except Exception as e:
+            logger.warning(f"Failed to report progress of upload {job.id}: {e}")
+        self._executor.submit(self._run_in_slot, path, job, columns, prepare, write, report, finish)
+        return job
+
+    def _forget_finished(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _run_in_slot(self, *args):
+        try:
+            self._run(*args)
+        finally:
+            self._slots.release()
+
+    def _run(self, path, job, columns, prepare, write, report, finish):
+        with job.lock:
+            job.status = 'running'
+            job.started_at = time.time()
+        batches = queue.Queue(maxsize=self.queue_batches)
+        abort = threading.Event()
+        newest: List[Dict[str, Any]] = []
+        last_report = [time.monotonic()]
+
+        def maybe_report(final: bool = False):
+            now = time.monotonic()
+            if final or now - last_report[0] >= self.progress_interval:
+                last_report[0] = now
+                try:
+                    report(job.to_dict())
+                except Exception as e:
+                    logger.warning(f"Failed to report progress of upload {job.id}: {e}")
+
+        def write_loop():
+            failures = 0
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                if abort.is_set():
+                    with job.lock:
+                        job.failed += len(batch)
+                    continue
+                records = [record for _, record in batch]
+                try:
+                    write(records)
+                    failures = 0
+                    with job.lock:
+                        job.inserted += len(batch)
+                        # Written last, so stamped newest; rows of failed batches never appear here
+                        newest[:] = records[-10:]
+                except Exception as e:
+                    failures += 1
+                    logger.error(f"Upload {job.id}: batch of rows {batch[0][0]}-{batch[-1][0]} failed: {e}")
+                    with job.lock:
+                        job.failed += len(batch)
+                        job.add_error(batch[0][0], {'error': f'Failed to save rows {batch[0][0]}-{batch[-1][0]}', 'code': 'DATABASE_ERROR'})
+                    if failures >= self.max_consecutive_failures:
+                        abort.set()
+                maybe_report()
+
+        threads = [threading.Thread(target=write_loop, daemon=True) for _ in range(self.writers)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            batch = []
+            for index, data in iter_rows(path, job.format, columns):
+                if abort.is_set():
+                    break
+                if data is None:
+                    record, error = None, {'error': 'Unreadable row', 'code': 'INVALID_FORMAT'}
+                else:
+                    record, error = prepare(index, data)
+                with job.lock:
+                    job.rows_read += 1
+                    if error:
+                        job.rejected += 1
+                        job.add_error(index, error)
+                if record is not None:
+                    batch.append((index, record))
+                    if len(batch) >= self.batch_size:
+                        # Blocks while writers are behind: this is the backpressure
+                        batches.put(batch)
+                        batch = []
+                maybe_report()
+            if batch:
+                batches.put(batch)
+        except Exception as e:
+            logger.error(f"Upload {job.id} failed while reading: {e}")
+            job.message = f'Could not read upload: {e}'
+            abort.set()
+        finally:
+            for _ in threads:
+                batches.put(None)
+            for thread in threads:
+                thread.join()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        with job.lock:
+            job.finished_at = time.time()
+            if abort.is_set():
+                job.status = 'failed'
+                job.message = job.message or 'Stopped after repeated database errors'
+            else:
+                job.status = 'completed'
+        if job.inserted and finish is not None:
+            try:
+                finish(job, newest)
+            except Exception as e:
+                logger.error(f"Upload {job.id} completion hook failed: {e}")
+        maybe_report(final=True)
+        logger.info(f"Upload {job.id} {job.status}: {job.inserted} inserted, {job.rejected} rejected, {job.failed} failed")
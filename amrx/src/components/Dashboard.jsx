@@ -1,5 +1,6 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { StatCard } from './StatCard';
+import { useDashboardStream } from '../hooks/useDashboardStream';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
 
@@ -9,18 +10,24 @@ export const Dashboard = () => {
   const [error, setError] = useState(null);
   const [selectedCard, setSelectedCard] = useState(null);
   const [lastUpdated, setLastUpdated] = useState(null);
+  const etagRef = useRef(null);
 
   const fetchStats = useCallback(async () => {
-    setLoading(true);
     setError(null);
     try {
-      const res = await fetch(`${API_BASE_URL}/api/dashboard`);
+      // The browser revalidates with If-None-Match; unchanged data comes back as a 304
+      const res = await fetch(`${API_BASE_URL}/api/dashboard`, { cache: 'no-cache' });
       if (!res.ok) {
         throw new Error(`HTTP error! status: ${res.status}`);
       }
+      setLastUpdated(new Date().toLocaleTimeString());
+      const etag = res.headers.get('ETag');
+      if (etag && etag === etagRef.current) {
+        return;
+      }
+      etagRef.current = etag;
       const data = await res.json();
       setStats(data);
-      setLastUpdated(new Date().toLocaleTimeString());
     } catch (_err) {
       // Log error for debugging (in production, use proper logging service)
       setError('Failed to fetch dashboard data. Please check if the backend server is running.');
@@ -29,14 +36,18 @@ export const Dashboard = () => {
     }
   }, []);
 
+  const applyUpdate = useCallback((update) => {
+    setStats(update);
+    setLastUpdated(new Date().toLocaleTimeString());
+  }, []);
+
   useEffect(() => {
     fetchStats();
-    
-    // Set up auto-refresh every 30 seconds
-    const interval = setInterval(fetchStats, 30000);
-    return () => clearInterval(interval);
   }, [fetchStats]);
 
+  // Live updates pushed by the server replace periodic polling
+  useDashboardStream(applyUpdate, fetchStats);
+
   const handleRetry = () => {
     fetchStats();
   };
@@ -0,0 +1,107 @@
+import React, { useEffect, useRef, useState } from 'react';
+import { Button } from './ui/FormField';
+import ApiService from '../services/api';
+
+const POLL_INTERVAL = 1000;
+
+export const PharmacistFileUpload = ({ onComplete }) => {
+  const [file, setFile] = useState(null);
+  const [job, setJob] = useState(null);
+  const [uploading, setUploading] = useState(false);
+  const [error, setError] = useState(null);
+  const pollTimer = useRef(null);
+
+  useEffect(() => () => clearTimeout(pollTimer.current), []);
+
+  // Poll the job until the server reports it finished
+  const pollJob = (jobId) => {
+    pollTimer.current = setTimeout(async () => {
+      try {
+        const status = await ApiService.getUploadStatus(jobId);
+        setJob(status);
+        if (status.status === 'completed' || status.status === 'failed') {
+          if (status.inserted > 0 && onComplete) {
+            onComplete();
+          }
+          return;
+        }
+      } catch (err) {
+        console.error('Failed to fetch upload status:', err);
+      }
+      pollJob(jobId);
+    }, POLL_INTERVAL);
+  };
+
+  const handleUpload = async (e) => {
+    e.preventDefault();
+    if (!file) {
+      return;
+    }
+    setError(null);
+    setJob(null);
+    setUploading(true);
+    try {
+      const result = await ApiService.uploadPharmacistFile(file);
+      setJob({ status: result.status, rows_read: 0, inserted: 0, rejected: 0, failed: 0, errors: [] });
+      pollJob(result.job_id);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setUploading(false);
+    }
+  };
+
+  const finished = job && (job.status === 'completed' || job.status === 'failed');
+
+  return (
+    <form onSubmit={handleUpload} className="mt-8 bg-white dark:bg-gray-800 p-8 rounded-2xl shadow-xl border border-gray-200 dark:border-gray-700">
+      <h2 className="text-xl font-bold mb-2 text-gray-800 dark:text-white flex items-center">
+        <span className="mr-3" role="img" aria-label="File">🗂️</span>
+        Bulk Upload (CSV or NDJSON)
+      </h2>
+      <p className="text-sm text-gray-500 dark:text-gray-400 mb-4">
+        Columns: medicine name, category, quantity, region. Large files are imported in the background.
+      </p>
+
+      {error && (
+        <div className="mb-4 p-4 bg-red-100 dark:bg-red-900/30 text-red-700 dark:text-red-400 rounded-xl border border-red-200 dark:border-red-800">
+          {error}
+        </div>
+      )}
+
+      <div className="flex flex-col md:flex-row md:items-center gap-4">
+        <input
+          type="file"
+          accept=".csv,.ndjson,.jsonl"
+          onChange={(e) => setFile(e.target.files[0] || null)}
+          className="flex-1 text-sm text-gray-700 dark:text-gray-300"
+          aria-label="Prescription file"
+        />
+        <Button type="submit" loading={uploading} disabled={!file || (job && !finished)}>
+          <span className="mr-2" role="img" aria-label="Upload">📤</span>
+          Upload File
+        </Button>
+      </div>
+
+      {job && (
+        <div className="mt-6 text-sm text-gray-700 dark:text-gray-300">
+          <p className="font-medium">
+            {finished ? (job.status === 'completed' ? 'Import finished' : 'Import stopped') : 'Importing...'}
+          </p>
+          <p>
+            {job.rows_read.toLocaleString()} rows read · {job.inserted.toLocaleString()} saved · {job.rejected.toLocaleString()} rejected
+            {job.failed > 0 && ` · ${job.failed.toLocaleString()} failed`}
+          </p>
+          {job.message && <p className="text-red-600 dark:text-red-400">{job.message}</p>}
+          {job.errors && job.errors.length > 0 && (
+            <ul className="mt-2 max-h-40 overflow-y-auto text-xs text-red-600 dark:text-red-400">
+              {job.errors.map((err, idx) => (
+                <li key={idx}>Row {err.row + 1}: {err.error}</li>
+              ))}
+            </ul>
+          )}
+        </div>
+      )}
+    </form>
+  );
+};
@@ -2,6 +2,7 @@ import React from 'react';
 import { useForm } from '../hooks/useForm';
 import { FormField, Input, Select, Button } from './ui/FormField';
 import ApiService from '../services/api';
+import { PharmacistFileUpload } from './PharmacistFileUpload';
 
 export const PharmacistUpload = ({ refreshDashboard, onUploadSuccess }) => {
   const validationRules = {
@@ -159,6 +160,8 @@ export const PharmacistUpload = ({ refreshDashboard, onUploadSuccess }) => {
           </Button>
         </div>
       </form>
+
+      <PharmacistFileUpload onComplete={refreshDashboard || onUploadSuccess} />
     </div>
   );
 }; 
\ No newline at end of file
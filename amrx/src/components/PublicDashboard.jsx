@@ -1,26 +1,31 @@
-import React, { useEffect, useState } from 'react';
+import React, { useCallback, useEffect, useState } from 'react';
 import ApiService from '../services/api';
+import { useDashboardStream } from '../hooks/useDashboardStream';
 
 export const PublicDashboard = ({ onBackToHome, onSubmitAgain }) => {
   const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState('overview');
 
+  // Fetch public stats from backend
+  const fetchStats = useCallback(async () => {
+    try {
+      const data = await ApiService.getDashboardStats();
+      setStats(data);
+    } catch (error) {
+      console.error('Error fetching stats:', error);
+      setStats(null);
+    } finally {
+      setLoading(false);
+    }
+  }, []);
+
   useEffect(() => {
-    // Fetch public stats from backend
-    const fetchStats = async () => {
-      try {
-        const data = await ApiService.getDashboardStats();
-        setStats(data);
-      } catch (error) {
-        console.error('Error fetching stats:', error);
-        setStats(null);
-      } finally {
-        setLoading(false);
-      }
-    };
     fetchStats();
-  }, []);
+  }, [fetchStats]);
+
+  // Keep the numbers live as new submissions come in
+  useDashboardStream(setStats, fetchStats);
 
   const misuseData = [
     {
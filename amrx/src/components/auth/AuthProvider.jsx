@@ -97,6 +97,10 @@ export const AuthProvider = ({ children }) => {
 
   // Logout function
   const logout = () => {
+    if (ApiService.isAuthenticated()) {
+      // Best effort: the token is dropped locally either way
+      ApiService.logoutPharmacist().catch(err => console.warn('Logout request failed:', err));
+    }
     ApiService.clearAuth();
     setUser(null);
     setError(null);
@@ -7,13 +7,46 @@ import { MapContainer, TileLayer, Marker, Popup } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 import { BarChart, Bar, XAxis, YAxis, Tooltip, ResponsiveContainer, LineChart, Line, CartesianGrid, Legend } from 'recharts';
 
+const SUBMISSIONS_PAGE_SIZE = 25;
+const RECENT_LIMIT = 10;
+
+// Merge a since=<cursor> response into the dashboard data it was requested for
+const applyDashboardDelta = (stats, delta) => {
+  const next = { ...stats, cursor: delta.cursor, lastUpdated: delta.lastUpdated };
+  Object.entries(delta.changes || {}).forEach(([field, value]) => {
+    // Numeric changes are differences; anything else is the new value
+    next[field] = typeof value === 'number' ? (stats[field] || 0) + value : value;
+  });
+
+  const regionCounts = { ...(stats.region_counts || {}) };
+  Object.entries(delta.region_counts || {}).forEach(([region, count]) => {
+    regionCounts[region] = (regionCounts[region] || 0) + count;
+  });
+  next.region_counts = regionCounts;
+
+  next.monthly_trends = (stats.monthly_trends || []).map(trend => ({
+    ...trend,
+    count: trend.count + ((delta.monthly_counts || {})[trend.month] || 0)
+  }));
+  return next;
+};
+
+// Put new submissions from a delta in front of the already loaded pages
+const prependSubmissions = (submissions, newSubmissions) => {
+  const newIds = new Set(newSubmissions.map(s => s.id));
+  return [...newSubmissions, ...submissions.filter(s => !newIds.has(s.id))];
+};
+
 export const PharmacistDashboard = ({ onLogout }) => {
   const { user: pharmacist, logout } = useAuth();
   const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [activeTab, setActiveTab] = useState('overview');
-  const [recentSubmissions, setRecentSubmissions] = useState([]);
+  const [submissions, setSubmissions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const recentSubmissions = submissions.slice(0, RECENT_LIMIT);
 
   // Load dashboard data
   const loadDashboardData = useCallback(async () => {
@@ -26,9 +59,14 @@ export const PharmacistDashboard = ({ onLogout }) => {
       setLoading(true);
       setError(null);
       
-      const data = await ApiService.getPharmacistDashboard();
+      // Summary aggregates and the first page of submissions are separate requests
+      const [data, page] = await Promise.all([
+        ApiService.getPharmacistDashboard(),
+        ApiService.getPharmacistSubmissions({ pageSize: SUBMISSIONS_PAGE_SIZE })
+      ]);
       setStats(data);
-      setRecentSubmissions(data.recent_submissions || []);
+      setSubmissions(page.submissions || []);
+      setNextCursor(page.next_cursor);
     } catch (error) {
       console.error('Failed to load dashboard data:', error);
       setError(error.message);
@@ -88,7 +126,7 @@ export const PharmacistDashboard = ({ onLogout }) => {
     { id: 'settings', label: 'Settings', icon: '⚙️' }
   ];
 
-  // Use stats?.monthly_trends, stats?.region_counts, stats?.submissions
+  // Use stats?.monthly_trends, stats?.region_counts and the paginated submissions
   // Prepare region marker coordinates (dummy for now, real mapping would use a geocoding service)
   const regionCoords = {
     'London': [51.505, -0.09],
@@ -97,9 +135,42 @@ export const PharmacistDashboard = ({ onLogout }) => {
     'Unknown': [20, 0]
   };
 
-  // Add a function to refresh dashboard data
-  const refreshDashboard = () => {
-    loadDashboardData();
+  // Add a function to refresh dashboard data; only changes since the last load are fetched
+  const refreshDashboard = async () => {
+    if (!stats?.cursor) {
+      loadDashboardData();
+      return;
+    }
+    try {
+      const delta = await ApiService.getPharmacistDashboard(stats.cursor);
+      if (delta.resync) {
+        // Too much changed for a delta
+        loadDashboardData();
+        return;
+      }
+      setStats(applyDashboardDelta(stats, delta));
+      setSubmissions(current => prependSubmissions(current, delta.newSubmissions || []));
+    } catch (error) {
+      console.error('Failed to refresh dashboard data:', error);
+      loadDashboardData();
+    }
+  };
+
+  // Fetch the next page of submissions
+  const loadMoreSubmissions = async () => {
+    if (!nextCursor || loadingMore) {
+      return;
+    }
+    try {
+      setLoadingMore(true);
+      const page = await ApiService.getPharmacistSubmissions({ pageSize: SUBMISSIONS_PAGE_SIZE, cursor: nextCursor });
+      setSubmissions(current => [...current, ...(page.submissions || [])]);
+      setNextCursor(page.next_cursor);
+    } catch (error) {
+      console.error('Failed to load more submissions:', error);
+    } finally {
+      setLoadingMore(false);
+    }
   };
 
   return (
@@ -348,8 +419,8 @@ export const PharmacistDashboard = ({ onLogout }) => {
                     </tr>
                   </thead>
                   <tbody className="bg-white dark:bg-gray-800 divide-y divide-gray-200 dark:divide-gray-700">
-                    {stats?.submissions && stats.submissions.length > 0 ? (
-                      stats.submissions.map((s, idx) => (
+                    {submissions.length > 0 ? (
+                      submissions.map((s, idx) => (
                         <tr key={s.id || idx}>
                           <td className="px-4 py-2 whitespace-nowrap text-sm text-gray-900 dark:text-white">{s.timestamp ? new Date(s.timestamp).toLocaleDateString() : ''}</td>
                           <td className="px-4 py-2 whitespace-nowrap text-sm text-gray-900 dark:text-white">{s.region || s.location || 'Unknown'}</td>
@@ -365,6 +436,17 @@ export const PharmacistDashboard = ({ onLogout }) => {
                   </tbody>
                 </table>
               </div>
+              {nextCursor && (
+                <div className="mt-4 text-center">
+                  <button
+                    onClick={loadMoreSubmissions}
+                    disabled={loadingMore}
+                    className="px-4 py-2 bg-blue-600 text-white rounded-lg hover:bg-blue-700 disabled:opacity-50 transition-colors"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                </div>
+              )}
             </div>
           </div>
         )}
@@ -0,0 +1,73 @@
+import { useEffect, useRef } from 'react';
+
+const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
+const RECENT_LIMIT = 10;
+const FALLBACK_POLL_INTERVAL = 30000;
+
+// Apply one live dashboard event to a stats snapshot
+export const applyDashboardEvent = (stats, type, data) => {
+  if (!stats) {
+    return stats;
+  }
+  if (type === 'stats') {
+    return { ...stats, ...data };
+  }
+  if (type === 'submission') {
+    const next = { ...stats };
+    Object.entries(data.increments || {}).forEach(([field, amount]) => {
+      next[field] = (stats[field] || 0) + amount;
+    });
+    const newIds = new Set(data.submissions.map(s => s.id));
+    const recent = (stats.recentSubmissions || []).filter(s => !newIds.has(s.id));
+    next.recentSubmissions = [...data.submissions, ...recent].slice(0, RECENT_LIMIT);
+    return next;
+  }
+  return stats;
+};
+
+// Keep dashboard stats live over Server-Sent Events.
+// onUpdate receives a state updater; reload refetches the full snapshot.
+export const useDashboardStream = (onUpdate, reload) => {
+  const onUpdateRef = useRef(onUpdate);
+  const reloadRef = useRef(reload);
+
+  useEffect(() => {
+    onUpdateRef.current = onUpdate;
+    reloadRef.current = reload;
+  }, [onUpdate, reload]);
+
+  useEffect(() => {
+    let interval = null;
+    const poll = () => {
+      interval = setInterval(() => reloadRef.current(), FALLBACK_POLL_INTERVAL);
+    };
+    if (typeof EventSource === 'undefined') {
+      // No SSE support: fall back to polling
+      poll();
+      return () => clearInterval(interval);
+    }
+
+    // EventSource reconnects on its own and resumes with Last-Event-ID
+    const source = new EventSource(`${API_BASE_URL}/api/dashboard/stream`);
+    source.onerror = () => {
+      // An HTTP error such as 503 STREAMS_FULL closes the source for good: poll instead
+      if (source.readyState === EventSource.CLOSED && interval === null) {
+        reloadRef.current();
+        poll();
+      }
+    };
+    const handle = (type) => (event) => {
+      const data = JSON.parse(event.data);
+      onUpdateRef.current(stats => applyDashboardEvent(stats, type, data));
+    };
+    source.addEventListener('submission', handle('submission'));
+    source.addEventListener('stats', handle('stats'));
+    // Events were missed (buffer overrun or server restart): reload the snapshot
+    source.addEventListener('reset', () => reloadRef.current());
+
+    return () => {
+      source.close();
+      clearInterval(interval);
+    };
+  }, []);
+};
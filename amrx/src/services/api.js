@@ -88,6 +88,13 @@ class ApiService {
     });
   }
 
+  // Revoke the current token server-side
+  static async logoutPharmacist() {
+    return ApiService.request('/api/auth/pharmacist/logout', {
+      method: 'POST',
+    });
+  }
+
   static async registerPharmacist(pharmacistData) {
     return ApiService.request('/api/auth/pharmacist/register', {
       method: 'POST',
@@ -95,8 +102,36 @@ class ApiService {
     });
   }
 
-  static async getPharmacistDashboard() {
-    return ApiService.request('/api/pharmacist/dashboard');
+  // Pass the cursor of a previous response to receive only what changed since
+  static async getPharmacistDashboard(since) {
+    const query = since ? `?since=${encodeURIComponent(since)}` : '';
+    return ApiService.request(`/api/pharmacist/dashboard${query}`);
+  }
+
+  // Start a background import of a CSV or NDJSON file; returns the job id
+  static async uploadPharmacistFile(file) {
+    const body = new FormData();
+    body.append('file', file);
+    // No Content-Type header: the browser sets the multipart boundary
+    return ApiService.request('/api/pharmacist/uploads', {
+      method: 'POST',
+      body,
+      headers: { ...ApiService.getAuthHeaders() },
+    });
+  }
+
+  static async getUploadStatus(jobId) {
+    return ApiService.request(`/api/pharmacist/uploads/${jobId}`);
+  }
+
+  // One page of the pharmacist's submissions, newest first; pass next_cursor to continue
+  static async getPharmacistSubmissions({ pageSize, cursor, fields } = {}) {
+    const params = new URLSearchParams();
+    if (pageSize) params.set('page_size', pageSize);
+    if (cursor) params.set('cursor', cursor);
+    if (fields) params.set('fields', fields.join(','));
+    const query = params.toString();
+    return ApiService.request(`/api/pharmacist/submissions${query ? `?${query}` : ''}`);
   }
 }
 